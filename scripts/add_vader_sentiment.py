@@ -2,35 +2,65 @@
 
 Usage:
     python scripts/add_vader_sentiment.py
+    python scripts/add_vader_sentiment.py --workers 4 --no-cache
 
 This will add columns `vader` (float) and `sentiment_label` ('pos'/'neu'/'neg') to
-`data/processed/reviews_clean.csv` in-place.
+`data/processed/reviews_clean.csv` in-place. Scores are looked up in the on-disk
+sentiment cache first (`data/cache/sentiment.sqlite`) so only new reviews are scored.
+The newer of the CSV and its Parquet copy is read; `--format` picks what is written.
 """
+import argparse
+import sys
 from pathlib import Path
-import pandas as pd
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.instrumentation import add_arguments, configure_from_args, stage  # noqa: E402
+from src.sentiment import get_engine, label_from_compound  # noqa: E402
+from src.sentiment_cache import DEFAULT_CACHE_PATH, SentimentCache, score_with_cache  # noqa: E402
+from src.storage import FORMATS, load_processed, processed_exists, save_processed  # noqa: E402
 
 
 def label_from_score(s: float) -> str:
-    if s >= 0.05:
-        return "pos"
-    if s <= -0.05:
-        return "neg"
-    return "neu"
+    return label_from_compound(s)
+
+
+def add_vader(df, workers=1, batch_size=None, cache_path=DEFAULT_CACHE_PATH):
+    """Return `df` with `vader` and `sentiment_label` columns added."""
+    engine = get_engine("vader", workers=workers, batch_size=batch_size)
+    print("Computing VADER sentiment for", len(df), "rows")
+    cache = SentimentCache(cache_path) if cache_path else None
+    try:
+        with stage("sentiment", rows=len(df), model="vader"):
+            scores, labels = score_with_cache(engine, df["review"].astype(str).tolist(), cache)
+        if cache is not None:
+            print("Sentiment cache:", cache.stats())
+    finally:
+        if cache is not None:
+            cache.close()
+    df["vader"] = scores
+    df["sentiment_label"] = labels
+    return df
 
 
 def main():
-    path = Path("data/processed/reviews_clean.csv")
-    if not path.exists():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--path', default='data/processed/reviews_clean.csv')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--cache', default=str(DEFAULT_CACHE_PATH))
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--format', default='csv', choices=FORMATS)
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    path = Path(args.path)
+    if not processed_exists(path):
         print("Cleaned CSV not found at", path)
         return
-    df = pd.read_csv(path)
-    analyzer = SentimentIntensityAnalyzer()
-    print("Computing VADER sentiment for", len(df), "rows")
-    df["vader"] = df["review"].astype(str).apply(lambda t: analyzer.polarity_scores(t)["compound"])
-    df["sentiment_label"] = df["vader"].apply(label_from_score)
-    df.to_csv(path, index=False)
-    print("Persisted vader + sentiment_label to", path)
+    df = add_vader(load_processed(path), args.workers, args.batch_size, None if args.no_cache else args.cache)
+    for p in save_processed(df, path, args.format):
+        print("Persisted vader + sentiment_label to", p)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,337 @@
+"""Benchmark the review pipeline stages on synthetic data.
+
+Usage:
+    python scripts/benchmark_pipeline.py                      # 10k, 100k and 1M rows
+    python scripts/benchmark_pipeline.py --sizes 10k --stages preprocess themes
+    python scripts/benchmark_pipeline.py --sizes 100k --compare data/benchmarks/bench-abc1234.json
+
+For every size a deterministic set of raw CSVs (`raw_<BANK>.csv`, written
+through `save_reviews_csv`'s row format) is generated under
+`data/benchmarks/work/<rows>/data/raw/` and reused while the seed matches.
+Each stage then runs in a fresh process so its peak memory is its own:
+
+  - preprocess         `preprocess_reviews.run` (rows = raw rows read)
+  - preprocess_stream  `preprocess_reviews.run_streaming`
+  - sentiment          `compute_vader` (no cache)
+  - keywords           per-bank TF-IDF keyword extraction
+  - themes             `assign_themes` with the rule-based theme keywords
+  - db_load            `prepare_rows` + `upsert_rows` into SQLite (or `--database-url`)
+
+The later stages read the preprocess output, so when picking `--stages` keep
+`preprocess` or `preprocess_stream` first.
+
+Results (wall/CPU seconds, rows/s, peak RSS) are printed and written as JSON
+(default `data/benchmarks/bench-<commit>.json`); `--compare` prints the ratio
+against an earlier result file so regressions show up between commits.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.instrumentation import process_peak_rss_mb  # noqa: E402
+
+
+SIZES = [10_000, 100_000, 1_000_000]
+STAGES = ['preprocess', 'preprocess_stream', 'sentiment', 'keywords', 'themes', 'db_load']
+BANKS = ['CBE', 'BOA', 'DASHEN']
+DEFAULT_SEED = 42
+DEFAULT_WORKDIR = Path('data/benchmarks/work')
+DEFAULT_OUT_DIR = Path('data/benchmarks')
+GENERATED_FILE = 'generated.json'
+WRITE_BATCH = 10_000
+DUPLICATE_RATE = 0.05
+EMPTY_RATE = 0.005
+MISSING_DATE_RATE = 0.01
+
+PHRASES = [
+    'login fails with otp error', 'cannot reset my password', 'pin blocked after update',
+    'transfer is slow', 'transaction failed but money was deducted', 'payment declined again',
+    'app keeps crashing', 'the new interface is confusing', 'layout is clean and simple', 'freeze on startup',
+    'customer service never answers', 'support team was helpful', 'called the agent twice',
+    'please add notification for balance', 'need a monthly report feature', 'integration with telebirr please',
+    'great app', 'very good', 'worst banking app', 'works fine', 'easy to use', 'thank you',
+]
+OPENERS = ['', '', 'honestly ', 'since yesterday ', 'this app ', 'dear developers, ']
+RATING_WEIGHTS = [0.25, 0.08, 0.1, 0.12, 0.45]
+FILLER_WORDS = 800
+START_DATE = datetime(2023, 1, 1)
+DATE_SPAN_SECONDS = 2 * 365 * 24 * 3600
+
+
+def parse_size(value):
+    value = str(value).strip().lower().replace('_', '')
+    scale = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+    return int(float(value[:-1] if scale > 1 else value) * scale)
+
+
+def _filler_vocabulary(rng):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = sorted({''.join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(FILLER_WORDS)})
+    weights = [1 / (i + 1) for i in range(len(words))]
+    return words, weights
+
+
+def synthetic_reviews(n, bank, seed=DEFAULT_SEED):
+    """Yield `n` review dicts shaped like google_play_scraper results for `bank`."""
+    rng = random.Random(f'{seed}:{bank}')
+    words, weights = _filler_vocabulary(rng)
+    recent = []
+    for _ in range(n):
+        roll = rng.random()
+        if recent and roll < DUPLICATE_RATE:
+            content = rng.choice(recent)
+        elif roll < DUPLICATE_RATE + EMPTY_RATE:
+            content = ''
+        else:
+            parts = rng.sample(PHRASES, rng.randint(1, 3))
+            filler = rng.choices(words, weights, k=rng.randint(0, 12))
+            content = rng.choice(OPENERS) + ', '.join(parts) + (' ' + ' '.join(filler) if filler else '')
+            recent.append(content)
+            if len(recent) > 1000:
+                recent.pop(rng.randrange(len(recent)))
+        at = None
+        if rng.random() >= MISSING_DATE_RATE:
+            at = START_DATE + timedelta(seconds=rng.randrange(DATE_SPAN_SECONDS))
+            if rng.random() < 0.3:
+                at = at.replace(microsecond=rng.randrange(1, 1_000_000))
+        yield {'content': content, 'score': rng.choices(range(1, 6), RATING_WEIGHTS)[0], 'at': at}
+
+
+def generate_raw(raw_dir, rows, seed=DEFAULT_SEED, banks=BANKS):
+    """Write `rows` synthetic reviews split across `raw_<bank>.csv` files in `raw_dir`."""
+    from scripts.scrape_reviews import append_reviews_csv
+
+    raw_dir = Path(raw_dir)
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i, bank in enumerate(banks):
+        n = rows // len(banks) + (1 if i < rows % len(banks) else 0)
+        out = raw_dir / f'raw_{bank}.csv'
+        out.unlink(missing_ok=True)
+        batch = []
+        for r in synthetic_reviews(n, bank, seed):
+            batch.append(r)
+            if len(batch) >= WRITE_BATCH:
+                append_reviews_csv(batch, bank, raw_dir)
+                batch = []
+        append_reviews_csv(batch, bank, raw_dir)
+        paths.append(out)
+    return paths
+
+
+def prepare_workdir(workdir, rows, seed=DEFAULT_SEED):
+    """Generate raw data for `rows` under `workdir` unless an identical set is already there."""
+    workdir = Path(workdir)
+    marker = workdir / GENERATED_FILE
+    params = {'rows': rows, 'seed': seed, 'banks': BANKS}
+    if marker.exists() and json.loads(marker.read_text(encoding='utf-8')) == params:
+        return workdir
+    generate_raw(workdir / 'data' / 'raw', rows, seed)
+    marker.write_text(json.dumps(params), encoding='utf-8')
+    return workdir
+
+
+def _clean_frame():
+    from src.storage import load_processed
+
+    return load_processed(Path('data/processed/reviews_clean.csv'))
+
+
+def _raw_rows():
+    return json.loads(Path(GENERATED_FILE).read_text(encoding='utf-8'))['rows']
+
+
+def _stage_preprocess(options):
+    from scripts import preprocess_reviews
+
+    def work():
+        # the work dir is reused between runs; never let the raw catalog skip the stage being timed
+        preprocess_reviews.run(force=True)
+        return _raw_rows()
+    return work
+
+
+def _stage_preprocess_stream(options):
+    from scripts import preprocess_reviews
+
+    def work():
+        preprocess_reviews.run_streaming(force=True)
+        return _raw_rows()
+    return work
+
+
+def _stage_sentiment(options):
+    from scripts.sentiment_thematic import compute_vader
+
+    df = _clean_frame()
+
+    def work():
+        compute_vader(df, workers=options.get('workers', 1), cache=None)
+        return len(df)
+    return work
+
+
+def _stage_keywords(options):
+    from scripts.sentiment_thematic import extract_bank_keywords
+
+    df = _clean_frame()
+
+    def work():
+        extract_bank_keywords(df, options.get('keywords', 'per-bank'), top_k=50, vocab_path=None)
+        return len(df)
+    return work
+
+
+def _stage_themes(options):
+    from scripts.sentiment_thematic import THEME_KEYWORDS, assign_themes
+
+    texts = _clean_frame()['review'].astype(str)
+
+    def work():
+        assign_themes(texts, THEME_KEYWORDS)
+        return len(texts)
+    return work
+
+
+def _stage_db_load(options):
+    from sqlalchemy import create_engine
+
+    from scripts.db_init_sqlalchemy import metadata
+    from scripts.insert_reviews_to_postgres import bank_mapping, ensure_review_keys, prepare_rows, upsert_rows
+
+    url = options.get('database_url')
+    if not url:
+        db = Path('bench.sqlite')
+        db.unlink(missing_ok=True)
+        url = f'sqlite:///{db}'
+    engine = create_engine(url)
+    metadata.create_all(engine)
+    ensure_review_keys(engine)
+    df = _clean_frame()
+    mapping = bank_mapping(engine, BANKS)
+
+    def work():
+        rows = prepare_rows(df, mapping)
+        upsert_rows(engine, rows, themes=False)
+        return len(rows)
+    return work
+
+
+STAGE_SETUP = {
+    'preprocess': _stage_preprocess,
+    'preprocess_stream': _stage_preprocess_stream,
+    'sentiment': _stage_sentiment,
+    'keywords': _stage_keywords,
+    'themes': _stage_themes,
+    'db_load': _stage_db_load,
+}
+
+
+def run_stage(stage, workdir, options=None):
+    """Run one stage inside `workdir` and return its measurements.
+
+    Input loading happens before the clock starts; `rss_before_mb` is the
+    process peak at that point, so `peak_rss_mb - rss_before_mb` is what the
+    stage itself added.
+    """
+    options = options or {}
+    os.chdir(workdir)
+    work = STAGE_SETUP[stage](options)
+    rss_before = process_peak_rss_mb()
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    rows = work()
+    wall = time.perf_counter() - wall0
+    cpu = time.process_time() - cpu0
+    return {
+        'stage': stage,
+        'rows': int(rows),
+        'wall_s': round(wall, 4),
+        'cpu_s': round(cpu, 4),
+        'rows_per_s': round(rows / wall, 1) if wall > 0 else None,
+        'rss_before_mb': rss_before,
+        'peak_rss_mb': process_peak_rss_mb(),
+    }
+
+
+def run_isolated(stage, workdir, options=None):
+    # a fresh interpreter per stage keeps peak RSS from leaking across stages
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(run_stage, stage, str(Path(workdir).resolve()), options).result()
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(sizes=SIZES, stages=STAGES, workdir=DEFAULT_WORKDIR, seed=DEFAULT_SEED, options=None):
+    results = []
+    for size in sizes:
+        wd = prepare_workdir(Path(workdir) / str(size), size, seed)
+        for stage in stages:
+            res = run_isolated(stage, wd, options)
+            res['size'] = size
+            results.append(res)
+            print(f"{size:>9,} {stage:<18} {res['wall_s']:>9.2f}s {res['rows_per_s'] or 0:>12,.0f} rows/s "
+                  f"peak {res['peak_rss_mb'] or 0:,.0f} MB")
+    return {
+        'commit': git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'results': results,
+    }
+
+
+def compare(current, baseline):
+    """Print wall-time ratios (current / baseline) per size and stage."""
+    before = {(r['size'], r['stage']): r for r in baseline['results']}
+    print(f"Compared with {baseline.get('commit')}:")
+    for r in current['results']:
+        old = before.get((r['size'], r['stage']))
+        if old is None or not old['wall_s']:
+            continue
+        ratio = r['wall_s'] / old['wall_s']
+        flag = '  <-- slower' if ratio > 1.1 else ''
+        print(f"{r['size']:>9,} {r['stage']:<18} x{ratio:.2f}{flag}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sizes', nargs='+', default=[str(s) for s in SIZES], help='row counts, e.g. 10k 100k 1m')
+    ap.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    ap.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    ap.add_argument('--workdir', default=str(DEFAULT_WORKDIR))
+    ap.add_argument('--output', default=None, help='result JSON (default data/benchmarks/bench-<commit>.json)')
+    ap.add_argument('--compare', default=None, help='earlier result JSON to compare against')
+    ap.add_argument('--workers', type=int, default=1, help='processes for the sentiment stage')
+    ap.add_argument('--keywords', default='per-bank', help='keyword mode for the keywords stage')
+    ap.add_argument('--database-url', default=None, help='database for db_load (default: a scratch SQLite file)')
+    args = ap.parse_args()
+
+    options = {'workers': args.workers, 'keywords': args.keywords, 'database_url': args.database_url}
+    report = run_benchmark([parse_size(s) for s in args.sizes], args.stages, args.workdir, args.seed, options)
+    out = Path(args.output) if args.output else DEFAULT_OUT_DIR / f"bench-{report['commit'] or 'local'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print('Wrote', out)
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text(encoding='utf-8')))
+
+
+if __name__ == '__main__':
+    main()
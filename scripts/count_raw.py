@@ -1,6 +1,13 @@
-"""Count rows in data/raw/raw_*.csv files (excluding header)."""
+"""Count rows in data/raw/raw_*.csv files (excluding header).
+
+Counts come from the raw-data catalog (src/catalog.py): files are streamed
+once, and only re-read when their content changed since the last count.
+"""
+import sys
 from pathlib import Path
-import csv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.catalog import CATALOG_PATH, RawCatalog  # noqa: E402
 
 
 def main():
@@ -8,15 +15,18 @@ def main():
     if not p.exists():
         print("No data/raw directory found.")
         return
-    total = 0
-    for f in sorted(p.glob("raw_*.csv")):
-        with f.open(encoding="utf-8") as fh:
-            reader = csv.reader(fh)
-            rows = list(reader)
-        count = max(0, len(rows) - 1)
-        print(f"{f.name}: {count} rows")
-        total += count
-    print(f"TOTAL: {total} rows")
+    files = sorted(p.glob("raw_*.csv"))
+    catalog = RawCatalog.load(CATALOG_PATH) or RawCatalog()
+    scanned = set(catalog.refresh(files))
+    for f in files:
+        e = catalog.files[str(f)]
+        cached = "" if str(f) in scanned else " (cached)"
+        print(f"{f.name}: {e.rows} rows, {e.first_date} .. {e.last_date}{cached}")
+    totals = catalog.totals(files)
+    for bank, n in totals["banks"].items():
+        print(f"  {bank}: {n} rows")
+    print(f"TOTAL: {totals['rows']} rows")
+    catalog.save(CATALOG_PATH)
 
 
 if __name__ == "__main__":
@@ -12,8 +12,13 @@ This script executes `sql/schema.sql` and seeds the `banks` table with banks
 detected in `data/processed/reviews_thematic.csv` (or `reviews_clean.csv`).
 """
 import os
+import sys
 from pathlib import Path
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.db import get_engine  # noqa: E402
+from src.storage import load_processed, processed_exists  # noqa: E402
 
 
 def get_database_url():
@@ -25,7 +30,7 @@ def get_database_url():
 
 def main():
     db_url = get_database_url()
-    engine = create_engine(db_url)
+    engine = get_engine(db_url)
 
     # run schema.sql
     schema_path = Path('sql/schema.sql')
@@ -42,7 +47,7 @@ def main():
     candidates = [Path('data/processed/reviews_thematic.csv'), Path('data/processed/reviews_clean.csv')]
     df_path = None
     for p in candidates:
-        if p.exists():
+        if processed_exists(p):
             df_path = p
             break
 
@@ -50,8 +55,7 @@ def main():
         print('No processed CSV found to seed banks (expected at data/processed/reviews_thematic.csv or reviews_clean.csv).')
         return
 
-    import pandas as pd
-    df = pd.read_csv(df_path)
+    df = load_processed(df_path, columns=['bank'])
     banks = df['bank'].dropna().unique().tolist()
     print('Seeding banks:', banks)
 
@@ -1,7 +1,7 @@
 import os
+import sys
 from pathlib import Path
 from sqlalchemy import (
-    create_engine,
     MetaData,
     Table,
     Column,
@@ -9,8 +9,91 @@ from sqlalchemy import (
     String,
     Text,
     ForeignKey,
+    Date,
     DateTime,
     Float,
+    Index,
+    event,
+)
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src import search  # noqa: E402
+from src.db import get_engine  # noqa: E402
+
+
+metadata = MetaData()
+
+banks = Table(
+    'banks',
+    metadata,
+    Column('bank_id', Integer, primary_key=True, autoincrement=True),
+    Column('bank_name', String, nullable=False, unique=True),
+    Column('app_name', String, nullable=True),
+)
+
+reviews = Table(
+    'reviews',
+    metadata,
+    Column('review_id', Integer, primary_key=True, autoincrement=True),
+    Column('bank_id', Integer, ForeignKey('banks.bank_id', ondelete='CASCADE')),
+    Column('review_text', Text),
+    Column('rating', Integer),
+    Column('review_date', DateTime),
+    Column('sentiment_label', String),
+    Column('sentiment_score', Float),
+    Column('source', String),
+    Column('raw_review_id', String),
+    # raw_review_id when available, else a hash of (bank_id, text, date); see insert_reviews_to_postgres
+    Column('review_key', String),
+    Column('content_hash', String),
+    Index('idx_reviews_bank_id', 'bank_id'),
+    Index('idx_reviews_review_date', 'review_date'),
+    Index('uq_reviews_source_key', 'source', 'review_key', unique=True),
+)
+
+# full-text index: FTS5 table + triggers on SQLite, generated tsvector column + GIN index on PostgreSQL
+event.listen(reviews, 'after_create', lambda target, conn, **kw: search.create_index(conn))
+
+themes = Table(
+    'themes',
+    metadata,
+    Column('theme_id', Integer, primary_key=True, autoincrement=True),
+    Column('theme_name', String, nullable=False, unique=True),
+)
+
+# one row per (review, theme); bank_id is denormalized for per-bank theme counts.
+# The primary key already serves lookups by review_id.
+review_themes = Table(
+    'review_themes',
+    metadata,
+    Column('review_id', Integer, ForeignKey('reviews.review_id', ondelete='CASCADE'), primary_key=True),
+    Column('theme_id', Integer, ForeignKey('themes.theme_id', ondelete='CASCADE'), primary_key=True),
+    Column('bank_id', Integer, ForeignKey('banks.bank_id', ondelete='CASCADE')),
+    Index('idx_review_themes_theme_bank', 'theme_id', 'bank_id'),
+)
+
+# daily per-bank rollups kept current by the loader; see src/rollups.py.
+# day is NULL for reviews without a date.
+daily_bank_stats = Table(
+    'daily_bank_stats',
+    metadata,
+    Column('day', Date),
+    Column('bank_id', Integer, ForeignKey('banks.bank_id', ondelete='CASCADE'), nullable=False),
+    Column('review_count', Integer, nullable=False),
+    *[Column(f'rating_{r}', Integer, nullable=False) for r in (1, 2, 3, 4, 5)],
+    *[Column(f'sentiment_{s}', Integer, nullable=False) for s in ('pos', 'neu', 'neg')],
+    Column('sentiment_labeled', Integer, nullable=False),
+    Index('uq_daily_bank_stats_bank_day', 'bank_id', 'day', unique=True),
+)
+
+daily_theme_stats = Table(
+    'daily_theme_stats',
+    metadata,
+    Column('day', Date),
+    Column('bank_id', Integer, ForeignKey('banks.bank_id', ondelete='CASCADE'), nullable=False),
+    Column('theme_id', Integer, ForeignKey('themes.theme_id', ondelete='CASCADE'), nullable=False),
+    Column('review_count', Integer, nullable=False),
+    Index('uq_daily_theme_stats_bank_day_theme', 'bank_id', 'day', 'theme_id', unique=True),
 )
 
 
@@ -21,35 +104,15 @@ def get_database_url():
 def main():
     db_url = get_database_url()
     print('Using DATABASE_URL=', db_url)
-    engine = create_engine(db_url)
-    metadata = MetaData()
-
-    banks = Table(
-        'banks',
-        metadata,
-        Column('bank_id', Integer, primary_key=True, autoincrement=True),
-        Column('bank_name', String, nullable=False, unique=True),
-        Column('app_name', String, nullable=True),
-    )
-
-    reviews = Table(
-        'reviews',
-        metadata,
-        Column('review_id', Integer, primary_key=True, autoincrement=True),
-        Column('bank_id', Integer, ForeignKey('banks.bank_id', ondelete='CASCADE')),
-        Column('review_text', Text),
-        Column('rating', Integer),
-        Column('review_date', DateTime),
-        Column('sentiment_label', String),
-        Column('sentiment_score', Float),
-        Column('source', String),
-        Column('raw_review_id', String),
-    )
+    engine = get_engine(db_url)
 
     # create tables
     print('Creating tables...')
     metadata.create_all(engine)
     print('Tables created (if not existing).')
+    with engine.begin() as conn:
+        if search.create_index(conn):
+            print('Full-text search index created.')
 
     # seed banks from processed CSV if available
     candidates = [Path('../data/processed/reviews_thematic.csv'), Path('../data/processed/reviews_clean.csv')]
@@ -3,9 +3,18 @@
 Usage:
   $env:DATABASE_URL = 'sqlite:///data/bank_reviews.db'
   python scripts/db_verify.py
+
+Counts come from the daily rollup tables (see src/rollups.py); databases
+without them are counted by scanning `reviews`.
 """
 import os
-from sqlalchemy import create_engine, text
+import sys
+from pathlib import Path
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src import rollups  # noqa: E402
+from src.db import get_engine  # noqa: E402
 
 
 def get_database_url():
@@ -15,7 +24,11 @@ def get_database_url():
 def main():
     db_url = get_database_url()
     print('Connecting to', db_url)
-    engine = create_engine(db_url)
+    engine = get_engine(db_url)
+    if inspect(engine).has_table(rollups.BANK_TABLE):
+        verify_rollups(engine)
+        return
+    print('No rollup tables found; counting from reviews')
     with engine.connect() as conn:
         try:
             total = conn.execute(text('SELECT COUNT(*) FROM reviews')).scalar()
@@ -33,6 +46,40 @@ def main():
             except Exception:
                 print(f"- {r[0]}: {r[1]}")
 
+        try:
+            rows = conn.execute(text(
+                'SELECT b.bank_name, t.theme_name, COUNT(*) AS cnt FROM review_themes rt '
+                'JOIN themes t ON t.theme_id = rt.theme_id JOIN banks b ON b.bank_id = rt.bank_id '
+                'GROUP BY b.bank_name, t.theme_name ORDER BY b.bank_name, cnt DESC'
+            )).fetchall()
+        except Exception as e:
+            print('\nNo theme tables found:', e)
+            return
+        print('\nPer-bank theme counts:')
+        for bank_name, theme_name, cnt in rows:
+            print(f"- {bank_name} / {theme_name}: {cnt}")
+
+
+def verify_rollups(engine):
+    with engine.connect() as conn:
+        banks = rollups.bank_totals(conn)
+        total = sum(r.review_count for r in banks)
+        print('Total reviews in DB:', total)
+        labeled = sum(r.sentiment_labeled for r in banks)
+        if total:
+            print(f'Sentiment coverage: {labeled} / {total} ({labeled / total * 100:.1f}%)')
+
+        print('\nPer-bank counts:')
+        for r in banks:
+            print(f"- {r.bank_name}: {r.review_count}")
+
+        if not inspect(conn).has_table(rollups.THEME_TABLE):
+            print('\nNo theme tables found')
+            return
+        print('\nPer-bank theme counts:')
+        for bank_name, theme_name, cnt in rollups.theme_totals(conn):
+            print(f"- {bank_name} / {theme_name}: {cnt}")
+
 
 if __name__ == '__main__':
     main()
@@ -4,14 +4,75 @@ Usage:
   - Ensure `DATABASE_URL` env var is set (see scripts/db_init.py for example).
   - Run: `python scripts/insert_reviews_to_postgres.py --source data/processed/reviews_thematic.csv`
 
-The script maps bank names to `banks.bank_id` and inserts rows in batches.
+The script maps bank names to `banks.bank_id` and bulk-loads the rows. The load
+method defaults to `auto`:
+  - PostgreSQL: rows are streamed through `COPY reviews (...) FROM STDIN`.
+  - SQLite: one `executemany` inside a single transaction with bulk-load pragmas.
+  - `--method insert` keeps the original batched parameterized INSERT.
+Throughput (rows/s) is printed at the end.
+
+Loads are idempotent by default (`--mode upsert`): every row carries a
+`review_key` (the source's review id, or a hash of bank/text/date when there is
+none) and a `content_hash`. Rows are bulk-loaded into a temporary staging table
+and merged with `INSERT ... ON CONFLICT (source, review_key) DO UPDATE`, which
+only rewrites rows whose content hash changed. `--mode append` only inserts
+reviews whose key is not stored yet (`ON CONFLICT ... DO NOTHING`) and leaves
+existing rows untouched, even if their content changed.
+
+When the source has an `identified_themes` column (`;`-separated), the themes
+are normalized into `themes` / `review_themes` in the same transaction, so
+per-bank and per-theme counts are indexed queries instead of string splits.
+
+The daily per-bank rollups (`daily_bank_stats`, `daily_theme_stats`; see
+`src/rollups.py`) are updated in the same transaction for just the days whose
+reviews were inserted or changed. Use `scripts/refresh_rollups.py` to rebuild them.
+
+On a range-partitioned `reviews` (PostgreSQL, see `scripts/partition_reviews.py`)
+the month partitions a load needs are created first, so rows are routed to
+their month instead of the default partition, and upserts merge with
+UPDATE + INSERT ... WHERE NOT EXISTS (no global unique index is possible there).
 """
+import hashlib
+import io
 import os
 import argparse
+import sys
+import time
 from pathlib import Path
-from sqlalchemy import create_engine, text
+from sqlalchemy import bindparam, inspect, text
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src import pg_partitions, rollups  # noqa: E402
+from src.db import get_engine  # noqa: E402
+from src.instrumentation import add_arguments, configure_from_args, stage  # noqa: E402
+from src.storage import load_processed, processed_exists  # noqa: E402
+
+
+REVIEW_COLUMNS = [
+    'bank_id', 'review_text', 'rating', 'review_date',
+    'sentiment_label', 'sentiment_score', 'source', 'raw_review_id',
+    'review_key', 'content_hash',
+]
+KEY_COLUMNS = ['source', 'review_key']
+DEFAULT_SOURCE = 'google_play'
+STAGING_TABLE = 'reviews_staging'
+THEME_STAGING_TABLE = 'review_themes_staging'
+THEME_LINK_COLUMNS = ['source', 'review_key', 'theme_name']
+COPY_CHUNK_ROWS = 50_000
+# per-connection settings only (no journal_mode change, which would persist in the file);
+# the pooled connection gets SQLite's defaults back once the load is done
+SQLITE_BULK_PRAGMAS = [
+    'PRAGMA synchronous=OFF',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-200000',
+]
+SQLITE_RESTORE_PRAGMAS = [
+    'PRAGMA synchronous=FULL',
+    'PRAGMA temp_store=DEFAULT',
+    'PRAGMA cache_size=-2000',
+]
+
 
 def get_database_url():
     url = os.environ.get('DATABASE_URL')
@@ -25,30 +86,403 @@ def chunked(iterable, size):
         yield iterable[i:i+size]
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--source', default='data/processed/reviews_thematic.csv')
-    parser.add_argument('--batch-size', type=int, default=200)
-    args = parser.parse_args()
+def _first_present(df, columns):
+    """Column-wise `a or b or ...`: first non-empty value among `columns`, else None."""
+    out = pd.Series(None, index=df.index, dtype=object)
+    for col in reversed(columns):
+        if col in df.columns:
+            vals = df[col]
+            present = vals.notna() & (vals.astype(str) != '')
+            out = out.mask(present, vals)
+    return out
 
-    src = Path(args.source)
-    if not src.exists():
-        raise FileNotFoundError(f'Source file not found: {src}')
 
-    df = pd.read_csv(src)
-    print('Loaded', src, '->', df.shape)
+def _sha256(*parts):
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(('' if p is None else str(p)).encode('utf-8'))
+        h.update(b'\x1f')
+    return h.hexdigest()
+
+
+def review_key(raw_review_id, bank_id, review_text, review_date):
+    """Natural key: the source's id when present, else a hash of what identifies the review.
+
+    Only the calendar date takes part in the hash, so a key computed from a CSV
+    value ('2024-05-01') matches one computed from the stored timestamp.
+    """
+    if raw_review_id is not None and str(raw_review_id) != '':
+        return str(raw_review_id)
+    day = str(review_date)[:10] if review_date is not None else None
+    return 'h:' + _sha256(bank_id, review_text, day)
+
+
+def add_keys(rows):
+    """Fill `review_key` / `content_hash` on a prepared frame and drop in-batch duplicate keys."""
+    payload = [c for c in REVIEW_COLUMNS if c not in ('review_key', 'content_hash')]
+    if 'identified_themes' in rows.columns:
+        payload.append('identified_themes')
+    rows = rows.copy()
+    rows['review_key'] = [
+        review_key(rid, b, t, d)
+        for rid, b, t, d in zip(rows['raw_review_id'], rows['bank_id'], rows['review_text'], rows['review_date'])
+    ]
+    rows['content_hash'] = [_sha256(*vals) for vals in rows[payload].itertuples(index=False, name=None)]
+    return rows.drop_duplicates(subset=KEY_COLUMNS, keep='last').reset_index(drop=True)
+
+
+def prepare_rows(df, mapping):
+    """Vectorized row preparation: one frame with REVIEW_COLUMNS, NaN replaced by None."""
+    bank_id = df['bank'].map(mapping)
+    keep = bank_id.notna() & (bank_id != 0)
+    df = df[keep]
+
+    out = pd.DataFrame(index=df.index)
+    out['bank_id'] = bank_id[keep].astype('int64')
+    out['review_text'] = _first_present(df, ['review_text', 'review']).fillna('')
+    out['rating'] = pd.to_numeric(df['rating'], errors='coerce').astype('Int64') if 'rating' in df.columns else None
+    out['review_date'] = _first_present(df, ['date', 'review_date'])
+    out['sentiment_label'] = df['sentiment_label'] if 'sentiment_label' in df.columns else None
+    if 'sentiment_score' in df.columns:
+        out['sentiment_score'] = df['sentiment_score']
+    else:
+        out['sentiment_score'] = df['vader'] if 'vader' in df.columns else None
+    out['source'] = df['source'].fillna(DEFAULT_SOURCE) if 'source' in df.columns else DEFAULT_SOURCE
+    out['raw_review_id'] = _first_present(df, ['raw_review_id', 'reviewId'])
+    if 'identified_themes' in df.columns:
+        out['identified_themes'] = df['identified_themes']
+
+    out = out.astype(object)
+    out = out.where(out.notna(), None).reset_index(drop=True)
+    return add_keys(out)
 
-    db_url = get_database_url()
-    engine = create_engine(db_url)
 
-    # load bank mapping
+def _load_insert(engine, rows, batch_size, table='reviews'):
+    insert_sql = text(f'''
+        INSERT INTO {table} ({', '.join(REVIEW_COLUMNS)})
+        VALUES ({', '.join(':' + c for c in REVIEW_COLUMNS)})
+        ON CONFLICT ({', '.join(KEY_COLUMNS)}) DO NOTHING
+    ''')
+    records = rows[REVIEW_COLUMNS].to_dict('records')
+    inserted = 0
+    with engine.begin() as conn:
+        for batch in chunked(records, batch_size):
+            result = conn.execute(insert_sql, batch)
+            # not every driver reports a total for executemany
+            inserted += result.rowcount if result.rowcount >= 0 else len(batch)
+    return inserted
+
+
+def _unstored_keys(engine, rows, batch_size):
+    """(source, review_key) of `rows` that are not in `reviews` yet."""
+    select_sql = text('SELECT source, review_key FROM reviews WHERE review_key IN :keys').bindparams(
+        bindparam('keys', expanding=True))
+    keys = rows[KEY_COLUMNS].drop_duplicates()
+    stored = []
+    with engine.connect() as conn:
+        for batch in chunked(keys['review_key'].tolist(), batch_size):
+            stored += conn.execute(select_sql, {'keys': batch}).fetchall()
+    stored = pd.DataFrame(stored, columns=KEY_COLUMNS)
+    merged = keys.merge(stored, on=KEY_COLUMNS, how='left', indicator=True)
+    return merged.loc[merged['_merge'] == 'left_only', KEY_COLUMNS]
+
+
+def _executemany_sqlite(cur, rows, table, columns=REVIEW_COLUMNS):
+    cur.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        rows[columns].itertuples(index=False, name=None),
+    )
+
+
+def _copy_postgres(cur, rows, table, columns=REVIEW_COLUMNS, chunk_rows=COPY_CHUNK_ROWS):
+    copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    for start in range(0, len(rows), chunk_rows):
+        buf = io.StringIO()
+        rows[columns].iloc[start:start + chunk_rows].to_csv(buf, index=False, header=False, na_rep='\\N')
+        buf.seek(0)
+        if hasattr(cur, 'copy_expert'):
+            cur.copy_expert(copy_sql, buf)  # psycopg2
+        else:
+            with cur.copy(copy_sql) as copy:  # psycopg 3
+                copy.write(buf.getvalue())
+
+
+def _bulk(engine, work):
+    """Run `work(cursor)` on one raw DBAPI connection inside a single transaction."""
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        if engine.dialect.name == 'sqlite':
+            for pragma in SQLITE_BULK_PRAGMAS:
+                cur.execute(pragma)
+            cur.execute('BEGIN')
+        result = work(cur)
+        raw.commit()
+        return result
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        if engine.dialect.name == 'sqlite':
+            cur = raw.cursor()
+            for pragma in SQLITE_RESTORE_PRAGMAS:
+                cur.execute(pragma)
+        raw.close()
+
+
+def _resolve_method(engine, method):
+    if method == 'auto':
+        method = {'postgresql': 'copy', 'sqlite': 'executemany'}.get(engine.dialect.name, 'insert')
+    if method == 'copy' and engine.dialect.name != 'postgresql':
+        raise ValueError('COPY loading requires a PostgreSQL database')
+    if method == 'executemany' and engine.dialect.name != 'sqlite':
+        raise ValueError('executemany bulk loading is only tuned for SQLite')
+    if method not in ('copy', 'executemany', 'insert'):
+        raise ValueError('Unknown load method: ' + method)
+    return method
+
+
+def _bulk_write(cur, rows, method, table, columns=REVIEW_COLUMNS):
+    if method == 'copy':
+        _copy_postgres(cur, rows, table, columns)
+    else:
+        _executemany_sqlite(cur, rows, table, columns)
+
+
+def theme_links(rows):
+    """One (source, review_key, theme_name) row per assigned theme; theme_name is None for reviews without themes."""
+    if 'identified_themes' not in rows.columns:
+        return None
+    themes = rows['identified_themes'].fillna('').astype(str).str.split(';')
+    links = rows[['source', 'review_key']].assign(theme_name=themes).explode('theme_name')
+    links['theme_name'] = links['theme_name'].str.strip()
+    links['theme_name'] = links['theme_name'].where(links['theme_name'] != '', None)
+    return links.drop_duplicates().reset_index(drop=True)
+
+
+def _sync_themes(cur, links, method):
+    """Replace the review_themes rows of every review key in `links`."""
+    cur.execute(f'DROP TABLE IF EXISTS {THEME_STAGING_TABLE}')
+    cur.execute(f'CREATE TEMPORARY TABLE {THEME_STAGING_TABLE} (source TEXT, review_key TEXT, theme_name TEXT)')
+    _bulk_write(cur, links.astype(object).where(links.notna(), None), method, THEME_STAGING_TABLE,
+                THEME_LINK_COLUMNS)
+    match = 'r.source = s.source AND r.review_key = s.review_key'
+    cur.execute(
+        f'INSERT INTO themes (theme_name) SELECT DISTINCT theme_name FROM {THEME_STAGING_TABLE} '
+        'WHERE theme_name IS NOT NULL ON CONFLICT (theme_name) DO NOTHING'
+    )
+    cur.execute(
+        'DELETE FROM review_themes WHERE review_id IN '
+        f'(SELECT r.review_id FROM reviews r JOIN {THEME_STAGING_TABLE} s ON {match})'
+    )
+    cur.execute(
+        'INSERT INTO review_themes (review_id, theme_id, bank_id) '
+        f'SELECT DISTINCT r.review_id, t.theme_id, r.bank_id FROM {THEME_STAGING_TABLE} s '
+        f'JOIN reviews r ON {match} JOIN themes t ON t.theme_name = s.theme_name'
+    )
+    cur.execute(f'DROP TABLE {THEME_STAGING_TABLE}')
+
+
+def _bulk_method(engine):
+    return 'copy' if engine.dialect.name == 'postgresql' else 'executemany'
+
+
+def rollup_tables(engine):
+    """(bank rollups, theme rollups): which of the daily rollup tables the database has."""
+    insp = inspect(engine)
+    has_bank = insp.has_table(rollups.BANK_TABLE)
+    return has_bank, has_bank and insp.has_table(rollups.THEME_TABLE) and insp.has_table('review_themes')
+
+
+def _route_partitions(cur, engine, rows):
+    """Create the month partitions `rows` need when `reviews` is partitioned; returns the layout (or None)."""
+    if engine.dialect.name != 'postgresql':
+        return None
+    kind = pg_partitions.layout(cur)
+    if kind is not None:
+        pg_partitions.ensure_months(cur, pg_partitions.months_of(rows['review_date']), kind)
+    return kind
+
+
+def _stage_rows(cur, rows, method):
+    """Bulk-write `rows` into a fresh temporary staging table shaped like `reviews`."""
+    cols = ', '.join(REVIEW_COLUMNS)
+    cur.execute(f'DROP TABLE IF EXISTS {STAGING_TABLE}')
+    cur.execute(f'CREATE TEMPORARY TABLE {STAGING_TABLE} AS SELECT {cols} FROM reviews WHERE 1 = 0')
+    _bulk_write(cur, rows, method, STAGING_TABLE)
+
+
+def _staged_keys(cur, condition='r.review_id IS NULL'):
+    """(source, review_key) of the staged rows matching `condition` against the stored ones."""
+    cur.execute(
+        f'SELECT s.source, s.review_key FROM {STAGING_TABLE} s LEFT JOIN reviews r '
+        f'ON r.source = s.source AND r.review_key = s.review_key WHERE {condition}'
+    )
+    return pd.DataFrame(cur.fetchall(), columns=KEY_COLUMNS)
+
+
+def load_rows(engine, rows, method='auto', batch_size=200, themes=True):
+    """Append prepared rows with the chosen method; returns the number of rows inserted.
+
+    Rows whose (source, review_key) is already stored are skipped rather than
+    failing the load; use `upsert_rows` to also apply changes to them.
+    """
+    method = _resolve_method(engine, method)
+    links = theme_links(rows) if themes else None
+    bank_rollups, theme_rollups = rollup_tables(engine)
+
+    def update_rollups(cur, method):
+        rollups.begin_touched(cur)
+        _bulk_write(cur, rows, method, rollups.TOUCHED_TABLE, ['bank_id', 'review_date'])
+        rollups.refresh_touched(cur, engine.dialect.name, themes=theme_rollups)
+
+    if method == 'insert':
+        if _bulk(engine, lambda cur: _route_partitions(cur, engine, rows)) is None:
+            # only reviews this load adds get their theme links written; skipped keys keep theirs
+            new = _unstored_keys(engine, rows, batch_size) if links is not None else None
+            inserted = _load_insert(engine, rows, batch_size)
+            if new is not None and len(new):
+                _bulk(engine, lambda cur: _sync_themes(cur, links.merge(new, on=KEY_COLUMNS), _bulk_method(engine)))
+            if bank_rollups:
+                _bulk(engine, lambda cur: update_rollups(cur, _bulk_method(engine)))
+            return inserted
+        # a partitioned table has no (source, review_key) index to resolve ON CONFLICT against
+        method = _bulk_method(engine)
+
+    def work(cur):
+        partitioned = _route_partitions(cur, engine, rows) is not None
+        _stage_rows(cur, rows, method)
+        new = _staged_keys(cur) if links is not None else None
+        cols = ', '.join(REVIEW_COLUMNS)
+        if partitioned:
+            cur.execute('LOCK TABLE reviews IN SHARE ROW EXCLUSIVE MODE')
+            cur.execute(pg_partitions.MERGE_SQL[1].format(cols=cols, staging=STAGING_TABLE))
+        else:
+            # `WHERE true` disambiguates INSERT ... SELECT ... ON CONFLICT for SQLite's parser
+            cur.execute(f'INSERT INTO reviews ({cols}) SELECT {cols} FROM {STAGING_TABLE} WHERE true '
+                        f'ON CONFLICT ({", ".join(KEY_COLUMNS)}) DO NOTHING')
+        inserted = cur.rowcount
+        cur.execute(f'DROP TABLE {STAGING_TABLE}')
+        if new is not None and len(new):
+            _sync_themes(cur, links.merge(new, on=KEY_COLUMNS), method)
+        if bank_rollups:
+            update_rollups(cur, method)
+        return inserted
+
+    return _bulk(engine, work)
+
+
+def _upsert_sql(dialect):
+    updates = [c for c in REVIEW_COLUMNS if c not in KEY_COLUMNS]
+    distinct = 'IS DISTINCT FROM' if dialect == 'postgresql' else 'IS NOT'
+    cols = ', '.join(REVIEW_COLUMNS)
+    # `WHERE true` disambiguates INSERT ... SELECT ... ON CONFLICT for SQLite's parser
+    return (
+        f'INSERT INTO reviews ({cols}) SELECT {cols} FROM {STAGING_TABLE} WHERE true '
+        f'ON CONFLICT ({", ".join(KEY_COLUMNS)}) DO UPDATE SET '
+        + ', '.join(f'{c} = excluded.{c}' for c in updates)
+        + f' WHERE reviews.content_hash {distinct} excluded.content_hash'
+    )
+
+
+def _merge_partitioned(cur):
+    """Upsert the staging table into a partitioned `reviews`; returns the rows inserted or changed."""
+    cols = ', '.join(REVIEW_COLUMNS)
+    updates = ', '.join(f'{c} = s.{c}' for c in REVIEW_COLUMNS if c not in KEY_COLUMNS)
+    # one loader at a time: the NOT EXISTS check stands in for the unique (source, review_key) index
+    cur.execute('LOCK TABLE reviews IN SHARE ROW EXCLUSIVE MODE')
+    touched = 0
+    for sql in pg_partitions.MERGE_SQL:
+        cur.execute(sql.format(cols=cols, updates=updates, staging=STAGING_TABLE))
+        touched += cur.rowcount
+    return touched
+
+
+def upsert_rows(engine, rows, method='auto', themes=True):
+    """Merge prepared rows through a staging table; returns the number of inserted or changed rows."""
+    method = _resolve_method(engine, method)
+    if method == 'insert':
+        method = _bulk_method(engine)
+    links = theme_links(rows) if themes else None
+    bank_rollups, theme_rollups = rollup_tables(engine)
+    distinct = 'IS DISTINCT FROM' if engine.dialect.name == 'postgresql' else 'IS NOT'
+    # only reviews that are new or whose content changed need their theme links and rollups rebuilt
+    is_changed = f'r.review_id IS NULL OR r.content_hash {distinct} s.content_hash'
+
+    def work(cur):
+        partitioned = _route_partitions(cur, engine, rows) is not None
+        _stage_rows(cur, rows, method)
+        if links is not None:
+            changed = _staged_keys(cur, is_changed)
+        if bank_rollups:
+            # before the merge, so reviews that move to another day or bank refresh both
+            rollups.begin_touched(cur)
+            rollups.touch_staged(cur, STAGING_TABLE, is_changed)
+        if partitioned:
+            touched = _merge_partitioned(cur)
+        else:
+            cur.execute(_upsert_sql(engine.dialect.name))
+            touched = cur.rowcount
+        cur.execute(f'DROP TABLE {STAGING_TABLE}')
+        if links is not None and len(changed):
+            _sync_themes(cur, links.merge(changed, on=['source', 'review_key']), method)
+        if bank_rollups:
+            rollups.refresh_touched(cur, engine.dialect.name, themes=theme_rollups)
+        return touched
+
+    return _bulk(engine, work)
+
+
+def ensure_review_keys(engine):
+    """Upgrade a pre-upsert `reviews` table in place.
+
+    Adds `review_key` / `content_hash` if missing, backfills keys for legacy rows,
+    deletes duplicate legacy rows (keeping the lowest review_id per key) and makes
+    sure the unique index exists. A no-op once every row has a key.
+    """
+    with engine.begin() as conn:
+        existing = {c['name'] for c in inspect(conn).get_columns('reviews')}
+        for col in ('review_key', 'content_hash'):
+            if col not in existing:
+                conn.execute(text(f'ALTER TABLE reviews ADD COLUMN {col} TEXT'))
+        conn.execute(text(f"UPDATE reviews SET source = '{DEFAULT_SOURCE}' WHERE source IS NULL"))
+
+        legacy = conn.execute(text(
+            'SELECT review_id, bank_id, review_text, review_date, raw_review_id, source '
+            'FROM reviews WHERE review_key IS NULL ORDER BY review_id'
+        )).fetchall()
+        if legacy:
+            keyed = conn.execute(text('SELECT source, review_key FROM reviews WHERE review_key IS NOT NULL'))
+            taken = {tuple(r) for r in keyed}
+            updates, duplicates = [], []
+            for rid, bank_id, review_text, review_date, raw_id, source in legacy:
+                # review_date comes back as a datetime on some drivers
+                date = review_date.isoformat() if hasattr(review_date, 'isoformat') else review_date
+                key = review_key(raw_id, bank_id, review_text, date)
+                if (source, key) in taken:
+                    duplicates.append({'rid': rid})
+                else:
+                    taken.add((source, key))
+                    updates.append({'rid': rid, 'key': key})
+            if duplicates:
+                conn.execute(text('DELETE FROM reviews WHERE review_id = :rid'), duplicates)
+            if updates:
+                conn.execute(text('UPDATE reviews SET review_key = :key WHERE review_id = :rid'), updates)
+            print(f'Backfilled keys for {len(updates)} legacy rows; removed {len(duplicates)} duplicates')
+
+        # a partitioned reviews has its own key index (see src/pg_partitions.py); this one cannot be created there
+        if engine.dialect.name != 'postgresql' or pg_partitions.layout(conn.connection.cursor()) is None:
+            conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS uq_reviews_source_key ON reviews(source, review_key)'))
+
+
+def bank_mapping(engine, bank_names):
+    """Map bank names to `banks.bank_id`, inserting any bank that is missing."""
     with engine.connect() as conn:
         res = conn.execute(text('SELECT bank_id, bank_name FROM banks'))
         # result rows may be tuples depending on DB driver; map by index for safety
         mapping = {row[1]: row[0] for row in res}
 
     # if some banks missing, insert them
-    bank_names = df['bank'].dropna().unique().tolist()
     with engine.begin() as conn:
         for b in bank_names:
             if b not in mapping:
@@ -61,53 +495,56 @@ def main():
                 sel = conn.execute(text('SELECT bank_id FROM banks WHERE bank_name = :b'), {'b': b})
                 row = sel.fetchone()
                 mapping[b] = row[0] if row is not None else None
+    return mapping
 
-    print('Bank mapping:', mapping)
 
-    # prepare rows
-    rows = []
-    for _, r in df.iterrows():
-        bank = r.get('bank')
-        bank_id = mapping.get(bank)
-        if not bank_id:
-            continue
-        review_text = r.get('review_text') or r.get('review') or ''
-        rating = int(r.get('rating')) if pd.notna(r.get('rating')) else None
-        review_date = r.get('date') or r.get('review_date')
-        sentiment_label = r.get('sentiment_label')
-        sentiment_score = r.get('sentiment_score') if 'sentiment_score' in r else (r.get('vader') if 'vader' in r else None)
-        source = r.get('source') if 'source' in r else 'google_play'
-        raw_review_id = r.get('reviewId') if 'reviewId' in r else None
-        rows.append((bank_id, review_text, rating, review_date, sentiment_label, sentiment_score, source, raw_review_id))
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', default='data/processed/reviews_thematic.csv')
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--method', default='auto', choices=['auto', 'copy', 'executemany', 'insert'])
+    parser.add_argument('--mode', default='upsert', choices=['upsert', 'append'],
+                        help='upsert merges on (source, review_key); append only inserts new keys')
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    src = Path(args.source)
+    if not processed_exists(src):
+        raise FileNotFoundError(f'Source file not found: {src}')
+
+    df = load_processed(src)
+    print('Loaded', src, '->', df.shape)
+
+    db_url = get_database_url()
+    engine = get_engine(db_url)
+    mapping = bank_mapping(engine, df['bank'].dropna().unique().tolist())
+    print('Bank mapping:', mapping)
 
+    rows = prepare_rows(df, mapping)
     total = len(rows)
     print(f'Prepared {total} rows to insert')
 
-    inserted = 0
-    insert_sql = text('''
-        INSERT INTO reviews (bank_id, review_text, rating, review_date, sentiment_label, sentiment_score, source, raw_review_id)
-        VALUES (:bank_id, :review_text, :rating, :review_date, :sentiment_label, :sentiment_score, :source, :raw_review_id)
-    ''')
-
-    with engine.begin() as conn:
-        for batch in chunked(rows, args.batch_size):
-            params = [
-                {
-                    'bank_id': b,
-                    'review_text': rt,
-                    'rating': rating,
-                    'review_date': review_date,
-                    'sentiment_label': sentiment_label,
-                    'sentiment_score': sentiment_score,
-                    'source': source,
-                    'raw_review_id': raw_review_id,
-                }
-                for (b, rt, rating, review_date, sentiment_label, sentiment_score, source, raw_review_id) in batch
-            ]
-            conn.execute(insert_sql, params)
-            inserted += len(batch)
-
-    print(f'Inserted {inserted} rows into reviews table')
+    ensure_review_keys(engine)
+    themes = 'identified_themes' in rows.columns
+    if themes and not inspect(engine).has_table('review_themes'):
+        print('review_themes table missing; re-run the schema setup (db_init) to load themes')
+        themes = False
+    if not rollup_tables(engine)[0]:
+        print('daily rollup tables missing; re-run the schema setup (db_init) to maintain them')
+    start = time.perf_counter()
+    with stage('db_insert', rows=total, mode=args.mode, method=args.method, dialect=engine.dialect.name) as m:
+        if args.mode == 'upsert':
+            touched = upsert_rows(engine, rows, method=args.method, themes=themes)
+            m.labels['changed'] = touched
+            verb = f'Upserted {total} rows ({touched} new or changed)'
+        else:
+            inserted = load_rows(engine, rows, method=args.method, batch_size=args.batch_size, themes=themes)
+            m.labels['inserted'] = inserted
+            verb = f'Appended {total} rows ({inserted} new)'
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else float('inf')
+    print(f'{verb} into reviews table in {elapsed:.2f}s ({rate:,.0f} rows/s)')
 
 
 if __name__ == '__main__':
@@ -2,18 +2,59 @@
 
 Usage:
     python scripts/preprocess_reviews.py
+    python scripts/preprocess_reviews.py --stream --chunksize 50000 --dedupe bloom
+    python scripts/preprocess_reviews.py --format both
+    python scripts/preprocess_reviews.py --near-dupes --near-dupe-threshold 0.8 [--drop-near-dupes]
 
 Output:
     data/processed/reviews_clean.csv
+    data/processed/reviews_clean.parquet/  (with --format parquet/both; partitioned by bank and month)
+
+`--stream` reads each raw file in fixed-size chunks, dedupes through a digest
+set (`--dedupe exact`) or a fixed-size Bloom filter (`--dedupe bloom`), and
+appends cleaned chunks to the output as it goes, so peak memory no longer
+grows with the size of the raw archive.
+
+`--near-dupes` adds a `cluster_id` column grouping reviews whose character
+shingles overlap by at least `--near-dupe-threshold` (estimated Jaccard
+similarity, MinHash + LSH, see src/minhash.py); the first review of each
+cluster is its representative and the cluster id is that review's position
+among representatives. `--drop-near-dupes` keeps only the representatives.
+Works in both batch and `--stream` mode; clusters span chunks and files.
+
+Raw files are tracked in the raw-data catalog (src/catalog.py). When their
+contents and the options are the same as for the existing output, the run is
+skipped; `--force` rebuilds anyway.
 """
+import argparse
+import sys
 from pathlib import Path
 import pandas as pd
 from dateutil import parser
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.catalog import CATALOG_PATH, RawCatalog  # noqa: E402
+from src.dedupe import make_deduper  # noqa: E402
+from src.instrumentation import add_arguments, configure_from_args, stage  # noqa: E402
+from src.minhash import DEFAULT_NUM_PERM, DEFAULT_THRESHOLD, NearDuplicateIndex  # noqa: E402
+from src.storage import FORMATS, META_FILE, parquet_path, save_processed, write_parquet  # noqa: E402
+
 
 RAW_DIR = Path("data/raw")
 OUT_DIR = Path("data/processed")
 OUT_FILE = OUT_DIR / "reviews_clean.csv"
+OUT_COLUMNS = ["review", "rating", "date", "bank", "source", "raw_review_id"]
+CLUSTER_COLUMN = "cluster_id"
+DEFAULT_CHUNKSIZE = 50_000
+
+# Formats tried for the bulk fast path; the scraper writes `at.isoformat()`
+DATE_FORMATS = [
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+]
+DATE_SAMPLE_SIZE = 1000
 
 
 def normalize_date(val):
@@ -30,47 +71,251 @@ def normalize_date(val):
             return None
 
 
-def run():
+def detect_date_format(values, formats=DATE_FORMATS, sample_size=DATE_SAMPLE_SIZE):
+    """Return the format in `formats` that parses most of a sample of `values`, or None."""
+    sample = values[:sample_size]
+    if len(sample) == 0:
+        return None
+    best, best_hits = None, 0
+    for fmt in formats:
+        hits = pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum()
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+    return best
+
+
+def normalize_dates(dates):
+    """Vectorized `normalize_date` over a Series.
+
+    Values matching the dominant format are parsed in bulk with `pd.to_datetime`;
+    only the rest go through the per-row dateutil path. Returns the normalized
+    Series and a dict with the row counts for each path.
+    """
+    out = pd.Series(None, index=dates.index, dtype=object)
+    is_str = dates.map(lambda v: isinstance(v, str) and v != "")
+    strings = dates[is_str].astype(str)
+    fmt = detect_date_format(strings)
+
+    fast = pd.Series(False, index=dates.index)
+    if fmt is not None:
+        parsed = pd.to_datetime(strings, format=fmt, errors="coerce")
+        ok = parsed.notna()
+        out[ok[ok].index] = parsed[ok].dt.strftime("%Y-%m-%d")
+        fast[ok[ok].index] = True
+
+    slow = ~fast & dates.notna() & (dates.astype(str) != "")
+    out[slow] = dates[slow].apply(normalize_date)
+    out = out.astype(object).where(out.notna(), None)
+    return out, {"format": fmt, "fast": int(fast.sum()), "slow": int(slow.sum())}
+
+
+def prepare_frame(df, f):
+    """Map a raw scraper frame from file `f` onto the cleaned column layout."""
+    # Ensure expected columns
+    for col in ["content", "score", "at"]:
+        if col not in df.columns:
+            df[col] = None
+    df = df.rename(columns={"content": "review", "score": "rating", "at": "date"})
+    df["bank"] = df.get("bank") if "bank" in df.columns else f.stem.replace("raw_", "")
+    df["source"] = df.get("source") if "source" in df.columns else "google_play"
+    # the store's review id; files scraped before it was recorded have none
+    ids = df["reviewId"] if "reviewId" in df.columns else pd.Series(None, index=df.index)
+    df["raw_review_id"] = ids.astype("string")
+    return df[OUT_COLUMNS]
+
+
+def report(total, missing):
+    missing_pct = (missing / (total * 2)) * 100 if total > 0 else 0
+    print(f"Rows after dedupe & drop: {total}")
+    print(f"Approx missing (%) across date+rating fields: {missing_pct:.2f}%")
+
+
+def mark_near_duplicates(df, index, drop=False):
+    """Add the `NearDuplicateIndex` cluster id of every review; with `drop`, keep one review per cluster."""
+    cluster_ids, representative = index.assign(df["review"].tolist())
+    df = df.assign(**{CLUSTER_COLUMN: cluster_ids})
+    return df[representative] if drop else df
+
+
+def output_paths(fmt):
+    """Files a run with storage format `fmt` writes (the Parquet dataset by its metadata file)."""
+    paths = [OUT_FILE] if fmt in ("csv", "both") else []
+    if fmt in ("parquet", "both"):
+        paths.append(parquet_path(OUT_FILE) / META_FILE)
+    return paths
+
+
+def near_dupe_settings(near_dupes, drop_near_dupes):
+    if near_dupes is None:
+        return None
+    hasher = near_dupes.hasher
+    return [near_dupes.threshold, hasher.num_perm, hasher.shingle_size, drop_near_dupes]
+
+
+def check_inputs(files, fmt, settings, force=False):
+    """Refresh the raw catalog for `files`; returns (catalog, inputs digest, whether the outputs are current)."""
+    catalog = RawCatalog.load(CATALOG_PATH) or RawCatalog()
+    scanned = catalog.refresh(files)
+    catalog.save(CATALOG_PATH)
+    digest = catalog.inputs_digest(files, settings)
+    current = not force and catalog.output_current(output_paths(fmt), digest)
+    if current:
+        print(f"Raw inputs unchanged since the last run ({len(files)} files); skipping. Use --force to rebuild.")
+    elif scanned:
+        print(f"Catalogued {len(scanned)} new or changed raw file(s)")
+    return catalog, digest, current
+
+
+def record_outputs(catalog, fmt, digest):
+    catalog.record_output(output_paths(fmt), digest)
+    catalog.save(CATALOG_PATH)
+
+
+def run(fmt="csv", near_dupes=None, drop_near_dupes=False, force=False):
     OUT_DIR.mkdir(parents=True, exist_ok=True)
-    files = list(RAW_DIR.glob("raw_*.csv"))
+    files = sorted(RAW_DIR.glob("raw_*.csv"))
     if not files:
         print("No raw CSV files found in data/raw/. Run the scraper first.")
         return
 
-    dfs = []
-    for f in files:
-        df = pd.read_csv(f)
-        # Ensure expected columns
-        for col in ["content", "score", "at"]:
-            if col not in df.columns:
-                df[col] = None
-        df = df.rename(columns={"content": "review", "score": "rating", "at": "date"})
-        df["bank"] = df.get("bank") if "bank" in df.columns else f.stem.replace("raw_", "")
-        df["source"] = df.get("source") if "source" in df.columns else "google_play"
-        dfs.append(df[["review", "rating", "date", "bank", "source"]])
-
-    combined = pd.concat(dfs, ignore_index=True)
-
-    # Drop duplicates based on review text
-    combined["review"] = combined["review"].astype(str)
-    combined = combined.drop_duplicates(subset=["review"])    
-
-    # Drop rows with missing review text
-    combined = combined[combined["review"].str.strip() != ""]
-
-    # Normalize dates
-    combined["date"] = combined["date"].apply(normalize_date)
-
-    # Report missing data percentage
-    total = len(combined)
-    missing = combined["date"].isna().sum() + combined["rating"].isna().sum()
-    missing_pct = (missing / (total * 2)) * 100 if total > 0 else 0
-    print(f"Rows after dedupe & drop: {total}")
-    print(f"Approx missing (%) across date+rating fields: {missing_pct:.2f}%")
+    settings = {"mode": "batch", "format": fmt, "near_dupes": near_dupe_settings(near_dupes, drop_near_dupes)}
+    catalog, digest, current = check_inputs(files, fmt, settings, force)
+    if current:
+        return
+    combined = preprocess_files(files, near_dupes, drop_near_dupes)
+    for path in save_processed(combined, OUT_FILE, fmt):
+        print(f"Saved cleaned reviews to {path}")
+    record_outputs(catalog, fmt, digest)
+
+
+def preprocess_files(files, near_dupes=None, drop_near_dupes=False):
+    """Clean and combine the raw CSVs in `files` into one frame (what `run` saves).
+
+    `near_dupes` is an optional `NearDuplicateIndex` used to add `cluster_id`.
+    """
+    with stage("preprocess", mode="batch") as m:
+        dfs = []
+        for f in files:
+            dfs.append(prepare_frame(pd.read_csv(f), f))
+
+        combined = pd.concat(dfs, ignore_index=True)
+        m.rows = len(combined)
+
+        # Drop duplicates based on review text
+        combined["review"] = combined["review"].astype(str)
+        combined = combined.drop_duplicates(subset=["review"])
+
+        # Drop rows with missing review text
+        combined = combined[combined["review"].str.strip() != ""]
+
+        if near_dupes is not None:
+            combined = mark_near_duplicates(combined, near_dupes, drop_near_dupes)
+            print(f"Near-duplicates: {len(near_dupes)} clusters at threshold {near_dupes.threshold}")
+
+        # Normalize dates
+        combined["date"], date_stats = normalize_dates(combined["date"])
+        print(f"Dates: {date_stats['fast']} parsed in bulk ({date_stats['format']}), {date_stats['slow']} via dateutil")
+
+        # Report missing data percentage
+        total = len(combined)
+        missing = combined["date"].isna().sum() + combined["rating"].isna().sum()
+        report(total, missing)
+        m.labels["rows_out"] = total
+    return combined
+
+
+def run_streaming(chunksize=DEFAULT_CHUNKSIZE, dedupe="exact", fmt="csv", near_dupes=None, drop_near_dupes=False,
+                  force=False, **dedupe_kwargs):
+    """Chunked variant of `run` with the same output rows and order."""
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    files = sorted(RAW_DIR.glob("raw_*.csv"))
+    if not files:
+        print("No raw CSV files found in data/raw/. Run the scraper first.")
+        return
+
+    settings = {"mode": "stream", "format": fmt, "dedupe": [dedupe, dedupe_kwargs],
+                "near_dupes": near_dupe_settings(near_dupes, drop_near_dupes)}
+    catalog, digest, current = check_inputs(files, fmt, settings, force)
+    if current:
+        return
+
+    with stage("preprocess", mode="stream", dedupe=dedupe) as m:
+        seen = make_deduper(dedupe, **dedupe_kwargs)
+        tmp = OUT_FILE.with_name(OUT_FILE.name + ".tmp")
+        total = missing = fast_dates = slow_dates = rows_in = 0
+        header = True
+        part = 0
+        for f in files:
+            for chunk in pd.read_csv(f, chunksize=chunksize):
+                rows_in += len(chunk)
+                chunk = prepare_frame(chunk, f)
+                chunk["review"] = chunk["review"].astype(str)
+                chunk = chunk[seen.filter_new(chunk["review"].tolist())]
+                chunk = chunk[chunk["review"].str.strip() != ""]
+                if near_dupes is not None:
+                    chunk = mark_near_duplicates(chunk, near_dupes, drop_near_dupes)
+                chunk["date"], date_stats = normalize_dates(chunk["date"])
+                fast_dates += date_stats["fast"]
+                slow_dates += date_stats["slow"]
+                # keep ratings integral even when a chunk happens to contain gaps
+                chunk["rating"] = pd.to_numeric(chunk["rating"], errors="coerce").astype("Int64")
+
+                total += len(chunk)
+                missing += chunk["date"].isna().sum() + chunk["rating"].isna().sum()
+                if fmt in ("csv", "both"):
+                    chunk.to_csv(tmp, mode="w" if header else "a", header=header, index=False)
+                if fmt in ("parquet", "both") and len(chunk):
+                    write_parquet(chunk, parquet_path(OUT_FILE), append=part > 0, part=part, row_offset=total - len(chunk))
+                    part += 1
+                header = False
+
+        print(f"Dates: {fast_dates} parsed in bulk, {slow_dates} via dateutil")
+        if near_dupes is not None:
+            print(f"Near-duplicates: {len(near_dupes)} clusters at threshold {near_dupes.threshold}")
+        report(total, missing)
+        columns = OUT_COLUMNS + ([CLUSTER_COLUMN] if near_dupes is not None else [])
+        if fmt in ("csv", "both"):
+            if header:
+                pd.DataFrame(columns=columns).to_csv(tmp, index=False)
+            tmp.replace(OUT_FILE)
+            print(f"Saved cleaned reviews to {OUT_FILE} (streamed, dedupe={dedupe})")
+        if fmt in ("parquet", "both"):
+            if part == 0:
+                write_parquet(pd.DataFrame(columns=columns), parquet_path(OUT_FILE))
+            print(f"Saved cleaned reviews to {parquet_path(OUT_FILE)} (streamed, dedupe={dedupe})")
+        m.rows = rows_in
+        m.labels["rows_out"] = total
+    record_outputs(catalog, fmt, digest)
+
 
-    combined.to_csv(OUT_FILE, index=False)
-    print(f"Saved cleaned reviews to {OUT_FILE}")
+def cli():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stream", action="store_true", help="process raw files chunk by chunk")
+    ap.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    ap.add_argument("--dedupe", default="exact", choices=["exact", "bloom"])
+    ap.add_argument("--bloom-capacity", type=int, default=10_000_000)
+    ap.add_argument("--bloom-error-rate", type=float, default=1e-4)
+    ap.add_argument("--format", default="csv", choices=FORMATS, help="output storage format")
+    ap.add_argument("--near-dupes", action="store_true", help="add a near-duplicate cluster_id column")
+    ap.add_argument("--near-dupe-threshold", type=float, default=DEFAULT_THRESHOLD,
+                    help="estimated Jaccard similarity of character shingles to join a cluster")
+    ap.add_argument("--near-dupe-perms", type=int, default=DEFAULT_NUM_PERM, help="MinHash signature length")
+    ap.add_argument("--drop-near-dupes", action="store_true", help="keep one representative per cluster")
+    ap.add_argument("--force", action="store_true", help="rebuild even if the raw inputs are unchanged")
+    add_arguments(ap)
+    args = ap.parse_args()
+    configure_from_args(args)
+    near_dupes = None
+    if args.near_dupes or args.drop_near_dupes:
+        near_dupes = NearDuplicateIndex(args.near_dupe_threshold, num_perm=args.near_dupe_perms)
+    if not args.stream:
+        run(args.format, near_dupes, args.drop_near_dupes, args.force)
+    elif args.dedupe == "bloom":
+        run_streaming(args.chunksize, "bloom", args.format, near_dupes, args.drop_near_dupes, args.force,
+                      capacity=args.bloom_capacity, error_rate=args.bloom_error_rate)
+    else:
+        run_streaming(args.chunksize, "exact", args.format, near_dupes, args.drop_near_dupes, args.force)
 
 
 if __name__ == "__main__":
-    run()
+    cli()
@@ -0,0 +1,66 @@
+"""Rebuild the daily per-bank rollup tables from `reviews`.
+
+Usage:
+  $env:DATABASE_URL = 'sqlite:///data/bank_reviews.db'
+  python scripts/refresh_rollups.py                     # everything
+  python scripts/refresh_rollups.py --since 2024-05-01  # every day from 2024-05-01 on
+
+The loader keeps `daily_bank_stats` / `daily_theme_stats` current on its own;
+a refresh is only needed after editing `reviews` by other means, or once after
+creating the tables on a database that already holds reviews.
+
+On a partitioned `reviews` (see scripts/partition_reviews.py) a full refresh
+starts at the oldest attached month instead, so the rollups of archived months
+are kept.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from sqlalchemy import text
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from scripts.insert_reviews_to_postgres import _bulk, rollup_tables  # noqa: E402
+from src import pg_partitions, rollups  # noqa: E402
+from src.db import get_engine  # noqa: E402
+from src.instrumentation import add_arguments, configure_from_args, stage  # noqa: E402
+
+
+def get_database_url():
+    return os.environ.get('DATABASE_URL', 'sqlite:///data/bank_reviews.db')
+
+
+def refresh_rollups(engine, since=None):
+    """Rebuild the rollups in one transaction; returns the number of daily bank rows afterwards."""
+    bank_rollups, theme_rollups = rollup_tables(engine)
+    if not bank_rollups:
+        raise RuntimeError('daily rollup tables missing; re-run the schema setup (db_init) first')
+
+    def work(cur):
+        start = since
+        if since is None and engine.dialect.name == 'postgresql':
+            start = pg_partitions.history_start(cur)
+        rollups.refresh(cur, engine.dialect.name, since=start, themes=theme_rollups, undated=since is None)
+
+    _bulk(engine, work)
+    with engine.connect() as conn:
+        return conn.execute(text(f'SELECT COUNT(*) FROM {rollups.BANK_TABLE}')).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--since', default=None, help='only rebuild days on or after this date (YYYY-MM-DD)')
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    engine = get_engine(get_database_url())
+    start = time.perf_counter()
+    with stage('rollup_refresh', since=args.since, dialect=engine.dialect.name) as m:
+        m.rows = refresh_rollups(engine, args.since)
+    print(f'Refreshed rollups ({m.rows} daily bank rows) in {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,68 +1,176 @@
-"""Generate and save EDA plots into notebooks/outputs/."""
+"""Generate and save EDA plots into notebooks/outputs/.
+
+Usage:
+    python scripts/save_eda_outputs.py
+    python scripts/save_eda_outputs.py --workers 4 --force
+
+All figure data (rating counts, the bank x sentiment crosstab and the top negative
+words of every bank) is computed up front in one grouped pass. Figures are then
+rendered with the Agg backend, on a process pool when `--workers` > 1. A digest of
+each figure's data is kept in `<out>/.eda_digests.json`; figures whose data and file
+are unchanged are not rendered again unless `--force` is given.
+"""
+import argparse
+import hashlib
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import pandas as pd
+import matplotlib
 import matplotlib.pyplot as plt
 import seaborn as sns
-from collections import Counter
-import re
 from nltk.corpus import stopwords
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.instrumentation import add_arguments, configure_from_args, stage  # noqa: E402
+from src.storage import load_processed, processed_exists  # noqa: E402
+
+EDA_COLUMNS = ['review', 'rating', 'bank', 'sentiment_label']
+DIGEST_FILE = ".eda_digests.json"
+TOP_WORDS = 15
+
 
 def main():
-    DATA_PATH = Path("data/processed/reviews_clean.csv")
-    out = Path("notebooks/outputs")
-    out.mkdir(parents=True, exist_ok=True)
-    if not DATA_PATH.exists():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--path', default='data/processed/reviews_clean.csv')
+    parser.add_argument('--out', default='notebooks/outputs')
+    parser.add_argument('--workers', type=int, default=1, help='render figures on this many processes')
+    parser.add_argument('--force', action='store_true', help='re-render figures whose data is unchanged')
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    DATA_PATH = Path(args.path)
+    if not processed_exists(DATA_PATH):
         print("Cleaned data not found at", DATA_PATH)
         return
-    df = pd.read_csv(DATA_PATH)
-    stop = set(stopwords.words('english'))
-    regex = re.compile(r"[^a-zA-Z\s]")
-
-    # Ratings distribution
-    plt.figure(figsize=(6,4))
-    sns.countplot(x='rating', data=df, palette='viridis')
-    plt.title('Ratings distribution (all banks)')
-    plt.tight_layout()
-    plt.savefig(out / 'ratings_distribution.png', dpi=150)
-    plt.close()
+    matplotlib.use("Agg")
+    df = load_processed(DATA_PATH, columns=EDA_COLUMNS)
+    render_eda(df, Path(args.out), workers=args.workers, force=args.force)
+
+
+def negative_word_counts(df, stop, top_n=TOP_WORDS):
+    """Top `top_n` words of the negative reviews of every bank, as a (bank, word) -> count Series.
+
+    Same tokens as the per-bank loop this replaces (letters only, lowercased, longer
+    than two characters, stopwords dropped); ties keep first-seen order like Counter.
+    """
+    if 'sentiment_label' in df.columns:
+        df = df[df['sentiment_label'] == 'neg']
+    tokens = (df['review'].astype(str)
+              .str.replace(r"[^a-zA-Z\s]", " ", regex=True)
+              .str.lower()
+              .str.split())
+    words = pd.DataFrame({'bank': df['bank'].to_numpy(), 'word': tokens.to_numpy()}).explode('word')
+    words = words[words['word'].notna()]
+    words = words[(words['word'].str.len() > 2) & ~words['word'].isin(stop)]
+    counts = words.groupby(['bank', 'word'], sort=False).size()
+    counts = counts.sort_values(ascending=False, kind='stable')
+    return counts.groupby(level='bank', sort=True).head(top_n)
 
-    # Sentiment heatmap by bank (ensure sentiment_label exists)
+
+def eda_aggregates(df, stop):
+    """Figure file name -> (render function name, data, title) for every EDA figure."""
+    figures = {
+        'ratings_distribution.png': ('ratings', df['rating'].value_counts().sort_index(),
+                                     'Ratings distribution (all banks)'),
+    }
     if 'sentiment_label' not in df.columns:
         print('Warning: sentiment_label column missing; computing with vaderSentiment is recommended in notebook.')
     else:
         ct = pd.crosstab(df['bank'], df['sentiment_label'], normalize='index')
-        plt.figure(figsize=(6,3))
-        sns.heatmap(ct, annot=True, cmap='vlag')
-        plt.title('Sentiment distribution by bank')
-        plt.tight_layout()
-        plt.savefig(out / 'sentiment_by_bank.png', dpi=150)
-        plt.close()
-
-    # Top negative words per bank
+        figures['sentiment_by_bank.png'] = ('heatmap', ct, 'Sentiment distribution by bank')
+
+    counts = negative_word_counts(df, stop)
     for bank in sorted(df['bank'].unique()):
-        if 'sentiment_label' in df.columns:
-            neg = df[(df['bank']==bank) & (df['sentiment_label']=='neg')]['review'].astype(str)
-        else:
-            neg = df[df['bank']==bank]['review'].astype(str)
-        words = Counter()
-        for text in neg:
-            text = regex.sub(' ', text).lower()
-            for w in text.split():
-                if len(w) > 2 and w not in stop:
-                    words[w] += 1
-        top = words.most_common(15)
-        if not top:
+        if bank not in counts.index.get_level_values('bank'):
             continue
-        words_, counts = zip(*top)
-        plt.figure(figsize=(8,4))
-        sns.barplot(x=list(counts), y=list(words_), palette='magma')
-        plt.title(f'Top negative words for {bank}')
-        plt.tight_layout()
-        plt.savefig(out / f'top_negative_words_{bank}.png', dpi=150)
-        plt.close()
-
-    print('Saved EDA outputs to', out)
+        top = counts.xs(bank, level='bank')
+        figures[f'top_negative_words_{bank}.png'] = ('words', top, f'Top negative words for {bank}')
+    return figures
+
+
+def digest(kind, data, title):
+    payload = json.dumps([kind, title, data.to_json(orient='split')])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _render_ratings(data):
+    sns.barplot(x=data.index.astype(str), y=data.to_numpy(), palette='viridis')
+    plt.xlabel('rating')
+    plt.ylabel('count')
+
+
+def _render_heatmap(data):
+    sns.heatmap(data, annot=True, cmap='vlag')
+
+
+def _render_words(data):
+    sns.barplot(x=data.to_numpy(), y=data.index.tolist(), palette='magma')
+
+
+RENDERERS = {
+    'ratings': (_render_ratings, (6, 4)),
+    'heatmap': (_render_heatmap, (6, 3)),
+    'words': (_render_words, (8, 4)),
+}
+
+
+def render_figure(kind, data, title, path):
+    render, size = RENDERERS[kind]
+    plt.figure(figsize=size)
+    render(data)
+    plt.title(title)
+    plt.tight_layout()
+    plt.savefig(path, dpi=150)
+    plt.close()
+    return path
+
+
+def _render_job(job):
+    return render_figure(*job)
+
+
+def _init_worker():
+    matplotlib.use("Agg")
+
+
+def load_digests(out):
+    try:
+        return json.loads((Path(out) / DIGEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def render_eda(df, out=Path("notebooks/outputs"), workers=1, force=False, stop=None):
+    """Write the EDA figures for `df` (columns as in EDA_COLUMNS) into `out`.
+
+    `stop` defaults to NLTK's English stopwords. Returns the paths of the figures
+    that were (re)rendered.
+    """
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    with stage("eda", rows=len(df), workers=workers) as m:
+        figures = eda_aggregates(df, set(stopwords.words('english')) if stop is None else set(stop))
+        previous = {} if force else load_digests(out)
+        digests, jobs = {}, []
+        for name, (kind, data, title) in figures.items():
+            digests[name] = digest(kind, data, title)
+            if previous.get(name) == digests[name] and (out / name).exists():
+                continue
+            jobs.append((kind, data, title, out / name))
+
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                rendered = list(pool.map(_render_job, jobs))
+        else:
+            rendered = [_render_job(job) for job in jobs]
+        (out / DIGEST_FILE).write_text(json.dumps(digests, indent=2, sort_keys=True), encoding="utf-8")
+        m.labels.update(figures=len(figures), rendered=len(rendered))
+
+    print(f'Saved EDA outputs to {out} ({len(rendered)} of {len(figures)} figures rendered)')
+    return rendered
 
 
 if __name__ == '__main__':
@@ -2,21 +2,45 @@
 
 Usage:
     python scripts/scrape_reviews.py
+    python scripts/scrape_reviews.py --incremental
+    python scripts/scrape_reviews.py --concurrent --max-workers 3 --rate 1.0
 
 This script will:
  - Fetch reviews for the configured apps until the per-app target is met
- - Save raw per-bank CSV files under `data/raw/`
+ - Save raw per-bank CSV files under `data/raw/` (including the store's `reviewId`,
+   which the DB loader uses as the review's key)
+ - Record the newest review timestamp and ids per app in `data/raw/scrape_state.json`
+
+With `--incremental`, paging stops as soon as an already-seen review is reached
+and only the new rows are appended to the existing `raw_<bank>.csv`. `--target`
+only applies to the first run of an app: later runs fetch every review newer
+than the saved state, however many there are. When an app has no saved state
+but its raw CSV exists, the newest `at` in the file (and the reviewIds at that
+time) is used as the starting point, so the file is not appended to twice.
+
+With `--concurrent`, all apps are fetched in parallel on a thread pool capped at
+`--max-workers`. Each app gets its own token-bucket limiter (`--rate` requests per
+second) and failed page requests are retried with exponential backoff.
 
 Notes:
  - Requires internet access and the `google_play_scraper` package.
  - Adjust `TARGET_PER_BANK` if you want more/less reviews.
 """
 from pathlib import Path
+import argparse
+import random
+import threading
 import time
 import csv
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from google_play_scraper import reviews, Sort
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.instrumentation import add_arguments, configure_from_args, stage  # noqa: E402
+
 
 APPS = {
     "CBE": "com.combanketh.mobilebanking",
@@ -26,14 +50,28 @@ APPS = {
 
 TARGET_PER_BANK = 400
 BATCH_SIZE = 200
+STATE_FILE = Path("data/raw/scrape_state.json")
+MAX_WORKERS = 3
+REQUESTS_PER_SECOND = 1.0
+MAX_RETRIES = 3
+CSV_HEADER = ["content", "score", "at", "bank", "source", "reviewId"]
 
 
-def fetch_reviews_for_app(app_id, target=TARGET_PER_BANK, lang="en", country="us"):
+def fetch_reviews_for_app(app_id, target=TARGET_PER_BANK, lang="en", country="us",
+                          fetch=reviews, sleep=time.sleep, is_seen=None):
+    """Page through an app's reviews, newest first.
+
+    `fetch` has the signature of `google_play_scraper.reviews` and can be swapped
+    for a local stub. When `is_seen(review)` returns True paging stops and that
+    review and everything older are dropped. With `is_seen`, `target` is ignored:
+    paging goes on until a seen review is reached, so nothing between the newest
+    reviews and the previous high-water mark is skipped.
+    """
     all_reviews = []
     token = None
-    while len(all_reviews) < target:
-        count = min(BATCH_SIZE, target - len(all_reviews))
-        result, token = reviews(
+    while is_seen is not None or len(all_reviews) < target:
+        count = BATCH_SIZE if is_seen is not None else min(BATCH_SIZE, target - len(all_reviews))
+        result, token = fetch(
             app_id,
             lang=lang,
             country=country,
@@ -43,11 +81,144 @@ def fetch_reviews_for_app(app_id, target=TARGET_PER_BANK, lang="en", country="us
         )
         if not result:
             break
+        if is_seen is not None:
+            fresh = []
+            for r in result:
+                if is_seen(r):
+                    token = None
+                    break
+                fresh.append(r)
+            result = fresh
         all_reviews.extend(result)
         if not token:
             break
-        time.sleep(1)
-    return all_reviews[:target]
+        sleep(1)
+    return all_reviews if is_seen is not None else all_reviews[:target]
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`."""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+def rate_limited(fetch, bucket):
+    def wrapper(*args, **kwargs):
+        bucket.acquire()
+        return fetch(*args, **kwargs)
+    return wrapper
+
+
+def with_retries(fetch, retries=MAX_RETRIES, base_delay=1.0, sleep=time.sleep):
+    """Retry `fetch` on any exception, sleeping base_delay * 2**attempt (plus jitter) in between."""
+    def wrapper(*args, **kwargs):
+        for attempt in range(retries + 1):
+            try:
+                return fetch(*args, **kwargs)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                delay = base_delay * (2 ** attempt) * (1 + random.random() * 0.1)
+                print(f"Fetch failed ({e}); retrying in {delay:.1f}s")
+                sleep(delay)
+    return wrapper
+
+
+def load_state(path=STATE_FILE):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_state(state, path=STATE_FILE):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True), encoding="utf-8")
+    tmp.replace(path)
+
+
+def seen_checker(entry):
+    """Build an `is_seen` predicate from one app's high-water mark, or None if there is none."""
+    if not entry or not entry.get("newest_at"):
+        return None
+    newest = datetime.fromisoformat(entry["newest_at"])
+    ids = set(entry.get("newest_ids") or [])
+
+    def is_seen(r):
+        at = r.get("at")
+        if r.get("reviewId") in ids:
+            return True
+        return at is not None and at < newest
+
+    return is_seen
+
+
+def advance_state(entry, app_id, reviews_list):
+    """Return the app's state entry moved forward to the newest review in `reviews_list`."""
+    entry = dict(entry or {})
+    entry["app_id"] = app_id
+    dated = [r for r in reviews_list if r.get("at")]
+    if not dated:
+        return entry
+    newest = max(r["at"] for r in dated)
+    ids = [r.get("reviewId") for r in dated if r["at"] == newest and r.get("reviewId")]
+    if entry.get("newest_at") and datetime.fromisoformat(entry["newest_at"]) == newest:
+        ids = sorted(set(ids) | set(entry.get("newest_ids") or []))
+    elif entry.get("newest_at") and datetime.fromisoformat(entry["newest_at"]) > newest:
+        return entry
+    entry["newest_at"] = newest.isoformat()
+    entry["newest_ids"] = ids
+    return entry
+
+
+def state_from_raw_csv(path, app_id):
+    """High-water mark of an existing raw CSV (its newest `at` and the reviewIds there), or None."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    newest, ids = None, set()
+    with path.open(encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                at = datetime.fromisoformat(row.get("at") or "")
+            except ValueError:
+                continue
+            if newest is None or at > newest:
+                newest, ids = at, set()
+            if at == newest and row.get("reviewId"):
+                ids.add(row["reviewId"])
+    if newest is None:
+        return None
+    return {"app_id": app_id, "newest_at": newest.isoformat(), "newest_ids": sorted(ids)}
+
+
+def _review_row(r, bank_key):
+    content = r.get("content") or ""
+    score = r.get("score")
+    at = r.get("at")
+    at_iso = at.isoformat() if at else ""
+    return [content, score, at_iso, bank_key, "google_play", r.get("reviewId") or ""]
 
 
 def save_reviews_csv(reviews_list, bank_key, out_dir: Path):
@@ -55,25 +226,127 @@ def save_reviews_csv(reviews_list, bank_key, out_dir: Path):
     out_path = out_dir / f"raw_{bank_key}.csv"
     with out_path.open("w", encoding="utf-8", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(["content", "score", "at", "bank", "source"])
+        writer.writerow(CSV_HEADER)
+        for r in reviews_list:
+            writer.writerow(_review_row(r, bank_key))
+    return out_path
+
+
+def read_header(path):
+    with Path(path).open(encoding="utf-8", newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def upgrade_raw_csv(path):
+    """Rewrite a raw CSV written before `CSV_HEADER` gained columns; missing values are left empty."""
+    header = read_header(path)
+    if header == CSV_HEADER:
+        return False
+    tmp = path.with_name(path.name + ".tmp")
+    with path.open(encoding="utf-8", newline="") as src, tmp.open("w", encoding="utf-8", newline="") as dst:
+        writer = csv.writer(dst)
+        writer.writerow(CSV_HEADER)
+        for row in csv.DictReader(src):
+            writer.writerow([row.get(col) or "" for col in CSV_HEADER])
+    tmp.replace(path)
+    return True
+
+
+def append_reviews_csv(reviews_list, bank_key, out_dir: Path):
+    """Append rows to `raw_<bank>.csv`, writing the header only when the file is new."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / f"raw_{bank_key}.csv"
+    new_file = not out_path.exists() or out_path.stat().st_size == 0
+    if not new_file and reviews_list:
+        upgrade_raw_csv(out_path)
+    with out_path.open("a", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(CSV_HEADER)
         for r in reviews_list:
-            content = r.get("content") or ""
-            score = r.get("score")
-            at = r.get("at")
-            at_iso = at.isoformat() if at else ""
-            writer.writerow([content, score, at_iso, bank_key, "google_play"])
+            writer.writerow(_review_row(r, bank_key))
     return out_path
 
 
+def scrape_app(bank_key, app_id, base, state, incremental=False, target=TARGET_PER_BANK, fetch=reviews,
+               sleep=time.sleep):
+    """Fetch one app, write its CSV and advance `state[bank_key]`; returns the number of rows written."""
+    entry = state.get(bank_key)
+    if incremental and not (entry or {}).get("newest_at"):
+        # no saved state (e.g. a first --incremental run): resume from the raw file instead of re-fetching it
+        entry = state_from_raw_csv(Path(base) / f"raw_{bank_key}.csv", app_id) or entry
+    is_seen = seen_checker(entry) if incremental else None
+    with stage("scrape", bank=bank_key) as m:
+        reviews_list = fetch_reviews_for_app(app_id, target=target, fetch=fetch, sleep=sleep, is_seen=is_seen)
+        if incremental:
+            path = append_reviews_csv(reviews_list, bank_key, base)
+        else:
+            path = save_reviews_csv(reviews_list, bank_key, base)
+        m.rows = len(reviews_list)
+    state[bank_key] = advance_state(entry if incremental else None, app_id, reviews_list)
+    print(f"Saved {len(reviews_list)} {'new ' if incremental else ''}reviews to {path}")
+    return len(reviews_list)
+
+
+def scrape_all_concurrent(apps, base, state, incremental=False, target=TARGET_PER_BANK, fetch=reviews,
+                          max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND, retries=MAX_RETRIES,
+                          sleep=time.sleep, on_done=None):
+    """Scrape every app in `apps` in parallel; returns {bank_key: rows written}.
+
+    Paging pace comes from each app's token bucket rather than the fixed
+    one-second pause of the sequential path. `on_done(bank_key)` runs in the
+    calling thread after each app finishes (e.g. to persist state).
+    """
+    summary = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for bank_key, app_id in apps.items():
+            app_fetch = with_retries(rate_limited(fetch, TokenBucket(rate, sleep=sleep)), retries, sleep=sleep)
+            # each worker advances a private copy; state is only touched from this thread
+            app_state = {bank_key: state[bank_key]} if bank_key in state else {}
+            fut = pool.submit(scrape_app, bank_key, app_id, base, app_state, incremental, target, app_fetch,
+                              lambda s: None)
+            futures[fut] = (bank_key, app_state)
+        for fut in as_completed(futures):
+            bank_key, app_state = futures[fut]
+            try:
+                summary[bank_key] = fut.result()
+            except Exception as e:
+                print(f"Failed to scrape {bank_key}: {e}")
+                continue
+            state.update(app_state)
+            if on_done is not None:
+                on_done(bank_key)
+    return summary
+
+
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--incremental", action="store_true", help="only fetch reviews newer than the saved state")
+    ap.add_argument("--state", default=str(STATE_FILE))
+    ap.add_argument("--target", type=int, default=TARGET_PER_BANK)
+    ap.add_argument("--concurrent", action="store_true", help="fetch all apps in parallel")
+    ap.add_argument("--max-workers", type=int, default=MAX_WORKERS)
+    ap.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND, help="page requests per second per app")
+    ap.add_argument("--retries", type=int, default=MAX_RETRIES)
+    add_arguments(ap)
+    args = ap.parse_args()
+    configure_from_args(args)
+
     base = Path("data/raw")
-    summary = {}
-    for bank_key, app_id in APPS.items():
-        print(f"Fetching reviews for {bank_key} ({app_id}) ...")
-        reviews_list = fetch_reviews_for_app(app_id)
-        path = save_reviews_csv(reviews_list, bank_key, base)
-        print(f"Saved {len(reviews_list)} reviews to {path}")
-        summary[bank_key] = len(reviews_list)
+    state = load_state(args.state)
+    if args.concurrent:
+        print(f"Fetching reviews for {len(APPS)} apps concurrently ...")
+        summary = scrape_all_concurrent(APPS, base, state, incremental=args.incremental, target=args.target,
+                                        max_workers=args.max_workers, rate=args.rate, retries=args.retries,
+                                        on_done=lambda _: save_state(state, args.state))
+    else:
+        summary = {}
+        for bank_key, app_id in APPS.items():
+            print(f"Fetching reviews for {bank_key} ({app_id}) ...")
+            summary[bank_key] = scrape_app(bank_key, app_id, base, state, incremental=args.incremental,
+                                           target=args.target)
+            save_state(state, args.state)
 
     print("Summary:")
     for k, v in summary.items():
@@ -3,25 +3,57 @@
 Usage:
   python scripts/sentiment_thematic.py --model vader
   python scripts/sentiment_thematic.py --model distilbert   # optional if transformers available
+  python scripts/sentiment_thematic.py --workers 8 --batch-size 2000
+  python scripts/sentiment_thematic.py --keywords shared
+  python scripts/sentiment_thematic.py --incremental
 
 Outputs:
   data/processed/reviews_thematic.csv
+  data/processed/reviews_thematic.parquet/  (with --format parquet/both; partitioned by bank)
 
 Notes:
  - By default this uses VADER (fast, no heavy models). If `transformers` is installed and you pass
    `--model distilbert`, it will try to use `distilbert-base-uncased-finetuned-sst-2-english`.
+ - Scoring goes through the engines in `src/sentiment.py`: `--workers` fans VADER out over a
+   process pool (or sets torch threads for DistilBERT) and `--batch-size` controls chunk size.
+ - Rows are grouped by bank once (`src/partition.py`); with `--workers` > 1 per-bank TF-IDF
+   fitting and theme assignment also run on a process pool, one bank per task.
+ - Scores are cached on disk (`--cache`, default `data/cache/sentiment.sqlite`) keyed by review
+   text and model version, so reruns only score new reviews. Pass `--no-cache` to disable.
  - Thematic extraction uses TF-IDF to surface candidate keywords and then applies a simple
    rule-based mapping into 3-5 themes per bank.
+ - `--keywords shared` fits one TF-IDF vocabulary over all banks (saved to `--vocab`, default
+   `data/cache/tfidf_vocab.pkl`) and reuses it on later runs; `--refit-vocab` rebuilds it.
+ - `--keywords hashed` streams reviews in chunks through a hashed-feature extractor whose state
+   stays under `--keyword-memory-mb` per bank (see `src/keywords.py`). Only the keyword state is
+   bounded: this script still loads the whole input for scoring and theme assignment, so its peak
+   memory grows with the input either way. For a bounded keyword pass over a file larger than
+   memory, feed `stream_keywords_by_group` from `pd.read_csv(..., chunksize=...)` directly.
+ - `--incremental` keeps `reviews_thematic.manifest.json` (row hashes plus each bank's theme map)
+   and only scores/assigns reviews not already in the output. It rebuilds everything when the
+   model, keyword mode or theme rules change, or when `--refresh-themes` finds a new theme map.
 """
 import argparse
+import sys
+from functools import partial
 from pathlib import Path
 import pandas as pd
 import numpy as np
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from sklearn.feature_extraction.text import TfidfVectorizer
 from collections import defaultdict, Counter
 import re
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.sentiment import get_engine  # noqa: E402
+from src.instrumentation import add_arguments, configure_from_args, instrumented, stage  # noqa: E402
+from src.keywords import (DEFAULT_MEMORY_MB, DEFAULT_VOCAB_PATH, SharedVocabulary, iter_chunks,  # noqa: E402
+                          stream_keywords_by_group)
+from src.manifest import Manifest, fingerprint, manifest_path, row_hashes  # noqa: E402
+from src.partition import group_indices, map_partitions, partition_order  # noqa: E402
+from src.sentiment_cache import DEFAULT_CACHE_PATH, SentimentCache, score_with_cache  # noqa: E402
+from src.storage import FORMATS, load_processed, processed_exists, save_processed  # noqa: E402
+from src.themes import ThemeMatcher  # noqa: E402
+
 
 THEME_KEYWORDS = {
     "Account Access Issues": ["login", "password", "otp", "pin", "authenticate", "authentication", "access", "blocked"],
@@ -31,29 +63,26 @@ THEME_KEYWORDS = {
     "Feature Requests": ["feature", "request", "notification", "balance", "report", "integration"]
 }
 
+KEYWORD_MODES = ('per-bank', 'shared', 'hashed')
+OUTPUT_COLUMNS = ['review_id', 'review_text', 'bank', 'rating', 'sentiment_label', 'sentiment_score',
+                  'identified_themes', 'raw_review_id']
 
-def compute_vader(df, review_col='review'):
-    analyzer = SentimentIntensityAnalyzer()
-    vader_scores = df[review_col].astype(str).apply(lambda t: analyzer.polarity_scores(t)['compound'])
-    labels = vader_scores.apply(lambda s: 'pos' if s >= 0.05 else ('neg' if s <= -0.05 else 'neu'))
-    return vader_scores, labels
+# keywords are matched case-sensitively against already-lowercased TF-IDF terms
+_THEME_KEYWORD_MATCHER = ThemeMatcher(THEME_KEYWORDS, lowercase=False)
 
 
-def compute_distilbert(df, review_col='review'):
-    try:
-        from transformers import pipeline
-    except Exception as e:
-        raise RuntimeError('transformers not available: ' + str(e))
-    nlp = pipeline('sentiment-analysis', model='distilbert-base-uncased-finetuned-sst-2-english')
-    scores = []
-    labels = []
-    for t in df[review_col].astype(str):
-        out = nlp(t[:512])[0]
-        lbl = 'pos' if out['label'].upper().startswith('POS') else 'neg'
-        labels.append(lbl)
-        s = out['score'] if lbl == 'pos' else -out['score']
-        scores.append(s)
-    return pd.Series(scores), pd.Series(labels)
+def compute_sentiment(df, review_col='review', model='vader', workers=1, batch_size=None, cache=None):
+    engine = get_engine(model, workers=workers, batch_size=batch_size)
+    scores, labels = score_with_cache(engine, df[review_col].astype(str).tolist(), cache)
+    return pd.Series(scores, index=df.index), pd.Series(labels, index=df.index)
+
+
+def compute_vader(df, review_col='review', workers=1, batch_size=None, cache=None):
+    return compute_sentiment(df, review_col, 'vader', workers, batch_size, cache)
+
+
+def compute_distilbert(df, review_col='review', workers=1, batch_size=None, cache=None):
+    return compute_sentiment(df, review_col, 'distilbert', workers, batch_size, cache)
 
 
 def extract_tfidf_keywords(texts, ngram_range=(1,2), top_k=30):
@@ -65,15 +94,36 @@ def extract_tfidf_keywords(texts, ngram_range=(1,2), top_k=30):
     return features[top_idx].tolist()
 
 
+def _bank_tfidf_keywords(bank, texts, top_k=50):
+    return extract_tfidf_keywords(texts.tolist(), ngram_range=(1,2), top_k=top_k)
+
+
+def extract_bank_keywords(df, mode='per-bank', top_k=50, vocab_path=DEFAULT_VOCAB_PATH, refit_vocab=False,
+                          memory_mb=DEFAULT_MEMORY_MB, workers=1):
+    """Top TF-IDF keywords for each bank in `df`.
+
+    `per-bank` fits a vectorizer per bank (banks spread over `workers` processes);
+    `shared` tokenizes the corpus once against a single saved vocabulary and slices
+    the matrix by bank; `hashed` streams chunks through a hashed extractor capped at
+    `memory_mb` per bank. The chunks are slices of `df`, which is already in
+    memory, so `memory_mb` caps the extractor state, not the caller's footprint.
+    """
+    texts = df['review'].astype(str)
+    if mode == 'per-bank':
+        return map_partitions(partial(_bank_tfidf_keywords, top_k=top_k), texts, df['bank'], workers)
+    if mode == 'shared':
+        vocab, X = SharedVocabulary.load_or_fit(texts.tolist(), vocab_path, refit=refit_vocab)
+        return vocab.top_keywords_by_group(X, df['bank'].to_numpy(), top_k=top_k)
+    if mode == 'hashed':
+        return stream_keywords_by_group(iter_chunks(df[['review', 'bank']]), top_k=top_k, memory_mb=memory_mb)
+    raise ValueError('Unknown keyword mode: ' + mode)
+
+
 def map_keywords_to_themes(keywords):
     theme_map = defaultdict(list)
     for kw in keywords:
-        k = kw.lower()
-        for theme, words in THEME_KEYWORDS.items():
-            for w in words:
-                if w in k:
-                    theme_map[theme].append(kw)
-                    break
+        for theme in _THEME_KEYWORD_MATCHER.match(kw.lower()):
+            theme_map[theme].append(kw)
     matched = set([kw for kws in theme_map.values() for kw in kws])
     others = [kw for kw in keywords if kw not in matched]
     if others:
@@ -81,69 +131,197 @@ def map_keywords_to_themes(keywords):
     return dict(theme_map)
 
 
+def compile_theme_map(theme_map):
+    return theme_map if isinstance(theme_map, ThemeMatcher) else ThemeMatcher(theme_map)
+
+
 def assign_themes_to_review(text, theme_map):
-    text_l = text.lower()
-    assigned = []
-    for theme, kws in theme_map.items():
-        for kw in kws:
-            if kw.lower() in text_l:
-                assigned.append(theme)
-                break
-    return assigned
+    """Themes whose keywords occur in `text`; pass a compiled matcher when calling per row."""
+    return compile_theme_map(theme_map).match(text)
+
+
+def assign_themes(texts, theme_map):
+    """Batch form of `assign_themes_to_review` over a whole column."""
+    return compile_theme_map(theme_map).match_many(texts)
+
+
+def score_reviews(df, model='vader', workers=1, batch_size=None, cache_path=DEFAULT_CACHE_PATH):
+    if model not in ('vader', 'distilbert'):
+        raise ValueError('Unknown model: ' + model)
+
+    cache = SentimentCache(cache_path) if cache_path else None
+    try:
+        with stage('sentiment', rows=len(df), model=model):
+            if model == 'vader':
+                scores, labels = compute_vader(df, workers=workers, batch_size=batch_size, cache=cache)
+            else:
+                try:
+                    scores, labels = compute_distilbert(df, workers=workers, batch_size=batch_size, cache=cache)
+                except Exception as e:
+                    print('Failed to run DistilBERT; falling back to VADER:', e)
+                    scores, labels = compute_vader(df, workers=workers, batch_size=batch_size, cache=cache)
+        if cache is not None:
+            print('Sentiment cache:', cache.stats())
+    finally:
+        if cache is not None:
+            cache.close()
+    return scores, labels
+
+
+def build_theme_maps(df, keywords='per-bank', vocab_path=DEFAULT_VOCAB_PATH, refit_vocab=False,
+                     memory_mb=DEFAULT_MEMORY_MB, workers=1):
+    with stage('tfidf', rows=len(df), mode=keywords):
+        bank_keywords = extract_bank_keywords(df, keywords, top_k=50, vocab_path=vocab_path,
+                                              refit_vocab=refit_vocab, memory_mb=memory_mb, workers=workers)
+    return {bank: map_keywords_to_themes(bank_keywords.get(bank, [])) for bank in sorted(df['bank'].unique())}
+
 
+def fallback_theme(theme_map):
+    """Theme given to reviews that match none: the one with the most keywords (first on ties)."""
+    return max(theme_map, key=lambda t: len(theme_map[t])) if theme_map else None
 
-def run(input_path, out_path, model='vader'):
+
+def _bank_theme_labels(bank, texts, theme_maps):
+    theme_map = theme_maps[bank]
+    fallback = fallback_theme(theme_map) or ''
+    return np.array([';'.join(assigned) or fallback for assigned in assign_themes(texts, theme_map)], dtype=object)
+
+
+@instrumented('theme_assignment', rows=len)
+def thematic_rows(df, theme_maps, workers=1):
+    """Output frame for `df` (already scored) using each bank's theme map.
+
+    Rows are grouped by bank once; banks are assigned on `workers` processes and
+    the output is built column-wise, banks in sorted order.
+    """
+    indices = group_indices(df['bank'])
+    labels = map_partitions(partial(_bank_theme_labels, theme_maps=theme_maps), df['review'].astype(str),
+                            df['bank'], workers, indices)
+    rows = df.iloc[partition_order(indices)]
+
+    def column(name):
+        return rows[name].to_numpy() if name in rows.columns else None
+
+    return pd.DataFrame({
+        'review_id': rows.index,
+        'review_text': rows['review'].to_numpy(),
+        'bank': rows['bank'].to_numpy(),
+        'rating': column('rating'),
+        'sentiment_label': column('sentiment_label'),
+        'sentiment_score': column('sentiment_score'),
+        'identified_themes': np.concatenate(list(labels.values())) if labels else np.array([], dtype=object),
+        'raw_review_id': column('raw_review_id'),
+    }, columns=OUTPUT_COLUMNS)
+
+
+def settings_fingerprint(model, keywords):
+    return fingerprint({'model': model, 'keywords': keywords, 'theme_keywords': THEME_KEYWORDS})
+
+
+def merge_thematic(df, hashes, previous, previous_hashes, new_out):
+    """Combine reused rows of `previous` with freshly computed `new_out`, in full-run order."""
+    known = pd.Series(hashes, index=df.index).isin(set(previous_hashes))
+    prev = previous.assign(_hash=previous_hashes).drop_duplicates('_hash').set_index('_hash')
+    old_df = df[known]
+    reused = prev.loc[[h for h, k in zip(hashes, known) if k]]
+    old_out = pd.DataFrame({
+        'review_id': old_df.index,
+        'review_text': old_df['review'].to_numpy(),
+        'bank': old_df['bank'].to_numpy(),
+        'rating': old_df['rating'].to_numpy() if 'rating' in old_df.columns else None,
+        'sentiment_label': reused['sentiment_label'].to_numpy(),
+        'sentiment_score': reused['sentiment_score'].to_numpy(),
+        'identified_themes': reused['identified_themes'].fillna('').to_numpy(),
+        'raw_review_id': old_df['raw_review_id'].to_numpy() if 'raw_review_id' in old_df.columns else None,
+    }, columns=OUTPUT_COLUMNS)
+    parts = [f for f in (old_out, new_out) if len(f)]
+    if not parts:
+        return new_out
+    out = pd.concat(parts, ignore_index=True)
+    return out.sort_values(['bank', 'review_id'], kind='stable').reset_index(drop=True)
+
+
+def _save_output(out_df, out_path, fmt, manifest=None):
+    for path in save_processed(out_df, Path(out_path), fmt):
+        print('Saved thematic analysis to', path)
+    if manifest is not None:
+        manifest.hashes = row_hashes(out_df['bank'], out_df['review_text'])
+        print('Saved manifest to', manifest.save(manifest_path(out_path)))
+
+
+def run(input_path, out_path, model='vader', workers=1, batch_size=None, cache_path=DEFAULT_CACHE_PATH,
+        fmt='csv', keywords='per-bank', vocab_path=DEFAULT_VOCAB_PATH, refit_vocab=False,
+        memory_mb=DEFAULT_MEMORY_MB, incremental=False, refresh_themes=False):
     p = Path(input_path)
-    if not p.exists():
+    if not processed_exists(p):
         print('Input file not found:', p)
         return
-    df = pd.read_csv(p)
+    df = load_processed(p)
     if 'review' not in df.columns:
         print('No `review` column found in input')
         return
+    if incremental:
+        return run_incremental(df, out_path, model, workers, batch_size, cache_path, fmt, keywords,
+                               vocab_path, refit_vocab, memory_mb, refresh_themes)
 
-    if model == 'vader':
-        scores, labels = compute_vader(df)
-    elif model == 'distilbert':
-        try:
-            scores, labels = compute_distilbert(df)
-        except Exception as e:
-            print('Failed to run DistilBERT; falling back to VADER:', e)
-            scores, labels = compute_vader(df)
-    else:
-        raise ValueError('Unknown model: ' + model)
+    df['sentiment_score'], df['sentiment_label'] = score_reviews(df, model, workers, batch_size, cache_path)
+    theme_maps = build_theme_maps(df, keywords, vocab_path, refit_vocab, memory_mb, workers)
+    _save_output(thematic_rows(df, theme_maps, workers), out_path, fmt)
+
+
+def run_incremental(df, out_path, model='vader', workers=1, batch_size=None, cache_path=DEFAULT_CACHE_PATH,
+                    fmt='csv', keywords='per-bank', vocab_path=DEFAULT_VOCAB_PATH, refit_vocab=False,
+                    memory_mb=DEFAULT_MEMORY_MB, refresh_themes=False):
+    """Score and theme-assign only reviews missing from the previous output.
+
+    Falls back to a full rebuild when there is no usable manifest, when the
+    settings fingerprint changed, or when `refresh_themes` recomputes a theme
+    map that differs from the saved one.
+    """
+    mpath = manifest_path(out_path)
+    manifest = Manifest.load(mpath)
+    fp = settings_fingerprint(model, keywords)
+    previous = load_processed(Path(out_path)) if manifest is not None and processed_exists(out_path) else None
+
+    reason = None
+    if manifest is None or previous is None:
+        reason = 'no previous output'
+    elif manifest.fingerprint != fp:
+        reason = 'settings changed'
+    elif len(previous) != len(manifest.hashes):
+        reason = 'output does not match manifest'
+
+    theme_maps = None if reason else dict(manifest.theme_maps)
+    if theme_maps is not None and refresh_themes:
+        fresh = build_theme_maps(df, keywords, vocab_path, refit_vocab, memory_mb, workers)
+        changed = sorted(b for b in fresh if b in theme_maps and fresh[b] != theme_maps[b])
+        if changed:
+            reason = 'theme maps changed for ' + ', '.join(changed)
+            theme_maps = fresh
+
+    if reason:
+        print('Full rebuild:', reason)
+        df['sentiment_score'], df['sentiment_label'] = score_reviews(df, model, workers, batch_size, cache_path)
+        if theme_maps is None:
+            theme_maps = build_theme_maps(df, keywords, vocab_path, refit_vocab, memory_mb, workers)
+        _save_output(thematic_rows(df, theme_maps, workers), out_path, fmt, Manifest(fp, theme_maps))
+        return
 
-    df['sentiment_score'] = scores
-    df['sentiment_label'] = labels
-
-    out_rows = []
-    for bank in sorted(df['bank'].unique()):
-        bank_df = df[df['bank'] == bank]
-        texts = bank_df['review'].astype(str).tolist()
-        keywords = extract_tfidf_keywords(texts, ngram_range=(1,2), top_k=50)
-        theme_map = map_keywords_to_themes(keywords)
-        theme_counts = [(t, len(kws)) for t, kws in theme_map.items()]
-        theme_counts = sorted(theme_counts, key=lambda x: x[1], reverse=True)
-        chosen_themes = [t for t, _ in theme_counts[:5]]
-        for idx, row in bank_df.iterrows():
-            assigned = assign_themes_to_review(str(row['review']), theme_map)
-            if not assigned and chosen_themes:
-                assigned = [chosen_themes[0]]
-            out_rows.append({
-                'review_id': idx,
-                'review_text': row['review'],
-                'bank': bank,
-                'rating': row.get('rating', None),
-                'sentiment_label': row.get('sentiment_label'),
-                'sentiment_score': row.get('sentiment_score'),
-                'identified_themes': ';'.join(assigned)
-            })
-
-    out_df = pd.DataFrame(out_rows)
-    out_p = Path(out_path)
-    out_p.parent.mkdir(parents=True, exist_ok=True)
-    out_df.to_csv(out_p, index=False)
-    print('Saved thematic analysis to', out_p)
+    hashes = row_hashes(df['bank'], df['review'])
+    seen = set(manifest.hashes)
+    new_df = df[[h not in seen for h in hashes]].copy()
+    print(f'Incremental: {len(new_df)} new of {len(df)} reviews')
+    if len(new_df):
+        new_df['sentiment_score'], new_df['sentiment_label'] = score_reviews(
+            new_df, model, workers, batch_size, cache_path)
+        unmapped = new_df[~new_df['bank'].isin(list(theme_maps))]
+        if len(unmapped):
+            # banks seen for the first time get a theme map from their own reviews
+            new_banks = df[df['bank'].isin(unmapped['bank'].unique())]
+            theme_maps.update(build_theme_maps(new_banks, keywords, vocab_path, refit_vocab, memory_mb, workers))
+    new_out = thematic_rows(new_df, theme_maps, workers)
+    out_df = merge_thematic(df, hashes, previous, manifest.hashes, new_out)
+    _save_output(out_df, out_path, fmt, Manifest(fp, theme_maps))
 
 
 def cli():
@@ -151,8 +329,27 @@ def cli():
     parser.add_argument('--input', default='data/processed/reviews_clean.csv')
     parser.add_argument('--output', default='data/processed/reviews_thematic.csv')
     parser.add_argument('--model', default='vader', choices=['vader', 'distilbert'])
+    parser.add_argument('--workers', type=int, default=1, help='processes for VADER and per-bank keywords/themes; torch threads for DistilBERT')
+    parser.add_argument('--batch-size', type=int, default=None, help='reviews per scoring batch')
+    parser.add_argument('--cache', default=str(DEFAULT_CACHE_PATH), help='sentiment cache file')
+    parser.add_argument('--no-cache', action='store_true', help='always rescore every review')
+    parser.add_argument('--format', default='csv', choices=FORMATS, help='output storage format')
+    parser.add_argument('--keywords', default='per-bank', choices=KEYWORD_MODES,
+                        help='fit TF-IDF per bank, once over the corpus with a saved vocabulary, or hashed/streaming')
+    parser.add_argument('--keyword-memory-mb', type=float, default=DEFAULT_MEMORY_MB,
+                        help='per-bank cap on the keyword extractor state for --keywords hashed')
+    parser.add_argument('--vocab', default=str(DEFAULT_VOCAB_PATH), help='saved vocabulary for --keywords shared')
+    parser.add_argument('--refit-vocab', action='store_true', help='refit and overwrite the saved vocabulary')
+    parser.add_argument('--incremental', action='store_true', help='only process reviews missing from the output')
+    parser.add_argument('--refresh-themes', action='store_true',
+                        help='with --incremental, recompute theme maps and rebuild if any changed')
+    add_arguments(parser)
     args = parser.parse_args()
-    run(args.input, args.output, model=args.model)
+    configure_from_args(args)
+    cache_path = None if args.no_cache else args.cache
+    run(args.input, args.output, model=args.model, workers=args.workers, batch_size=args.batch_size,
+        cache_path=cache_path, fmt=args.format, keywords=args.keywords, vocab_path=args.vocab,
+        refit_vocab=args.refit_vocab, memory_mb=args.keyword_memory_mb, incremental=args.incremental, refresh_themes=args.refresh_themes)
 
 
 if __name__ == '__main__':
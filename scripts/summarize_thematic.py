@@ -1,14 +1,92 @@
-"""Summarize the thematic analysis results and print KPIs and examples."""
+"""Summarize the thematic analysis results and print KPIs and examples.
+
+Usage:
+    python scripts/summarize_thematic.py
+    python scripts/summarize_thematic.py --database-url sqlite:///data/bank_reviews.db
+
+Without options the thematic CSV/Parquet output is summarized. With
+`--database-url` the KPIs come from the daily rollup tables instead (see
+src/rollups.py) and only the example reviews are read from `reviews`; create
+them with scripts/db_init_sqlalchemy.py and fill them with scripts/refresh_rollups.py.
+"""
+import argparse
+import sys
 import pandas as pd
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.partition import partitions  # noqa: E402
+from src.storage import load_processed, processed_exists  # noqa: E402
+
+
+def cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--path', default='data/processed/reviews_thematic.csv')
+    parser.add_argument('--database-url', default=None, help='summarize the database rollups instead of --path')
+    args = parser.parse_args()
+    if args.database_url:
+        summarize_db(args.database_url)
+    else:
+        main(args.path)
+
+
+def summarize_db(database_url):
+    from sqlalchemy import inspect, text
+
+    from src import rollups
+    from src.db import get_engine
+
+    engine = get_engine(database_url)
+    insp = inspect(engine)
+    if not insp.has_table(rollups.BANK_TABLE):
+        print('No rollup tables found; run scripts/db_init_sqlalchemy.py and scripts/refresh_rollups.py, '
+              'or summarize the thematic output with --path')
+        return
+    has_themes = insp.has_table(rollups.THEME_TABLE)
+    with engine.connect() as conn:
+        banks = rollups.bank_totals(conn)
+        theme_rows = rollups.theme_totals(conn) if has_themes else []
+        themes = pd.DataFrame(theme_rows, columns=['bank', 'theme', 'count'])
+        total = sum(r.review_count for r in banks)
+        print('Total reviews analyzed:', total)
+        if not total:
+            return
+        sent_cov = sum(r.sentiment_labeled for r in banks)
+        print(f'Sentiment coverage: {sent_cov} / {total} ({sent_cov/total*100:.1f}%)')
+        print('\nPer-bank counts:')
+        print(pd.Series({r.bank_name: r.review_count for r in banks}, name='count'))
+
+        if not has_themes:
+            print('\nNo theme tables found')
+            return
+        print('\nThemes summary per bank:')
+        examples = text(
+            'SELECT r.review_text, r.rating, r.sentiment_score FROM review_themes rt '
+            'JOIN reviews r ON r.review_id = rt.review_id JOIN banks b ON b.bank_id = rt.bank_id '
+            'JOIN themes t ON t.theme_id = rt.theme_id '
+            'WHERE b.bank_name = :bank AND t.theme_name = :theme ORDER BY r.review_id LIMIT 3'
+        )
+        for r in sorted(banks, key=lambda r: r.bank_name):
+            counts = themes[themes['bank'] == r.bank_name]
+            print(f'\nBank: {r.bank_name} — total reviews: {r.review_count}')
+            if counts.empty:
+                print('  No themes identified')
+                continue
+            print('  Top themes:')
+            for t, c in counts[['theme', 'count']].head(5).itertuples(index=False):
+                print(f'    {t}: {c}')
+            top_theme = counts['theme'].iloc[0]
+            print(f"  Examples for top theme '{top_theme}':")
+            for review_text, rating, score in conn.execute(examples, {'bank': r.bank_name, 'theme': top_theme}):
+                print(f"    - ({rating}) {str(review_text)[:140]} ... [score={score}]")
+
 
 def main(path='data/processed/reviews_thematic.csv'):
     p = Path(path)
-    if not p.exists():
+    if not processed_exists(p):
         print('File not found:', p)
         return
-    df = pd.read_csv(p)
+    df = load_processed(p)
     total = len(df)
     print('Total reviews analyzed:', total)
     sent_cov = df['sentiment_label'].notna().sum()
@@ -17,15 +95,9 @@ def main(path='data/processed/reviews_thematic.csv'):
     print(df['bank'].value_counts())
 
     print('\nThemes summary per bank:')
-    for bank in sorted(df['bank'].unique()):
-        sub = df[df['bank'] == bank]
-        themes = sub['identified_themes'].fillna('')
-        exploded = []
-        for t in themes:
-            for x in str(t).split(';'):
-                if x.strip():
-                    exploded.append(x.strip())
-        counts = pd.Series(exploded).value_counts()
+    for bank, sub in partitions(df, df['bank']):
+        themes = sub['identified_themes'].fillna('').astype(str).str.split(';').explode().str.strip()
+        counts = themes[themes != ''].value_counts()
         print(f'\nBank: {bank} — total reviews: {len(sub)}')
         if counts.empty:
             print('  No themes identified')
@@ -37,9 +109,9 @@ def main(path='data/processed/reviews_thematic.csv'):
         top_theme = counts.index[0]
         ex = sub[sub['identified_themes'].str.contains(top_theme, na=False)]
         print(f"  Examples for top theme '{top_theme}':")
-        for _, r in ex[['review_text','rating','sentiment_score']].head(3).iterrows():
-            print(f"    - ({r['rating']}) {r['review_text'][:140]} ... [score={r['sentiment_score']}]")
+        for review_text, rating, score in ex[['review_text','rating','sentiment_score']].head(3).itertuples(index=False):
+            print(f"    - ({rating}) {str(review_text)[:140]} ... [score={score}]")
 
 
 if __name__ == '__main__':
-    main()
+    cli()
@@ -16,8 +16,68 @@ CREATE TABLE IF NOT EXISTS reviews (
     sentiment_label TEXT,
     sentiment_score REAL,
     source TEXT,
-    raw_review_id TEXT
+    raw_review_id TEXT,
+    -- raw_review_id when the source provides one, otherwise a hash of (bank_id, text, date)
+    review_key TEXT,
+    -- hash of every loaded column; upserts skip rows whose hash is unchanged
+    content_hash TEXT
 );
 
+-- upgrade databases created before review_key/content_hash existed
+ALTER TABLE reviews ADD COLUMN IF NOT EXISTS review_key TEXT;
+ALTER TABLE reviews ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
 CREATE INDEX IF NOT EXISTS idx_reviews_bank_id ON reviews(bank_id);
 CREATE INDEX IF NOT EXISTS idx_reviews_review_date ON reviews(review_date);
+-- natural key for idempotent loads (legacy rows keep NULL keys until the loader backfills them)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_reviews_source_key ON reviews(source, review_key);
+
+-- full-text search (see src/search.py); PostgreSQL keeps the generated column current on every write
+ALTER TABLE reviews ADD COLUMN IF NOT EXISTS review_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(review_text, ''))) STORED;
+CREATE INDEX IF NOT EXISTS idx_reviews_review_tsv ON reviews USING GIN (review_tsv);
+
+
+CREATE TABLE IF NOT EXISTS themes (
+    theme_id SERIAL PRIMARY KEY,
+    theme_name TEXT NOT NULL UNIQUE
+);
+
+-- one row per (review, theme); bank_id is denormalized so per-bank theme counts never touch reviews
+CREATE TABLE IF NOT EXISTS review_themes (
+    review_id INTEGER NOT NULL REFERENCES reviews(review_id) ON DELETE CASCADE,
+    theme_id INTEGER NOT NULL REFERENCES themes(theme_id) ON DELETE CASCADE,
+    bank_id INTEGER REFERENCES banks(bank_id) ON DELETE CASCADE,
+    PRIMARY KEY (review_id, theme_id)
+);
+
+-- the primary key already serves lookups by review_id
+CREATE INDEX IF NOT EXISTS idx_review_themes_theme_bank ON review_themes(theme_id, bank_id);
+
+
+-- daily per-bank rollups, kept current by the loader (see src/rollups.py);
+-- rebuild with scripts/refresh_rollups.py. day is NULL for reviews without a date.
+CREATE TABLE IF NOT EXISTS daily_bank_stats (
+    day DATE,
+    bank_id INTEGER NOT NULL REFERENCES banks(bank_id) ON DELETE CASCADE,
+    review_count INTEGER NOT NULL,
+    rating_1 INTEGER NOT NULL,
+    rating_2 INTEGER NOT NULL,
+    rating_3 INTEGER NOT NULL,
+    rating_4 INTEGER NOT NULL,
+    rating_5 INTEGER NOT NULL,
+    sentiment_pos INTEGER NOT NULL,
+    sentiment_neu INTEGER NOT NULL,
+    sentiment_neg INTEGER NOT NULL,
+    -- reviews with any sentiment label (sentiment coverage)
+    sentiment_labeled INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_daily_bank_stats_bank_day ON daily_bank_stats(bank_id, day);
+
+CREATE TABLE IF NOT EXISTS daily_theme_stats (
+    day DATE,
+    bank_id INTEGER NOT NULL REFERENCES banks(bank_id) ON DELETE CASCADE,
+    theme_id INTEGER NOT NULL REFERENCES themes(theme_id) ON DELETE CASCADE,
+    review_count INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_daily_theme_stats_bank_day_theme ON daily_theme_stats(bank_id, day, theme_id);
@@ -0,0 +1,192 @@
+"""Catalog of the raw review CSVs (``data/cache/raw_catalog.json``).
+
+Each ``data/raw/raw_*.csv`` gets an entry with its size, mtime, content hash
+(sha256), row count, date range (the ``at`` column) and per-bank row totals.
+Entries are computed in one streaming pass over the file, so memory stays
+constant whatever its size, and only recomputed when the file changes:
+
+- same size and mtime: the entry is reused as is;
+- otherwise the file is re-hashed, and only re-counted if the hash differs.
+
+The catalog also remembers which raw contents each output was last built from
+(``record_output`` / ``output_current``), which lets ``preprocess_reviews``
+skip a run whose inputs and settings have not changed::
+
+    catalog = RawCatalog.load(CATALOG_PATH) or RawCatalog()
+    catalog.refresh(files)
+    catalog.totals()  # {'rows': ..., 'banks': {...}, 'first_date': ..., 'last_date': ...}
+"""
+import csv
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+
+CATALOG_PATH = Path('data/cache/raw_catalog.json')
+CATALOG_VERSION = 1
+DATE_COLUMN = 'at'
+BANK_COLUMN = 'bank'
+_HASH_BLOCK = 1 << 20
+_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+class FileEntry(NamedTuple):
+    size: int
+    mtime_ns: int
+    sha256: str
+    rows: int
+    first_date: Optional[str]
+    last_date: Optional[str]
+    banks: dict
+
+
+def default_bank(path):
+    """Bank of a raw file without a bank column, as in ``preprocess_reviews.prepare_frame``."""
+    return Path(path).stem.replace('raw_', '')
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(_HASH_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _hashed_lines(fh, h):
+    first = True
+    for line in fh:
+        h.update(line)
+        yield line.decode('utf-8-sig' if first else 'utf-8')
+        first = False
+
+
+def scan_file(path):
+    """`FileEntry` for the CSV at `path`, read line by line in a single pass."""
+    path = Path(path)
+    st = path.stat()
+    h = hashlib.sha256()
+    rows, first, last, banks = 0, None, None, {}
+    with path.open('rb') as fh:
+        reader = csv.reader(_hashed_lines(fh, h))
+        header = next(reader, [])
+        date_col = header.index(DATE_COLUMN) if DATE_COLUMN in header else None
+        bank_col = header.index(BANK_COLUMN) if BANK_COLUMN in header else None
+        fallback = default_bank(path)
+        for row in reader:
+            if not row:
+                continue
+            rows += 1
+            if date_col is not None and date_col < len(row) and _DATE.match(row[date_col]):
+                day = row[date_col][:10]
+                first = day if first is None or day < first else first
+                last = day if last is None or day > last else last
+            bank = row[bank_col] if bank_col is not None and bank_col < len(row) and row[bank_col] else fallback
+            banks[bank] = banks.get(bank, 0) + 1
+    return FileEntry(st.st_size, st.st_mtime_ns, h.hexdigest(), rows, first, last, banks)
+
+
+def _digest(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _stat(path):
+    path = Path(path)
+    if not path.exists():
+        return None
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+class RawCatalog:
+    def __init__(self, files=None, outputs=None):
+        self.files = {name: FileEntry(**entry) if isinstance(entry, dict) else entry
+                      for name, entry in (files or {}).items()}
+        self.outputs = dict(outputs or {})
+        self.scanned = []
+
+    @classmethod
+    def load(cls, path=CATALOG_PATH):
+        """Return the catalog stored at `path`, or None when missing or unreadable."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            state = json.loads(path.read_text(encoding='utf-8'))
+        except ValueError:
+            return None
+        if state.get('version') != CATALOG_VERSION:
+            return None
+        return cls(state['files'], state['outputs'])
+
+    def save(self, path=CATALOG_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            'version': CATALOG_VERSION,
+            'files': {name: entry._asdict() for name, entry in sorted(self.files.items())},
+            'outputs': self.outputs,
+        }
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(json.dumps(state, indent=2), encoding='utf-8')
+        tmp.replace(path)
+        return path
+
+    def entry(self, path):
+        """Up-to-date `FileEntry` for `path`, rescanning the file only if its content changed."""
+        name = str(path)
+        st = Path(path).stat()
+        old = self.files.get(name)
+        if old is not None and (old.size, old.mtime_ns) == (st.st_size, st.st_mtime_ns):
+            return old
+        if old is not None and old.size == st.st_size and old.sha256 == file_hash(path):
+            # touched but identical: keep the counts
+            self.files[name] = old._replace(mtime_ns=st.st_mtime_ns)
+            return self.files[name]
+        self.files[name] = scan_file(path)
+        self.scanned.append(name)
+        return self.files[name]
+
+    def refresh(self, files):
+        """Bring the entries for `files` up to date and drop the others; returns the rescanned names."""
+        self.scanned = []
+        names = {str(f) for f in files}
+        for name in [n for n in self.files if n not in names]:
+            del self.files[name]
+        for f in sorted(files, key=str):
+            self.entry(f)
+        return list(self.scanned)
+
+    def totals(self, files=None):
+        """Rows, per-bank rows and date range over `files` (default: every entry)."""
+        entries = [self.files[str(f)] for f in files] if files is not None else list(self.files.values())
+        banks = {}
+        for e in entries:
+            for bank, n in e.banks.items():
+                banks[bank] = banks.get(bank, 0) + n
+        firsts = [e.first_date for e in entries if e.first_date]
+        lasts = [e.last_date for e in entries if e.last_date]
+        return {
+            'rows': sum(e.rows for e in entries),
+            'banks': dict(sorted(banks.items())),
+            'first_date': min(firsts) if firsts else None,
+            'last_date': max(lasts) if lasts else None,
+        }
+
+    def inputs_digest(self, files, settings=None):
+        """Hash of the contents of `files` (current entries) and `settings`."""
+        return _digest(sorted((str(f), self.files[str(f)].sha256) for f in files), settings)
+
+    def output_current(self, outputs, digest):
+        """True when every path in `outputs` was last written from `digest` and is untouched since."""
+        for out in outputs:
+            rec = self.outputs.get(str(out))
+            if rec is None or rec['inputs'] != digest or rec['stat'] != _stat(out):
+                return False
+        return bool(outputs)
+
+    def record_output(self, outputs, digest):
+        for out in outputs:
+            self.outputs[str(out)] = {'inputs': digest, 'stat': _stat(out)}
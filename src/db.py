@@ -0,0 +1,366 @@
+"""Shared database engines and typed review queries.
+
+One pooled engine per URL is created on first use and shared by every caller::
+
+    from src.db import get_engine, reviews_by_bank, sentiment_trend
+
+    for page in reviews_by_bank('CBE', start=date(2024, 5, 1), end=date(2024, 5, 31)):
+        ...  # lists of Review, fetched from a server-side cursor
+
+    sentiment_trend(bank='CBE', period='month')  # [SentimentPoint(...), ...]
+
+The async variants (``get_async_engine``, ``reviews_by_bank_async``,
+``theme_counts_async``, ``sentiment_trend_async``) run the same SQL through
+SQLAlchemy's asyncio extension with ``asyncpg`` (PostgreSQL) or ``aiosqlite``.
+
+The URL defaults to ``DATABASE_URL`` (else ``sqlite:///data/bank_reviews.db``).
+Pool settings default to the environment:
+
+- ``REVIEWS_DB_POOL_SIZE`` (5), ``REVIEWS_DB_MAX_OVERFLOW`` (10)
+- ``REVIEWS_DB_POOL_TIMEOUT`` seconds (30), ``REVIEWS_DB_POOL_RECYCLE`` seconds (1800)
+
+Connections are health-checked on checkout (``pool_pre_ping``). Theme counts and
+sentiment trends are read from the daily rollup tables (see ``src/rollups.py``).
+
+``search_reviews`` (and ``search_reviews_async``) query the full-text index from
+``src/search.py``: best matches first, one page at a time::
+
+    search_reviews('transfer failed -otp', bank='CBE', rating=[1, 2], page=0)
+"""
+import os
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import DateTime, bindparam, create_engine, text
+from sqlalchemy.engine import make_url
+
+from src import rollups, search
+
+
+DEFAULT_URL = 'sqlite:///data/bank_reviews.db'
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_SEARCH_PAGE_SIZE = 20
+POOL_DEFAULTS = {
+    'pool_size': ('REVIEWS_DB_POOL_SIZE', 5),
+    'max_overflow': ('REVIEWS_DB_MAX_OVERFLOW', 10),
+    'pool_timeout': ('REVIEWS_DB_POOL_TIMEOUT', 30),
+    'pool_recycle': ('REVIEWS_DB_POOL_RECYCLE', 1800),
+}
+ASYNC_DRIVERS = {'postgresql': 'asyncpg', 'sqlite': 'aiosqlite'}
+PERIODS = ('day', 'month')
+
+_engines = {}
+_async_engines = {}
+_lock = threading.Lock()
+
+
+class Review(NamedTuple):
+    review_id: int
+    bank: str
+    review_text: Optional[str]
+    rating: Optional[int]
+    review_date: Optional[datetime]
+    sentiment_label: Optional[str]
+    sentiment_score: Optional[float]
+    source: Optional[str]
+
+
+class SearchHit(NamedTuple):
+    review_id: int
+    bank: str
+    review_text: Optional[str]
+    rating: Optional[int]
+    review_date: Optional[datetime]
+    sentiment_label: Optional[str]
+    sentiment_score: Optional[float]
+    source: Optional[str]
+    rank: float  # higher is a better match; comparable within one query only
+
+
+class ThemeCount(NamedTuple):
+    bank: str
+    theme: str
+    reviews: int
+
+
+class SentimentPoint(NamedTuple):
+    bank: str
+    period: str  # 'YYYY-MM-DD' or 'YYYY-MM'
+    reviews: int
+    pos: int
+    neu: int
+    neg: int
+    labeled: int
+
+    @property
+    def net(self):
+        """(pos - neg) / labeled, or None without labelled reviews."""
+        return (self.pos - self.neg) / self.labeled if self.labeled else None
+
+
+def database_url(url=None):
+    return url or os.environ.get('DATABASE_URL') or DEFAULT_URL
+
+
+def pool_options(url, **overrides):
+    """create_engine keyword arguments: pool sizes from `overrides`, else the environment."""
+    opts = {'pool_pre_ping': True}
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # in-memory SQLite lives in a single connection; there is no pool to size
+        return opts
+    for name, (env, default) in POOL_DEFAULTS.items():
+        value = overrides.get(name)
+        opts[name] = int(value if value is not None else os.environ.get(env) or default)
+    return opts
+
+
+def get_engine(url=None, **pool):
+    """The shared pooled engine for `url`; `pool` overrides pool_size, max_overflow, pool_timeout, pool_recycle."""
+    url = database_url(url)
+    key = (url, tuple(sorted(pool.items())))
+    with _lock:
+        if key not in _engines:
+            _engines[key] = create_engine(url, **pool_options(url, **pool))
+        return _engines[key]
+
+
+def async_url(url):
+    """`url` with its driver replaced by the asyncio one (asyncpg / aiosqlite)."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError('Unknown async backend: ' + backend)
+    return url.set(drivername=f'{backend}+{ASYNC_DRIVERS[backend]}')
+
+
+def get_async_engine(url=None, **pool):
+    """The shared `AsyncEngine` for `url`; same pool settings as `get_engine`."""
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine
+    except Exception as e:
+        raise RuntimeError('sqlalchemy asyncio not available: ' + str(e))
+    url = async_url(database_url(url))
+    key = (url.render_as_string(hide_password=False), tuple(sorted(pool.items())))
+    with _lock:
+        if key not in _async_engines:
+            _async_engines[key] = create_async_engine(url, **pool_options(url, **pool))
+        return _async_engines[key]
+
+
+def dispose_engines():
+    """Close every pooled connection of the shared sync engines (async ones: `dispose_async_engines`)."""
+    with _lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+async def dispose_async_engines():
+    with _lock:
+        engines = list(_async_engines.values())
+        _async_engines.clear()
+    for engine in engines:
+        await engine.dispose()
+
+
+def _bound(dialect, value, end=False):
+    """Bind value for a date bound: an ISO string on SQLite (dates are text), a datetime elsewhere."""
+    value = date.fromisoformat(str(value)[:10]) if not isinstance(value, date) else value
+    if isinstance(value, datetime):
+        value = value.date()
+    if end:
+        value += timedelta(days=1)
+    return value.isoformat() if dialect == 'sqlite' else datetime.combine(value, time.min)
+
+
+def _day_bound(dialect, value, end=False):
+    """Bind value for the rollups' `day` column (text on SQLite, DATE elsewhere)."""
+    value = _bound(dialect, value)
+    return value if dialect == 'sqlite' else value.date()
+
+
+def _filters(clauses, params, **conditions):
+    for name, (sql, value) in conditions.items():
+        if value is not None:
+            clauses.append(sql)
+            params[name] = value
+    return ' AND '.join(clauses) or 'true'
+
+
+def _reviews_query(dialect, bank, start, end):
+    """Reviews of `bank` dated from `start` to `end` (dates, inclusive), oldest first."""
+    params = {'bank': bank}
+    where = _filters(
+        ['b.bank_name = :bank'], params,
+        start=('r.review_date >= :start', None if start is None else _bound(dialect, start)),
+        end=('r.review_date < :end', None if end is None else _bound(dialect, end, end=True)),
+    )
+    stmt = text(
+        'SELECT r.review_id, b.bank_name, r.review_text, r.rating, r.review_date, r.sentiment_label, '
+        'r.sentiment_score, r.source FROM reviews r JOIN banks b ON b.bank_id = r.bank_id '
+        f'WHERE {where} ORDER BY r.review_date, r.review_id'
+    ).columns(review_date=DateTime)
+    return stmt, params
+
+
+def _theme_query(dialect, bank, start, end):
+    params = {}
+    where = _filters(
+        [], params,
+        bank=('b.bank_name = :bank', bank),
+        start=('d.day >= :start', None if start is None else _day_bound(dialect, start)),
+        end=('d.day <= :end', None if end is None else _day_bound(dialect, end)),
+    )
+    stmt = text(
+        f'SELECT b.bank_name, t.theme_name, SUM(d.review_count) AS reviews FROM {rollups.THEME_TABLE} d '
+        'JOIN banks b ON b.bank_id = d.bank_id JOIN themes t ON t.theme_id = d.theme_id '
+        f'WHERE {where} GROUP BY b.bank_name, t.theme_name ORDER BY b.bank_name, reviews DESC, t.theme_name'
+    )
+    return stmt, params
+
+
+def _trend_query(dialect, bank, start, end, period):
+    if period not in PERIODS:
+        raise ValueError('Unknown period: ' + str(period))
+    params = {}
+    where = _filters(
+        ['d.day IS NOT NULL'], params,
+        bank=('b.bank_name = :bank', bank),
+        start=('d.day >= :start', None if start is None else _day_bound(dialect, start)),
+        end=('d.day <= :end', None if end is None else _day_bound(dialect, end)),
+    )
+    if dialect == 'sqlite':
+        bucket = 'd.day' if period == 'day' else 'substr(d.day, 1, 7)'
+    else:
+        bucket = "to_char(d.day, 'YYYY-MM-DD')" if period == 'day' else "to_char(d.day, 'YYYY-MM')"
+    stmt = text(
+        f'SELECT b.bank_name, {bucket} AS period, SUM(d.review_count), SUM(d.sentiment_pos), '
+        'SUM(d.sentiment_neu), SUM(d.sentiment_neg), SUM(d.sentiment_labeled) '
+        f'FROM {rollups.BANK_TABLE} d JOIN banks b ON b.bank_id = d.bank_id '
+        f'WHERE {where} GROUP BY b.bank_name, {bucket} ORDER BY b.bank_name, period'
+    )
+    return stmt, params
+
+
+def _search_query(dialect, query, bank, rating, sentiment, start, end, page, page_size):
+    """Matches of `query` ranked best first (BM25 on SQLite, ts_rank_cd on PostgreSQL); None if it has no terms."""
+    terms = search.fts5_query(query)
+    if terms is None:
+        return None, None
+    if dialect == 'sqlite':
+        source = f'{search.FTS_TABLE} f JOIN reviews r ON r.review_id = f.rowid'
+        clauses, rank = [f'{search.FTS_TABLE} MATCH :query'], f'-bm25({search.FTS_TABLE})'
+    else:
+        # websearch_to_tsquery reads the query syntax natively
+        terms = query
+        source = f"reviews r CROSS JOIN websearch_to_tsquery('{search.TS_CONFIG}', :query) q"
+        clauses, rank = [f'r.{search.TSV_COLUMN} @@ q'], f'ts_rank_cd(r.{search.TSV_COLUMN}, q)'
+    params = {'query': terms, 'limit': page_size, 'offset': page * page_size}
+    ratings = None if rating is None else [rating] if isinstance(rating, int) else list(rating)
+    where = _filters(
+        clauses, params,
+        bank=('b.bank_name = :bank', bank),
+        ratings=('r.rating IN :ratings', ratings),
+        sentiment=('r.sentiment_label = :sentiment', sentiment),
+        start=('r.review_date >= :start', None if start is None else _bound(dialect, start)),
+        end=('r.review_date < :end', None if end is None else _bound(dialect, end, end=True)),
+    )
+    stmt = text(
+        'SELECT r.review_id, b.bank_name, r.review_text, r.rating, r.review_date, r.sentiment_label, '
+        f'r.sentiment_score, r.source, {rank} AS match_rank FROM {source} JOIN banks b ON b.bank_id = r.bank_id '
+        f'WHERE {where} ORDER BY match_rank DESC, r.review_id LIMIT :limit OFFSET :offset'
+    ).columns(review_date=DateTime)
+    if ratings is not None:
+        stmt = stmt.bindparams(bindparam('ratings', expanding=True))
+    return stmt, params
+
+
+def _trend_point(row):
+    bank, period, *counts = row
+    return SentimentPoint(bank, str(period), *(int(c or 0) for c in counts))
+
+
+def reviews_by_bank(bank, start=None, end=None, engine=None, page_size=DEFAULT_PAGE_SIZE):
+    """Yield pages (lists of `Review`) of `bank`'s reviews dated `start`..`end` (inclusive).
+
+    Rows come from a server-side cursor (`stream_results`), so memory stays at
+    one page however many reviews match.
+    """
+    engine = engine or get_engine()
+    stmt, params = _reviews_query(engine.dialect.name, bank, start, end)
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=page_size).execute(stmt, params)
+        for page in result.partitions():
+            yield [Review(*row) for row in page]
+
+
+def theme_counts(bank=None, start=None, end=None, engine=None):
+    """Reviews per (bank, theme) over days `start`..`end`, largest first within each bank."""
+    engine = engine or get_engine()
+    stmt, params = _theme_query(engine.dialect.name, bank, start, end)
+    with engine.connect() as conn:
+        return [ThemeCount(b, t, int(n)) for b, t, n in conn.execute(stmt, params)]
+
+
+def sentiment_trend(bank=None, start=None, end=None, period='day', engine=None):
+    """Sentiment counts per bank and day (or month), oldest first; undated reviews are left out."""
+    engine = engine or get_engine()
+    stmt, params = _trend_query(engine.dialect.name, bank, start, end, period)
+    with engine.connect() as conn:
+        return [_trend_point(row) for row in conn.execute(stmt, params)]
+
+
+def search_reviews(query, bank=None, rating=None, sentiment=None, start=None, end=None, page=0,
+                   page_size=DEFAULT_SEARCH_PAGE_SIZE, engine=None):
+    """Page `page` (from 0) of the reviews matching `query`, best match first, as `SearchHit`s.
+
+    `query` is web-search style: words and "phrases" must all match, `or`
+    between terms means either, `-term` excludes. `rating` is one rating or a
+    list of ratings; `start`/`end` are inclusive dates.
+    """
+    engine = engine or get_engine()
+    stmt, params = _search_query(engine.dialect.name, query, bank, rating, sentiment, start, end, page, page_size)
+    if stmt is None:
+        return []
+    with engine.connect() as conn:
+        return [SearchHit(*row) for row in conn.execute(stmt, params)]
+
+
+async def reviews_by_bank_async(bank, start=None, end=None, engine=None, page_size=DEFAULT_PAGE_SIZE):
+    """Async `reviews_by_bank`: an async generator of `Review` pages."""
+    engine = engine or get_async_engine()
+    stmt, params = _reviews_query(engine.dialect.name, bank, start, end)
+    async with engine.connect() as conn:
+        result = await conn.stream(stmt.execution_options(yield_per=page_size), params)
+        async for page in result.partitions():
+            yield [Review(*row) for row in page]
+
+
+async def theme_counts_async(bank=None, start=None, end=None, engine=None):
+    engine = engine or get_async_engine()
+    stmt, params = _theme_query(engine.dialect.name, bank, start, end)
+    async with engine.connect() as conn:
+        result = await conn.execute(stmt, params)
+        return [ThemeCount(b, t, int(n)) for b, t, n in result]
+
+
+async def sentiment_trend_async(bank=None, start=None, end=None, period='day', engine=None):
+    engine = engine or get_async_engine()
+    stmt, params = _trend_query(engine.dialect.name, bank, start, end, period)
+    async with engine.connect() as conn:
+        result = await conn.execute(stmt, params)
+        return [_trend_point(row) for row in result]
+
+
+async def search_reviews_async(query, bank=None, rating=None, sentiment=None, start=None, end=None, page=0,
+                               page_size=DEFAULT_SEARCH_PAGE_SIZE, engine=None):
+    engine = engine or get_async_engine()
+    stmt, params = _search_query(engine.dialect.name, query, bank, rating, sentiment, start, end, page, page_size)
+    if stmt is None:
+        return []
+    async with engine.connect() as conn:
+        result = await conn.execute(stmt, params)
+        return [SearchHit(*row) for row in result]
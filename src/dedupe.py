@@ -0,0 +1,107 @@
+"""Bounded-memory duplicate filters for streaming over review text.
+
+Both filters remember review *digests* rather than the text itself:
+
+- ``DigestSet`` keeps exact 64-bit blake2b digests (a few dozen bytes per
+  distinct review, independent of review length).
+- ``BloomFilter`` has a fixed bit budget sized from ``capacity`` and
+  ``error_rate``; memory stays constant, at the cost of occasionally treating
+  a new review as already seen (false positive rate ~``error_rate``).
+
+``filter_new(texts)`` returns a boolean mask marking the first occurrence of
+each text across every call, and records those texts as seen.
+"""
+import hashlib
+import math
+
+import numpy as np
+
+
+def review_digest(text, size=8):
+    return hashlib.blake2b(str(text).encode('utf-8'), digest_size=size).digest()
+
+
+def _first_in_batch(texts):
+    seen = set()
+    mask = []
+    for t in texts:
+        mask.append(t not in seen)
+        seen.add(t)
+    return mask
+
+
+class DigestSet:
+    def __init__(self):
+        self._seen = set()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def filter_new(self, texts):
+        mask = []
+        seen = self._seen
+        for t in texts:
+            d = int.from_bytes(review_digest(t), 'little')
+            if d in seen:
+                mask.append(False)
+            else:
+                seen.add(d)
+                mask.append(True)
+        return np.array(mask, dtype=bool)
+
+
+class BloomFilter:
+    def __init__(self, capacity=10_000_000, error_rate=1e-4):
+        self.capacity = int(capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(64, int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def _positions(self, texts):
+        digests = [review_digest(t, 16) for t in texts]
+        raw = np.frombuffer(b''.join(digests), dtype='<u8').reshape(-1, 2)
+        h1 = raw[:, 0] % np.uint64(self.num_bits)
+        h2 = raw[:, 1] % np.uint64(self.num_bits - 1) + np.uint64(1)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        # Kirsch-Mitzenmacher double hashing: g_i(x) = h1 + i * h2
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+
+    def filter_new(self, texts):
+        texts = [str(t) for t in texts]
+        if not texts:
+            return np.zeros(0, dtype=bool)
+        # duplicates inside the batch are resolved exactly before probing the filter
+        mask = np.array(_first_in_batch(texts), dtype=bool)
+        candidates = [t for t, keep in zip(texts, mask) if keep]
+        pos = self._positions(candidates)
+        byte_idx = (pos >> np.uint64(3)).astype(np.int64)
+        bit_val = (np.uint8(1) << (pos & np.uint64(7)).astype(np.uint8))
+        present = ((self.bits[byte_idx] & bit_val) != 0).all(axis=1)
+        new = ~present
+        np.bitwise_or.at(self.bits, byte_idx[new].ravel(), bit_val[new].ravel())
+        self.count += int(new.sum())
+        mask[np.flatnonzero(mask)] = new
+        return mask
+
+
+DEDUPERS = {
+    'exact': DigestSet,
+    'bloom': BloomFilter,
+}
+
+
+def make_deduper(kind='exact', **kwargs):
+    try:
+        cls = DEDUPERS[kind]
+    except KeyError:
+        raise ValueError('Unknown dedupe mode: ' + kind)
+    return cls(**kwargs)
@@ -0,0 +1,275 @@
+"""Per-stage timing, memory and row-count metrics for the pipeline scripts.
+
+Wrap a stage in ``stage`` (or decorate a function with ``instrumented``)::
+
+    with stage('preprocess') as m:
+        df = ...
+        m.rows = len(df)
+
+    @instrumented('sentiment', rows=lambda result: len(result[0]))
+    def score(texts): ...
+
+Each finished stage yields one record with wall time, CPU time, peak RSS,
+rows and rows/s. ``peak_rss_mb`` is the stage's own high-water mark: on Linux
+the kernel's counter (``VmHWM``) is reset through ``/proc/self/clear_refs`` when
+a stage starts; elsewhere it is None. ``process_peak_rss_mb`` is the peak of
+the whole process so far (``ru_maxrss``). Records are kept in memory (``records()``) and, when a sink
+is configured, appended as JSON lines::
+
+    {"stage": "preprocess", "wall_s": 1.92, "cpu_s": 1.87, "rows": 100000, ...}
+
+Configuration comes from ``configure(metrics=..., profile=...)`` (the scripts
+expose it as ``--metrics`` / ``--profile``) or from the environment:
+
+- ``REVIEWS_METRICS``: JSON-lines file to append to (``-`` for stderr).
+- ``REVIEWS_PROFILE``: ``cprofile`` or ``pyinstrument``; every stage is then
+  profiled and the report saved under ``REVIEWS_PROFILE_DIR``
+  (default ``data/metrics/profiles``). Profiling is off by default. Only one
+  profiler can run at a time, so a stage that starts while another is being
+  profiled (nested in it, or on another thread) is timed but not profiled.
+"""
+import functools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+PROFILERS = ('cprofile', 'pyinstrument')
+DEFAULT_PROFILE_DIR = Path('data/metrics/profiles')
+RUN_ID = uuid.uuid4().hex[:12]
+
+_config = {
+    'metrics': os.environ.get('REVIEWS_METRICS') or None,
+    'profile': os.environ.get('REVIEWS_PROFILE') or None,
+    'profile_dir': Path(os.environ.get('REVIEWS_PROFILE_DIR') or DEFAULT_PROFILE_DIR),
+}
+_records = []
+_lock = threading.Lock()
+_profiling = threading.Lock()  # held by the one stage being profiled
+_open_stages = []  # stages whose peak RSS window is open, on any thread
+_peak_before_reset = 0.0  # resetting VmHWM also resets ru_maxrss, so the process peak is kept here
+
+
+def configure(metrics=None, profile=None, profile_dir=None):
+    """Set the JSON-lines sink and/or profiler; arguments left as None keep their current value."""
+    if profile is not None and profile not in PROFILERS:
+        raise ValueError('Unknown profiler: ' + profile)
+    if metrics is not None:
+        _config['metrics'] = metrics
+    if profile is not None:
+        _config['profile'] = profile
+    if profile_dir is not None:
+        _config['profile_dir'] = Path(profile_dir)
+
+
+def add_arguments(parser):
+    parser.add_argument('--metrics', default=None, help='append per-stage metrics as JSON lines (- for stderr)')
+    parser.add_argument('--profile', default=None, choices=PROFILERS, help='profile every instrumented stage')
+
+
+def configure_from_args(args):
+    configure(metrics=getattr(args, 'metrics', None), profile=getattr(args, 'profile', None))
+
+
+def records():
+    with _lock:
+        return list(_records)
+
+
+def process_peak_rss_mb():
+    """Process high-water RSS in MB since it started, or None where `resource` is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    peak = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    return max(peak, _peak_before_reset)
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as fh:
+            pages = int(fh.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def _hwm_mb():
+    """High-water RSS in MB since the last reset (Linux `VmHWM`), or None."""
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _reset_hwm():
+    try:
+        with open('/proc/self/clear_refs', 'w') as fh:
+            fh.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def _open_peak(m):
+    """Start `m`'s peak RSS window; the peak so far is first credited to the stages already open."""
+    global _peak_before_reset
+    with _lock:
+        hwm = _hwm_mb()
+        if hwm is None:
+            return
+        _peak_before_reset = max(_peak_before_reset, hwm)
+        for other in _open_stages:
+            other.peak_mb = max(other.peak_mb, hwm)
+        if _reset_hwm():
+            m.peak_mb = 0.0
+            _open_stages.append(m)
+
+
+def _close_peak(m):
+    with _lock:
+        if m not in _open_stages:
+            return None
+        _open_stages.remove(m)
+        return max(m.peak_mb, _hwm_mb() or 0.0)
+
+
+def _round(value, digits=2):
+    return round(value, digits) if value is not None else None
+
+
+class StageMetrics:
+    def __init__(self, name, rows=None, **labels):
+        self.name = name
+        self.rows = rows
+        self.labels = labels
+        self.peak_mb = None
+
+    def record(self, wall, cpu, rss_start, peak, status, error=None):
+        rec = {
+            'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'run_id': RUN_ID,
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'script': Path(sys.argv[0]).name if sys.argv and sys.argv[0] else None,
+            'stage': self.name,
+            'status': status,
+            'wall_s': round(wall, 4),
+            'cpu_s': round(cpu, 4),
+            'rows': self.rows,
+            'rows_per_s': round(self.rows / wall, 1) if self.rows is not None and wall > 0 else None,
+            'rss_start_mb': _round(rss_start),
+            'rss_end_mb': _round(current_rss_mb()),
+            'peak_rss_mb': _round(peak),
+            'process_peak_rss_mb': _round(process_peak_rss_mb()),
+        }
+        if error is not None:
+            rec['error'] = error
+        rec.update(self.labels)
+        return rec
+
+
+def emit(rec):
+    with _lock:
+        _records.append(rec)
+        sink = _config['metrics']
+        if not sink:
+            return
+        line = json.dumps(rec, default=str)
+        if sink == '-':
+            print(line, file=sys.stderr, flush=True)
+            return
+        path = Path(sink)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('a', encoding='utf-8') as fh:
+            fh.write(line + '\n')
+
+
+@contextmanager
+def _profiled(name):
+    kind = _config['profile']
+    if not kind or not _profiling.acquire(blocking=False):
+        yield
+        return
+    try:
+        with _profiler(kind, name):
+            yield
+    finally:
+        _profiling.release()
+
+
+@contextmanager
+def _profiler(kind, name):
+    out_dir = _config['profile_dir']
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = out_dir / f'{name}-{RUN_ID}-{time.strftime("%Y%m%d-%H%M%S")}'
+    if kind == 'cprofile':
+        import cProfile
+
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            prof.dump_stats(str(stem) + '.prof')
+        return
+    try:
+        from pyinstrument import Profiler
+    except Exception as e:
+        raise RuntimeError('pyinstrument not available: ' + str(e))
+    prof = Profiler()
+    prof.start()
+    try:
+        yield
+    finally:
+        prof.stop()
+        Path(str(stem) + '.txt').write_text(prof.output_text(), encoding='utf-8')
+
+
+@contextmanager
+def stage(name, rows=None, **labels):
+    """Measure the enclosed block as stage `name`; set `.rows` on the yielded object."""
+    m = StageMetrics(name, rows, **labels)
+    rss_start = current_rss_mb()
+    _open_peak(m)
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    try:
+        with _profiled(name):
+            yield m
+    except BaseException as e:
+        emit(m.record(time.perf_counter() - wall0, time.process_time() - cpu0, rss_start, _close_peak(m), 'error',
+                      f'{type(e).__name__}: {e}'))
+        raise
+    emit(m.record(time.perf_counter() - wall0, time.process_time() - cpu0, rss_start, _close_peak(m), 'ok'))
+
+
+def instrumented(name=None, rows=None, **labels):
+    """Decorator form of `stage`; `rows(result)` gives the row count from the return value."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name or fn.__name__, **labels) as m:
+                result = fn(*args, **kwargs)
+                if rows is not None:
+                    m.rows = rows(result)
+                return result
+        return wrapper
+    return decorate
@@ -0,0 +1,226 @@
+"""TF-IDF keyword extraction with one vocabulary shared by every bank.
+
+``SharedVocabulary`` fits a single ``TfidfVectorizer`` on the whole review
+corpus, so texts are tokenized once. Per-bank keywords then come from row
+slices of that one sparse matrix instead of from a separate fit per bank::
+
+    vocab = SharedVocabulary().fit(texts)
+    keywords = vocab.top_keywords_by_group(vocab.transform(texts), banks, top_k=50)
+    vocab.save('data/cache/tfidf_vocab.pkl')
+
+A saved vocabulary is reloaded with ``SharedVocabulary.load`` and later runs
+only call ``transform``; terms that were not seen at fit time are ignored
+until the vocabulary is refitted.
+
+``HashedKeywordExtractor`` is the out-of-core variant: review chunks are
+hashed into a fixed number of buckets and only per-bucket document
+frequencies and term sums are kept, so memory is bounded by ``memory_mb``
+regardless of corpus size::
+
+    ext = HashedKeywordExtractor(memory_mb=64)
+    for chunk in pd.read_csv(path, usecols=['review'], chunksize=10_000):
+        ext.partial_fit(chunk['review'])
+    ext.top_keywords(top_k=50)
+
+Scores are ``idf * sum(l2-normalized term counts)``, which ranks terms like
+summed TF-IDF without needing the final idf while streaming. Hash collisions
+merge terms that share a bucket; with the default sizes they are rare.
+"""
+import math
+import pickle
+from collections import Counter
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.utils import murmurhash3_32
+
+from src.partition import group_indices
+
+
+DEFAULT_VOCAB_PATH = Path('data/cache/tfidf_vocab.pkl')
+DEFAULT_MEMORY_MB = 64
+DEFAULT_CHUNKSIZE = 10_000
+# rough footprint of one bucket -> term entry in the name table
+_NAME_BYTES = 320
+
+
+def top_keywords(features, scores, top_k):
+    top_idx = np.argsort(scores)[::-1][:top_k]
+    # terms absent from the slice would otherwise pad out small groups
+    return [features[i] for i in top_idx if scores[i] > 0]
+
+
+class SharedVocabulary:
+    def __init__(self, ngram_range=(1, 2), max_features=5000, stop_words='english'):
+        self.params = {'ngram_range': tuple(ngram_range), 'max_features': max_features, 'stop_words': stop_words}
+        self.vectorizer = TfidfVectorizer(**self.params)
+        self.features = None
+
+    @property
+    def fitted(self):
+        return self.features is not None
+
+    def fit(self, texts):
+        self.vectorizer.fit(texts)
+        self.features = self.vectorizer.get_feature_names_out()
+        return self
+
+    def fit_transform(self, texts):
+        X = self.vectorizer.fit_transform(texts)
+        self.features = self.vectorizer.get_feature_names_out()
+        return X
+
+    def transform(self, texts):
+        if not self.fitted:
+            raise RuntimeError('vocabulary has not been fitted')
+        return self.vectorizer.transform(texts)
+
+    def top_keywords(self, X, top_k=30):
+        return top_keywords(self.features, np.asarray(X.sum(axis=0)).ravel(), top_k)
+
+    def top_keywords_by_group(self, X, groups, top_k=30):
+        """Top-k terms per group from row slices of the document-term matrix `X`."""
+        X = X.tocsr()
+        return {g: self.top_keywords(X[idx], top_k) for g, idx in group_indices(groups).items()}
+
+    def save(self, path=DEFAULT_VOCAB_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as fh:
+            pickle.dump({'params': self.params, 'vectorizer': self.vectorizer}, fh)
+        return path
+
+    @classmethod
+    def load(cls, path=DEFAULT_VOCAB_PATH):
+        with open(path, 'rb') as fh:
+            state = pickle.load(fh)
+        vocab = cls(**state['params'])
+        vocab.vectorizer = state['vectorizer']
+        vocab.features = vocab.vectorizer.get_feature_names_out()
+        return vocab
+
+    @classmethod
+    def load_or_fit(cls, texts, path=DEFAULT_VOCAB_PATH, refit=False, **params):
+        """Reuse the vocabulary saved at `path`, fitting and saving one when missing.
+
+        Returns the vocabulary and the document-term matrix for `texts`.
+        """
+        path = Path(path) if path else None
+        if path is not None and path.exists() and not refit:
+            vocab = cls.load(path)
+            return vocab, vocab.transform(texts)
+        vocab = cls(**params)
+        X = vocab.fit_transform(texts)
+        if path is not None:
+            vocab.save(path)
+        return vocab, X
+
+
+class HashedKeywordExtractor:
+    """Streaming keyword extractor whose state is bounded by `memory_mb`.
+
+    Half of the budget holds per-bucket statistics (float64 term sums and
+    int64 document frequencies); the other half holds the table that maps
+    hashed buckets back to a readable term. The table is pruned to the best
+    scoring buckets whenever it fills up. Transient memory per
+    `partial_fit` call grows with the chunk size.
+    """
+
+    def __init__(self, ngram_range=(1, 2), stop_words='english', memory_mb=DEFAULT_MEMORY_MB, n_features=None):
+        budget = int(memory_mb * 1024 * 1024) // 2
+        if n_features is None:
+            n_features = 2 ** min(24, max(10, int(math.log2(max(budget // 16, 1)))))
+        self.n_features = int(n_features)
+        self.name_capacity = max(1000, budget // _NAME_BYTES)
+        self._analyzer = HashingVectorizer(ngram_range=ngram_range, stop_words=stop_words).build_analyzer()
+        self._hasher = FeatureHasher(n_features=self.n_features, input_type='string', alternate_sign=False)
+        self.term_sums = np.zeros(self.n_features, dtype=np.float64)
+        self.doc_freq = np.zeros(self.n_features, dtype=np.int64)
+        self.n_docs = 0
+        self._names = {}
+
+    def bucket(self, term):
+        # same mapping FeatureHasher uses for string features
+        return abs(murmurhash3_32(term, seed=0)) % self.n_features
+
+    def partial_fit(self, texts):
+        docs = [self._analyzer(str(t)) for t in texts]
+        if not docs:
+            return self
+        X = self._hasher.transform(docs).tocsr()
+        X.sum_duplicates()
+        self.n_docs += X.shape[0]
+        self.doc_freq += np.bincount(X.indices, minlength=self.n_features)
+        X = normalize(X)
+        self.term_sums += np.bincount(X.indices, weights=X.data, minlength=self.n_features)
+
+        # per bucket keep the term most likely to dominate it (Boyer-Moore
+        # majority vote weighted by occurrences), so collisions with rare
+        # terms do not hide the frequent one
+        names = self._names
+        for term, count in Counter(chain.from_iterable(docs)).items():
+            b = self.bucket(term)
+            held = names.get(b)
+            if held is None:
+                names[b] = (term, count)
+            elif held[0] == term:
+                names[b] = (term, held[1] + count)
+            elif count > held[1]:
+                names[b] = (term, count - held[1])
+            else:
+                names[b] = (held[0], held[1] - count)
+        if len(names) > self.name_capacity:
+            self._prune_names()
+        return self
+
+    def scores(self, buckets=slice(None)):
+        idf = np.log((1 + self.n_docs) / (1 + self.doc_freq[buckets])) + 1
+        return self.term_sums[buckets] * idf
+
+    def _ranked_names(self):
+        buckets = np.fromiter(self._names, dtype=np.int64, count=len(self._names))
+        scores = self.scores(buckets)
+        order = np.argsort(scores, kind='stable')[::-1]
+        return buckets[order], scores[order]
+
+    def _prune_names(self):
+        buckets, _ = self._ranked_names()
+        self._names = {int(b): self._names[int(b)] for b in buckets[:self.name_capacity // 2]}
+
+    def top_keywords(self, top_k=30):
+        # only named buckets can be reported; a bucket whose name was pruned
+        # gets it back the next time one of its terms occurs
+        buckets, scores = self._ranked_names()
+        return [self._names[int(b)][0] for b in buckets[scores > 0][:top_k]]
+
+
+def stream_keywords(chunks, top_k=30, **kwargs):
+    """Top-k keywords over an iterable of text chunks with bounded memory."""
+    ext = HashedKeywordExtractor(**kwargs)
+    for texts in chunks:
+        ext.partial_fit(texts)
+    return ext.top_keywords(top_k)
+
+
+def stream_keywords_by_group(frames, text_col='review', group_col='bank', top_k=30, **kwargs):
+    """Per-group top-k keywords over an iterable of DataFrame chunks.
+
+    Each group gets its own extractor, so `memory_mb` applies per group.
+    """
+    extractors = {}
+    for frame in frames:
+        texts = frame[text_col].astype(str).to_numpy()
+        for g, idx in group_indices(frame[group_col].to_numpy()).items():
+            if g not in extractors:
+                extractors[g] = HashedKeywordExtractor(**kwargs)
+            extractors[g].partial_fit(texts[idx])
+    return {g: extractors[g].top_keywords(top_k) for g in sorted(extractors)}
+
+
+def iter_chunks(df, chunksize=DEFAULT_CHUNKSIZE):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
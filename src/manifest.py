@@ -0,0 +1,74 @@
+"""Manifest of reviews already written to the thematic output.
+
+The manifest sits next to the output (``reviews_thematic.manifest.json``) and
+records:
+
+- ``fingerprint``: hash of the settings the output depends on (sentiment
+  model, theme keyword rules, keyword mode); a mismatch forces a rebuild.
+- ``theme_maps``: the per-bank theme map each bank's rows were assigned with.
+- ``hashes``: one ``row_hash(bank, review)`` per output row, in output order.
+
+Incremental runs only score and theme-assign rows whose hash is not listed.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+
+MANIFEST_VERSION = 1
+
+
+def row_hash(bank, text):
+    h = hashlib.blake2b(digest_size=8)
+    h.update(str(bank).encode('utf-8'))
+    h.update(b'\0')
+    h.update(str(text).encode('utf-8'))
+    return h.hexdigest()
+
+
+def row_hashes(banks, texts):
+    return [row_hash(b, t) for b, t in zip(banks, texts)]
+
+
+def fingerprint(settings):
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def manifest_path(out_path):
+    out_path = Path(out_path)
+    return out_path.with_name(out_path.stem + '.manifest.json')
+
+
+class Manifest:
+    def __init__(self, fingerprint, theme_maps=None, hashes=None):
+        self.fingerprint = fingerprint
+        self.theme_maps = dict(theme_maps or {})
+        self.hashes = list(hashes or [])
+
+    @classmethod
+    def load(cls, path):
+        """Return the manifest stored at `path`, or None when missing or unreadable."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            state = json.loads(path.read_text(encoding='utf-8'))
+        except ValueError:
+            return None
+        if state.get('version') != MANIFEST_VERSION:
+            return None
+        return cls(state['fingerprint'], state['theme_maps'], state['hashes'])
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            'version': MANIFEST_VERSION,
+            'fingerprint': self.fingerprint,
+            'theme_maps': self.theme_maps,
+            'hashes': self.hashes,
+        }
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(json.dumps(state), encoding='utf-8')
+        tmp.replace(path)
+        return path
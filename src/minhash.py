@@ -0,0 +1,195 @@
+"""Near-duplicate review detection with MinHash signatures and LSH buckets.
+
+Reviews are normalized (lowercased, punctuation collapsed) and cut into
+character ``shingle_size``-grams. Reviews that are only emoji or punctuation
+are shingled as written (lowercased) instead, and empty reviews are always
+their own cluster, so such reviews are not all merged into one. Each review gets a ``num_perm``-value MinHash
+signature; the fraction of equal values between two signatures estimates the
+Jaccard similarity of their shingle sets.
+
+``NearDuplicateIndex`` clusters a stream of reviews without comparing every
+pair. Signatures are split into bands, and only reviews that share a band
+bucket with an existing cluster's representative are compared with it. A
+review joins the most similar candidate cluster whose estimated similarity
+reaches ``threshold``, and otherwise starts a new cluster as its
+representative::
+
+    index = NearDuplicateIndex(threshold=0.8)
+    for chunk in chunks:
+        cluster_ids, representative = index.assign(chunk['review'])
+
+Cluster ids are consecutive integers in order of first appearance, so keeping
+``representative`` rows keeps one review per cluster. Memory grows with the
+number of clusters: one signature (``4 * num_perm`` bytes) and one bucket
+entry per band for each representative.
+"""
+import re
+
+import numpy as np
+
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_SEED = 1
+# shingles hashed per block; bounds the (shingles x num_perm) scratch matrix
+_BLOCK_SHINGLES = 1 << 15
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    return _NON_WORD.sub(' ', str(text).lower()).strip()
+
+
+def shingle_text(text):
+    """`normalize(text)`, or the lowercased text itself when normalizing leaves nothing."""
+    return normalize(text) or str(text).lower().strip()
+
+
+def _mix64(x):
+    """splitmix64 finalizer over a uint64 array (wrapping arithmetic)."""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def lsh_params(threshold, num_perm):
+    """(bands, rows) with bands * rows <= num_perm whose S-curve midpoint (1/b)^(1/r) is closest to `threshold`."""
+    if not 0 < threshold < 1:
+        raise ValueError('threshold must be between 0 and 1')
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        err = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or err < best[0]:
+            best = (err, bands, rows)
+    return best[1], best[2]
+
+
+class MinHasher:
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, shingle_size=DEFAULT_SHINGLE_SIZE, seed=DEFAULT_SEED):
+        self.num_perm = int(num_perm)
+        self.shingle_size = int(shingle_size)
+        rng = np.random.default_rng(seed)
+        # multiply-shift hash family h(x) = (a * x mod 2**64) >> 32 with odd a; x is already well mixed
+        self._a = rng.integers(0, 2 ** 63, self.num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+    def shingles(self, texts):
+        """Hashed shingles of every text, flat, plus the number of shingles per text."""
+        k = self.shingle_size
+        # texts shorter than one shingle are padded so every text has at least one
+        encoded = [shingle_text(t).ljust(k).encode('utf-8') for t in texts]
+        lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+        counts = lengths - k + 1
+        buf = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+        offsets = np.cumsum(lengths) - lengths
+        first = np.cumsum(counts) - counts
+        starts = np.repeat(offsets - first, counts) + np.arange(counts.sum())
+        ids = np.zeros(len(starts), dtype=np.uint64)
+        for j in range(k):
+            ids = (ids << np.uint64(8)) | buf[starts + j]
+        return _mix64(ids), counts
+
+    def signatures(self, texts):
+        """(len(texts), num_perm) uint32 MinHash signatures."""
+        ids, counts = self.shingles(texts)
+        # permutations x texts, so the per-text minimum runs along contiguous rows
+        sig = np.empty((self.num_perm, len(counts)), dtype=np.uint32)
+        ends = np.cumsum(counts)
+        starts = ends - counts
+        doc = 0
+        while doc < len(counts):
+            stop = max(doc + 1, int(np.searchsorted(ends, starts[doc] + _BLOCK_SHINGLES, side='right')))
+            x = ids[starts[doc]:ends[stop - 1]]
+            hashed = np.multiply(self._a[:, None], x[None, :])
+            np.right_shift(hashed, np.uint64(32), out=hashed)
+            sig[:, doc:stop] = np.minimum.reduceat(hashed.astype(np.uint32), starts[doc:stop] - starts[doc], axis=1)
+            doc = stop
+        return np.ascontiguousarray(sig.T)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures."""
+    return np.count_nonzero(sig_a == sig_b) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, shingle_size=DEFAULT_SHINGLE_SIZE,
+                 seed=DEFAULT_SEED):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.bands, self.rows = lsh_params(threshold, self.hasher.num_perm)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._reps = np.empty((1024, self.hasher.num_perm), dtype=np.uint32)
+        self._count = 0
+
+    def __len__(self):
+        """Number of clusters seen so far."""
+        return self._count
+
+    def _band_keys(self, sig):
+        bands = sig[:, :self.bands * self.rows].reshape(len(sig), self.bands, self.rows).astype(np.uint64)
+        keys = np.zeros((len(sig), self.bands), dtype=np.uint64)
+        for j in range(self.rows):
+            keys = _mix64(keys ^ bands[:, :, j])
+        return keys
+
+    def _add(self, sig, keys=()):
+        c = self._count
+        if c == len(self._reps):
+            self._reps = np.concatenate([self._reps, np.empty_like(self._reps)])
+        self._reps[c] = sig
+        for bucket, key in zip(self._buckets, keys):
+            # one representative per bucket is the common case; keep a list only on collisions
+            prev = bucket.get(key)
+            if prev is None:
+                bucket[key] = c
+            elif isinstance(prev, list):
+                prev.append(c)
+            else:
+                bucket[key] = [prev, c]
+        self._count += 1
+        return c
+
+    def _candidates(self, keys):
+        found = set()
+        for bucket, key in zip(self._buckets, keys):
+            hit = bucket.get(key)
+            if hit is None:
+                continue
+            if isinstance(hit, list):
+                found.update(hit)
+            else:
+                found.add(hit)
+        return found
+
+    def assign(self, texts):
+        """Cluster ids for `texts` (continuing earlier calls) and a mask of the new representatives."""
+        texts = list(texts)
+        ids = np.empty(len(texts), dtype=np.int64)
+        new = np.zeros(len(texts), dtype=bool)
+        if not texts:
+            return ids, new
+        sigs = self.hasher.signatures(texts)
+        all_keys = self._band_keys(sigs).tolist()
+        for i, keys in enumerate(all_keys):
+            if not shingle_text(texts[i]):
+                # nothing to compare: a cluster of its own, kept out of the buckets
+                ids[i], new[i] = self._add(sigs[i]), True
+                continue
+            best, best_sim = -1, self.threshold
+            for c in sorted(self._candidates(keys)):
+                sim = similarity(self._reps[c], sigs[i])
+                if sim > best_sim or (sim == best_sim and best < 0):
+                    best, best_sim = c, sim
+            if best < 0:
+                best = self._add(sigs[i], keys)
+                new[i] = True
+            ids[i] = best
+        return ids, new
+
+
+def near_duplicate_clusters(texts, threshold=DEFAULT_THRESHOLD, **kwargs):
+    """One-shot `NearDuplicateIndex.assign` over `texts`."""
+    return NearDuplicateIndex(threshold, **kwargs).assign(texts)
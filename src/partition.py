@@ -0,0 +1,61 @@
+"""Per-bank (or any per-key) partitioning of review frames.
+
+Rows are grouped once with ``groupby(...).indices`` instead of a boolean mask
+per key, and each partition can be processed independently, optionally on a
+process pool::
+
+    for bank, part in partitions(df, df['bank']):
+        ...
+
+    labels = map_partitions(label_bank, df['review'], df['bank'], workers=4)
+    # {bank: label_bank(bank, reviews_of_that_bank)}, banks in sorted order
+
+``partition_order`` gives the row positions in partition order, so per-partition
+results can be concatenated into whole output columns.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+def group_indices(groups):
+    """Map each distinct group value to the row positions holding it (sorted by group)."""
+    groups = np.asarray(groups, dtype=object)
+    idx = pd.Series(groups).groupby(groups).indices
+    return {g: idx[g] for g in sorted(idx)}
+
+
+def partitions(data, keys):
+    """Yield (key, rows of `data` with that key) in sorted key order; `data` is a Series or DataFrame."""
+    for key, pos in group_indices(keys).items():
+        yield key, data.iloc[pos]
+
+
+def partition_order(indices):
+    """Row positions of all partitions of `group_indices` output, concatenated in key order."""
+    if not indices:
+        return np.array([], dtype=np.intp)
+    return np.concatenate(list(indices.values()))
+
+
+def _apply(job):
+    fn, key, part = job
+    return fn(key, part)
+
+
+def map_partitions(fn, data, keys, workers=1, indices=None):
+    """{key: fn(key, partition)} for every partition of `data` by `keys`.
+
+    With `workers` > 1 partitions are processed on a process pool, so `fn` must be
+    picklable (a module-level function or a `functools.partial` of one). Pass
+    `indices` to reuse an existing `group_indices(keys)` result.
+    """
+    indices = group_indices(keys) if indices is None else indices
+    jobs = [(fn, key, data.iloc[pos]) for key, pos in indices.items()]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(_apply, jobs))
+    else:
+        results = [_apply(job) for job in jobs]
+    return dict(zip(indices, results))
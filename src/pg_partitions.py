@@ -0,0 +1,304 @@
+"""Optional range-partitioned layout of ``reviews`` on PostgreSQL.
+
+``convert`` turns the plain ``reviews`` table into a declaratively partitioned
+one, without changing column types or the ``review_id`` sequence:
+
+- one partition per calendar month of ``review_date`` (``reviews_y2024m05``);
+- optionally each month list-partitioned by ``bank_id`` (``reviews_y2024m05_b3``,
+  plus ``reviews_y2024m05_bdefault`` for banks added after the month was created);
+- ``reviews_default`` for undated reviews and months without a partition.
+
+Queries bounded by ``review_date`` (and ``bank_id``) then only touch the
+matching partitions, and old data is archived by detaching whole months
+instead of a bulk ``DELETE``.
+
+What changes with the layout:
+
+- PostgreSQL cannot enforce a unique index that leaves out the partition key,
+  so ``uq_reviews_source_key`` becomes unique on ``(source, review_key,
+  review_date, bank_id)`` and the loader merges by ``(source, review_key)`` itself
+  (``MERGE_SQL``) instead of ``ON CONFLICT``.
+- ``review_themes.review_id`` no longer has a foreign key to ``reviews``;
+  ``archive`` moves a month's theme links along with its reviews.
+- The daily rollups keep the history of archived months: the loader only
+  recomputes the days it touches, and a full ``scripts/refresh_rollups.py``
+  rebuilds from ``history_start`` on rather than from scratch.
+
+Every function takes a DB-API cursor inside the caller's transaction (see
+``scripts/partition_reviews.py``); the loader calls ``ensure_months`` before
+writing so new rows land in their month rather than the default partition.
+"""
+import re
+from datetime import date, datetime
+from functools import partial
+
+from src import search
+
+
+DEFAULT_PARTITION = 'reviews_default'
+ARCHIVE_SCHEMA = 'archive'
+DEFAULT_MONTHS_AHEAD = 3
+MOVED_TABLE = 'reviews_partition_moved'
+COLUMNS = [
+    'review_id', 'bank_id', 'review_text', 'rating', 'review_date', 'sentiment_label', 'sentiment_score',
+    'source', 'raw_review_id', 'review_key', 'content_hash',
+]
+LAYOUTS = {'month': 'partitioned by month', 'month_bank': 'partitioned by month, then bank_id'}
+PARENT_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_reviews_bank_id ON reviews (bank_id)',
+    'CREATE INDEX IF NOT EXISTS idx_reviews_review_date ON reviews (review_date)',
+    'CREATE INDEX IF NOT EXISTS idx_reviews_review_id ON reviews (review_id)',
+    # unique indexes must contain the partition keys; the loader keeps (source, review_key) unique
+    'CREATE UNIQUE INDEX IF NOT EXISTS uq_reviews_source_key ON reviews (source, review_key, review_date, bank_id)',
+]
+_MONTH_NAME = re.compile(r'^reviews_y(\d{4})m(\d{2})$')
+_MONTH = re.compile(r'^(\d{4})-(\d{2})')
+
+# upsert for the partitioned layout: update changed rows (moving them across months if their date
+# changed), then insert keys that are not stored yet
+MERGE_SQL = [
+    'UPDATE reviews r SET {updates} FROM {staging} s '
+    'WHERE r.source = s.source AND r.review_key = s.review_key '
+    'AND r.content_hash IS DISTINCT FROM s.content_hash',
+    'INSERT INTO reviews ({cols}) SELECT {cols} FROM {staging} s WHERE NOT EXISTS '
+    '(SELECT 1 FROM reviews r WHERE r.source = s.source AND r.review_key = s.review_key)',
+]
+
+
+def month_start(value):
+    """First day of the month of a date, datetime or 'YYYY-MM[-DD...]' string."""
+    if isinstance(value, (date, datetime)):
+        return date(value.year, value.month, 1)
+    m = _MONTH.match(str(value))
+    if not m:
+        raise ValueError('Not a month: ' + str(value))
+    return date(int(m.group(1)), int(m.group(2)), 1)
+
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def months_between(first, last):
+    """Every month from `first` to `last`, inclusive."""
+    first, last = month_start(first), month_start(last)
+    out = []
+    while first <= last:
+        out.append(first)
+        first = add_months(first, 1)
+    return out
+
+
+def months_of(values):
+    """Distinct months of date values (None and unparsable values are skipped), sorted."""
+    found = set()
+    for v in values:
+        if v is None:
+            continue
+        try:
+            found.add(month_start(v))
+        except ValueError:
+            continue
+    return sorted(found)
+
+
+def partition_name(month, bank_id=None):
+    name = f'reviews_y{month.year}m{month.month:02d}'
+    return name if bank_id is None else f'{name}_b{bank_id}'
+
+
+def layout(cur):
+    """'month' or 'month_bank' when `reviews` is partitioned, else None."""
+    cur.execute(
+        "SELECT c.relkind, obj_description(c.oid, 'pg_class') FROM pg_class c WHERE c.oid = to_regclass('reviews')"
+    )
+    row = cur.fetchone()
+    if row is None or row[0] != 'p':
+        return None
+    return 'month_bank' if row[1] == LAYOUTS['month_bank'] else 'month'
+
+
+def _children(cur, table):
+    cur.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        f"WHERE i.inhparent = to_regclass('{table}')"
+    )
+    return [name for (name,) in cur.fetchall()]
+
+
+def months(cur):
+    """Months that have a partition, oldest first."""
+    found = [_MONTH_NAME.match(name) for name in _children(cur, 'reviews')]
+    return sorted(date(int(m.group(1)), int(m.group(2)), 1) for m in found if m)
+
+
+def history_start(cur):
+    """First day a full rollup refresh rebuilds, or None when `reviews` is not partitioned.
+
+    That is the oldest month still attached (or holding a row in the default
+    partition); rollup days before it belong to archived months and are kept.
+    """
+    if layout(cur) is None:
+        return None
+    cur.execute('SELECT min(review_date) FROM reviews')
+    oldest = cur.fetchone()[0]
+    found = months(cur) + ([month_start(oldest)] if oldest is not None else [])
+    return min(found) if found else month_start(date.today())
+
+
+def _bank_ids(cur):
+    cur.execute('SELECT bank_id FROM banks ORDER BY bank_id')
+    return [row[0] for row in cur.fetchall()]
+
+
+def _exists(cur, table):
+    cur.execute(f"SELECT to_regclass('{table}') IS NOT NULL")
+    return cur.fetchone()[0]
+
+
+def _create_moving(cur, create_sql, source, parent, condition, after_create=None):
+    """Run `create_sql` (a new partition of `parent`); rows of the default partition `source` matching
+    `condition` would violate it, so they are moved out first and re-routed through `parent`.
+
+    `after_create()` runs before the rows are re-routed, e.g. to give a new
+    sub-partitioned month the children they land in.
+    """
+    cols = ', '.join(COLUMNS)
+    cur.execute(f'SELECT EXISTS (SELECT 1 FROM {source} WHERE {condition})')
+    if not cur.fetchone()[0]:
+        cur.execute(create_sql)
+        if after_create is not None:
+            after_create()
+        return
+    cur.execute(f'CREATE TEMPORARY TABLE {MOVED_TABLE} AS SELECT {cols} FROM {source} WHERE {condition}')
+    cur.execute(f'DELETE FROM {source} WHERE {condition}')
+    cur.execute(create_sql)
+    if after_create is not None:
+        after_create()
+    cur.execute(f'INSERT INTO {parent} ({cols}) SELECT {cols} FROM {MOVED_TABLE}')
+    cur.execute(f'DROP TABLE {MOVED_TABLE}')
+
+
+def _ensure_bank_partitions(cur, month, bank_ids):
+    parent = partition_name(month)
+    default = f'{parent}_bdefault'
+    if not _exists(cur, default):
+        cur.execute(f'CREATE TABLE {default} PARTITION OF {parent} DEFAULT')
+    for bank_id in bank_ids:
+        name = partition_name(month, bank_id)
+        if not _exists(cur, name):
+            _create_moving(cur, f'CREATE TABLE {name} PARTITION OF {parent} FOR VALUES IN ({int(bank_id)})',
+                           default, parent, f'bank_id = {int(bank_id)}')
+
+
+def ensure_months(cur, wanted, kind=None):
+    """Create the partitions for the months in `wanted` that lack one; returns the months created.
+
+    On the month_bank layout, months that exist also get sub-partitions for
+    banks added since they were created.
+    """
+    kind = kind or layout(cur)
+    if kind is None:
+        raise RuntimeError('reviews is not partitioned; run scripts/partition_reviews.py convert first')
+    existing = set(months(cur))
+    bank_ids = _bank_ids(cur) if kind == 'month_bank' else []
+    created = []
+    for month in sorted({month_start(m) for m in wanted}):
+        sub_partitions = partial(_ensure_bank_partitions, cur, month, bank_ids) if kind == 'month_bank' else None
+        if month not in existing:
+            lo, hi = month.isoformat(), add_months(month, 1).isoformat()
+            sub = ' PARTITION BY LIST (bank_id)' if kind == 'month_bank' else ''
+            _create_moving(
+                cur,
+                f"CREATE TABLE {partition_name(month)} PARTITION OF reviews FOR VALUES FROM ('{lo}') TO ('{hi}'){sub}",
+                DEFAULT_PARTITION, 'reviews', f"review_date >= '{lo}' AND review_date < '{hi}'", sub_partitions,
+            )
+            created.append(month)
+        elif sub_partitions is not None:
+            sub_partitions()
+    return created
+
+
+def ensure_future(cur, months_ahead=DEFAULT_MONTHS_AHEAD, today=None):
+    """Make sure the current month and the next `months_ahead` months have partitions."""
+    first = month_start(today or date.today())
+    return ensure_months(cur, months_between(first, add_months(first, months_ahead)))
+
+
+def convert(cur, by_bank=False, months_ahead=DEFAULT_MONTHS_AHEAD, today=None):
+    """Rebuild a plain `reviews` table as the partitioned layout; returns the months created.
+
+    Runs in the caller's transaction and rewrites every row, so it holds an
+    exclusive lock on `reviews` until commit.
+    """
+    if layout(cur) is not None:
+        raise RuntimeError('reviews is already partitioned')
+    kind = 'month_bank' if by_bank else 'month'
+    cur.execute('LOCK TABLE reviews IN ACCESS EXCLUSIVE MODE')
+    cur.execute('ALTER TABLE reviews RENAME TO reviews_unpartitioned')
+    # same columns, types, defaults (the review_id sequence) and the generated search column
+    cur.execute('CREATE TABLE reviews (LIKE reviews_unpartitioned INCLUDING DEFAULTS INCLUDING GENERATED) '
+                'PARTITION BY RANGE (review_date)')
+    cur.execute(f"COMMENT ON TABLE reviews IS '{LAYOUTS[kind]}'")
+    cur.execute('ALTER TABLE reviews ALTER COLUMN review_id SET NOT NULL')
+    cur.execute('ALTER TABLE reviews ADD FOREIGN KEY (bank_id) REFERENCES banks (bank_id) ON DELETE CASCADE')
+    cur.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF reviews DEFAULT')
+
+    cur.execute("SELECT min(review_date), max(review_date) FROM reviews_unpartitioned")
+    first, last = cur.fetchone()
+    now = month_start(today or date.today())
+    first = min(month_start(first), now) if first is not None else now
+    last = max(month_start(last), add_months(now, months_ahead)) if last is not None else add_months(now, months_ahead)
+    created = ensure_months(cur, months_between(first, last), kind)
+
+    cols = ', '.join(COLUMNS)
+    cur.execute(f'INSERT INTO reviews ({cols}) SELECT {cols} FROM reviews_unpartitioned')
+    if _exists(cur, 'review_themes'):
+        cur.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = 'review_themes'::regclass "
+            "AND confrelid = 'reviews_unpartitioned'::regclass"
+        )
+        for (name,) in cur.fetchall():
+            cur.execute(f'ALTER TABLE review_themes DROP CONSTRAINT {name}')
+    cur.execute("SELECT pg_get_serial_sequence('reviews_unpartitioned', 'review_id')")
+    sequence = cur.fetchone()[0]
+    if sequence:
+        cur.execute(f'ALTER SEQUENCE {sequence} OWNED BY reviews.review_id')
+    cur.execute('DROP TABLE reviews_unpartitioned')
+    for ddl in PARENT_INDEXES + search.POSTGRES_DDL:
+        cur.execute(ddl)
+    return created
+
+
+def archive(cur, before, drop=False, schema=ARCHIVE_SCHEMA):
+    """Detach every month partition older than the month of `before`; returns the detached names.
+
+    Detached months move to `schema` together with their `review_themes` rows
+    (``<schema>.review_themes_y2024m05``), or are dropped with `drop`.
+    """
+    if layout(cur) is None:
+        raise RuntimeError('reviews is not partitioned')
+    cutoff = month_start(before)
+    has_themes = _exists(cur, 'review_themes')
+    if not drop:
+        cur.execute(f'CREATE SCHEMA IF NOT EXISTS {schema}')
+    detached = []
+    for month in [m for m in months(cur) if m < cutoff]:
+        name = partition_name(month)
+        if has_themes:
+            if not drop:
+                cur.execute(
+                    f'CREATE TABLE {schema}.review_themes_{name[len("reviews_"):]} AS SELECT t.* FROM review_themes t '
+                    f'WHERE t.review_id IN (SELECT review_id FROM {name})'
+                )
+            cur.execute(f'DELETE FROM review_themes WHERE review_id IN (SELECT review_id FROM {name})')
+        cur.execute(f'ALTER TABLE reviews DETACH PARTITION {name}')
+        if drop:
+            cur.execute(f'DROP TABLE {name}')
+        else:
+            # SET SCHEMA does not carry bank sub-partitions along
+            for table in [name] + _children(cur, name):
+                cur.execute(f'ALTER TABLE {table} SET SCHEMA {schema}')
+        detached.append(name)
+    return detached
@@ -0,0 +1,393 @@
+"""Run the review pipeline as a DAG of cached stages.
+
+Usage:
+    python -m src.pipeline                          # preprocess -> sentiment -> thematic -> eda
+    python -m src.pipeline --database-url sqlite:///data/bank_reviews.db
+    python -m src.pipeline --scrape --workers 4
+    python -m src.pipeline --force thematic         # rerun one stage (and whatever it changes)
+
+Stages and their dependencies::
+
+    scrape (opt-in) -> preprocess -> sentiment -> thematic -> db_load (with a database URL)
+                                              \\-> eda
+
+DataFrames are handed from stage to stage in memory. Every processed dataset
+is still written where the standalone scripts put it, so both can be mixed.
+Sentiment is computed once and reused by the thematic stage.
+
+A stage is skipped when its fingerprint matches the last successful run and
+the files it wrote are still there, untouched. The fingerprint covers the
+stage's parameters, the content of its input files and the content
+fingerprint of each upstream output. An upstream stage that reruns but
+produces identical output therefore does not invalidate its dependents.
+Fingerprints are kept in ``data/cache/pipeline_state.json``. A skipped stage's
+output is only read back from disk when a stage that does run needs it (and
+recomputed if it cannot be read).
+
+Run it from the repository root; paths are relative like in the scripts.
+
+Stages whose dependencies are satisfied run concurrently (``--max-parallel``),
+so the EDA plots and the database load overlap.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import pandas as pd
+
+from src.instrumentation import add_arguments, configure_from_args, stage as instrument_stage
+from src.storage import FORMATS, META_FILE, load_processed, parquet_path, save_processed
+
+
+DEFAULT_STATE_PATH = Path('data/cache/pipeline_state.json')
+RAW_GLOB = 'data/raw/raw_*.csv'
+CLEAN_PATH = Path('data/processed/reviews_clean.csv')
+THEMATIC_PATH = Path('data/processed/reviews_thematic.csv')
+EDA_DIR = Path('notebooks/outputs')
+_HASH_BLOCK = 1 << 20
+
+
+def _digest(*parts):
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(str(p).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def file_fingerprint(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(_HASH_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def frame_fingerprint(df):
+    """Content hash of a DataFrame (values, index and column names)."""
+    rows = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return _digest(list(df.columns), [str(t) for t in df.dtypes], hashlib.sha256(rows.tobytes()).hexdigest())
+
+
+def value_fingerprint(value):
+    if value is None:
+        return None
+    if isinstance(value, pd.DataFrame):
+        return frame_fingerprint(value)
+    return _digest(repr(value))
+
+
+class Stage:
+    """One node of the DAG.
+
+    `fn(inputs)` receives ``{dep_name: value}`` and returns the stage's value
+    (usually a DataFrame, or None for side-effect stages). `files()` lists
+    external inputs whose content is fingerprinted, each by `fingerprint(path)`
+    (default: a sha256 of the file). `outputs` (paths, or a
+    callable returning them) are the files the stage writes; a skip requires
+    them unchanged since the stage last ran. `load()` reads the stage's value
+    back from disk when it was skipped. `always=True` stages never skip
+    (e.g. scraping).
+    """
+
+    def __init__(self, name, fn, deps=(), params=None, files=None, outputs=(), load=None, always=False,
+                 fingerprint=file_fingerprint):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.params = params or {}
+        self.files = files
+        self.fingerprint = fingerprint
+        self.outputs = outputs
+        self.load = load
+        self.always = always
+
+    def output_paths(self):
+        outputs = self.outputs() if callable(self.outputs) else self.outputs
+        return [Path(p) for p in outputs]
+
+
+def file_stats(paths):
+    """{path: [size, mtime_ns]} for the paths that exist."""
+    stats = {}
+    for p in paths:
+        if p.exists():
+            st = p.stat()
+            stats[str(p)] = [st.st_size, st.st_mtime_ns]
+    return stats
+
+
+class Pipeline:
+    def __init__(self, stages, state_path=DEFAULT_STATE_PATH, max_parallel=2):
+        self.stages = {s.name: s for s in stages}
+        for s in stages:
+            missing = [d for d in s.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f'Unknown dependency for {s.name}: ' + ', '.join(missing))
+        self.order = self._toposort()
+        self.state_path = Path(state_path) if state_path else None
+        self.max_parallel = max(1, int(max_parallel))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _toposort(self):
+        order, done, visiting = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError('Cycle in pipeline at stage ' + name)
+            visiting.add(name)
+            for d in self.stages[name].deps:
+                visit(d)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _load_state(self):
+        if self.state_path is None or not self.state_path.exists():
+            return {}
+        try:
+            return json.loads(self.state_path.read_text(encoding='utf-8'))
+        except ValueError:
+            return {}
+
+    def _save_state(self, state):
+        if self.state_path is None:
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(self.state_path.name + '.tmp')
+        tmp.write_text(json.dumps(state, indent=2, sort_keys=True), encoding='utf-8')
+        tmp.replace(self.state_path)
+
+    def _input_fingerprint(self, stage, output_fps):
+        files = sorted(str(p) for p in (stage.files() if stage.files else []))
+        return _digest(
+            stage.name,
+            json.dumps(stage.params, sort_keys=True, default=str),
+            [(p, stage.fingerprint(p)) for p in files],
+            [(d, output_fps[d]) for d in stage.deps],
+        )
+
+    def value(self, name):
+        """Value of stage `name`, loading a skipped stage's output from disk on first use."""
+        with self._lock:
+            if name in self._values:
+                return self._values[name]
+        stage = self.stages[name]
+        try:
+            value = stage.load() if stage.load else None
+        except FileNotFoundError:
+            print(f'[pipeline] {name}: saved output missing, recomputing')
+            value = stage.fn({d: self.value(d) for d in stage.deps})
+        with self._lock:
+            return self._values.setdefault(name, value)
+
+    def _execute(self, stage, input_fp):
+        inputs = {d: self.value(d) for d in stage.deps}
+        with instrument_stage('pipeline.' + stage.name):
+            value = stage.fn(inputs)
+        with self._lock:
+            self._values[stage.name] = value
+        return input_fp, value_fingerprint(value) or input_fp
+
+    def run(self, targets=None, force=()):
+        """Run the stages needed for `targets` (default: all); returns {stage: 'ran'|'skipped'}."""
+        wanted = self._closure(targets or self.order)
+        force = set(force)
+        state = self._load_state()
+        output_fps, status = {}, {}
+        pending = [n for n in self.order if n in wanted]
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            while pending or running:
+                for name in [n for n in pending if all(d in status for d in self.stages[n].deps)]:
+                    pending.remove(name)
+                    stage = self.stages[name]
+                    input_fp = self._input_fingerprint(stage, output_fps)
+                    prev = state.get(name, {})
+                    outputs = stage.output_paths()
+                    fresh = (not stage.always and name not in force and prev.get('input') == input_fp
+                             and len(file_stats(outputs)) == len(outputs)
+                             and file_stats(outputs) == prev.get('outputs'))
+                    if fresh:
+                        output_fps[name] = prev['output']
+                        status[name] = 'skipped'
+                        print(f'[pipeline] {name}: unchanged, skipped')
+                        continue
+                    print(f'[pipeline] {name}: running')
+                    running[pool.submit(self._execute, stage, input_fp)] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    input_fp, output_fp = fut.result()
+                    output_fps[name] = output_fp
+                    status[name] = 'ran'
+                    state[name] = {'input': input_fp, 'output': output_fp, 'finished': time.time(),
+                                   'outputs': file_stats(self.stages[name].output_paths())}
+                    self._save_state(state)
+        return status
+
+    def _closure(self, targets):
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.stages:
+                raise ValueError('Unknown stage: ' + name)
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.stages[name].deps)
+        return needed
+
+
+def review_stages(scrape=False, database_url=None, fmt='csv', workers=1, batch_size=None,
+                  cache_path=None, keywords='per-bank', eda=True):
+    """The review pipeline: the same steps as running the scripts by hand, in one process."""
+    from scripts import add_vader_sentiment, preprocess_reviews, sentiment_thematic
+    from src.catalog import CATALOG_PATH, RawCatalog
+    from src.sentiment_cache import DEFAULT_CACHE_PATH
+
+    cache_path = DEFAULT_CACHE_PATH if cache_path is None else cache_path or None
+    catalog = RawCatalog.load(CATALOG_PATH) or RawCatalog()
+
+    def raw_files():
+        # unchanged raw files keep their catalogued hash instead of being re-read
+        files = sorted(Path('.').glob(RAW_GLOB))
+        if catalog.refresh(files):
+            catalog.save(CATALOG_PATH)
+        return files
+
+    def raw_fingerprint(path):
+        return catalog.entry(path).sha256
+
+    def processed_outputs(csv_path):
+        paths = [csv_path] if fmt in ('csv', 'both') else []
+        if fmt in ('parquet', 'both'):
+            paths.append(parquet_path(csv_path) / META_FILE)
+        return lambda: paths
+
+    def load_clean():
+        # the sentiment stage rewrites the same dataset with its columns added
+        return load_processed(CLEAN_PATH).drop(columns=['vader', 'sentiment_label'], errors='ignore')
+
+    def run_scrape(inputs):
+        from scripts import scrape_reviews
+
+        state = scrape_reviews.load_state()
+        for bank_key, app_id in scrape_reviews.APPS.items():
+            scrape_reviews.scrape_app(bank_key, app_id, Path('data/raw'), state, incremental=True)
+            scrape_reviews.save_state(state)
+
+    def run_preprocess(inputs):
+        files = raw_files()
+        if not files:
+            raise RuntimeError('No raw CSV files found in data/raw/. Run the scraper first.')
+        df = preprocess_reviews.preprocess_files(files).reset_index(drop=True)
+        # a missing review is stringified to 'nan' and read back as NaN by the next script; do the same
+        # here so in-memory and on-disk runs produce identical downstream output
+        df['review'] = df['review'].mask(df['review'] == 'nan')
+        save_processed(df, CLEAN_PATH, fmt)
+        return df
+
+    def run_sentiment(inputs):
+        df = add_vader_sentiment.add_vader(inputs['preprocess'].copy(), workers, batch_size, cache_path)
+        save_processed(df, CLEAN_PATH, fmt)
+        return df
+
+    def run_thematic(inputs):
+        # reuse the sentiment stage's scores instead of scoring a second time
+        df = inputs['sentiment'].copy()
+        df['sentiment_score'] = df['vader']
+        theme_maps = sentiment_thematic.build_theme_maps(df, keywords, workers=workers)
+        out = sentiment_thematic.thematic_rows(df, theme_maps, workers)
+        save_processed(out, THEMATIC_PATH, fmt)
+        return out
+
+    def run_eda(inputs):
+        import matplotlib
+
+        # figures are rendered off the main thread
+        matplotlib.use('Agg')
+        from scripts import save_eda_outputs
+
+        save_eda_outputs.render_eda(inputs['sentiment'][save_eda_outputs.EDA_COLUMNS], EDA_DIR, workers=workers)
+
+    def run_db_load(inputs):
+        from scripts.db_init_sqlalchemy import metadata
+        from scripts.insert_reviews_to_postgres import bank_mapping, ensure_review_keys, prepare_rows, upsert_rows
+        from src.db import get_engine
+
+        df = inputs['thematic']
+        engine = get_engine(database_url)
+        metadata.create_all(engine)
+        ensure_review_keys(engine)
+        rows = prepare_rows(df, bank_mapping(engine, df['bank'].dropna().unique().tolist()))
+        changed = upsert_rows(engine, rows)
+        print(f'[pipeline] db_load: upserted {len(rows)} rows ({changed} new or changed)')
+
+    stages = []
+    if scrape:
+        stages.append(Stage('scrape', run_scrape, always=True))
+    stages += [
+        # preprocess owns no output: sentiment overwrites the cleaned dataset in place
+        Stage('preprocess', run_preprocess, deps=['scrape'] if scrape else [], files=raw_files,
+              fingerprint=raw_fingerprint, params={'format': fmt}, load=load_clean),
+        Stage('sentiment', run_sentiment, deps=['preprocess'], params={'model': 'vader', 'format': fmt},
+              outputs=processed_outputs(CLEAN_PATH), load=lambda: load_processed(CLEAN_PATH)),
+        Stage('thematic', run_thematic, deps=['sentiment'],
+              params={'keywords': keywords, 'format': fmt, 'theme_keywords': sentiment_thematic.THEME_KEYWORDS},
+              outputs=processed_outputs(THEMATIC_PATH), load=lambda: load_processed(THEMATIC_PATH)),
+    ]
+    if eda:
+        stages.append(Stage('eda', run_eda, deps=['sentiment'], outputs=[EDA_DIR / 'ratings_distribution.png']))
+    if database_url:
+        # the URL is part of the fingerprint, so pointing at another database reloads
+        stages.append(Stage('db_load', run_db_load, deps=['thematic'], params={'database_url': database_url}))
+    return stages
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m src.pipeline')
+    ap.add_argument('--scrape', action='store_true', help='scrape new reviews first (needs network access)')
+    ap.add_argument('--database-url', default=os.environ.get('DATABASE_URL'),
+                    help='load the thematic output into this database (default: $DATABASE_URL; omitted when unset)')
+    ap.add_argument('--no-eda', action='store_true', help='skip the EDA figures')
+    ap.add_argument('--format', default='csv', choices=FORMATS, help='storage format for processed datasets')
+    ap.add_argument('--workers', type=int, default=1, help='processes for VADER scoring')
+    ap.add_argument('--batch-size', type=int, default=None)
+    ap.add_argument('--no-cache', action='store_true', help='do not use the sentiment cache')
+    ap.add_argument('--keywords', default='per-bank', choices=['per-bank', 'shared', 'hashed'])
+    ap.add_argument('--state', default=str(DEFAULT_STATE_PATH), help='stage fingerprint file')
+    ap.add_argument('--max-parallel', type=int, default=2, help='stages allowed to run at the same time')
+    ap.add_argument('--force', nargs='*', default=None, help='stages to rerun even if unchanged (no names: all)')
+    ap.add_argument('--only', nargs='+', default=None, help='run only these stages and their dependencies')
+    add_arguments(ap)
+    args = ap.parse_args(argv)
+    configure_from_args(args)
+
+    stages = review_stages(scrape=args.scrape, database_url=args.database_url, fmt=args.format,
+                           workers=args.workers, batch_size=args.batch_size,
+                           cache_path=False if args.no_cache else None, keywords=args.keywords,
+                           eda=not args.no_eda)
+    pipeline = Pipeline(stages, state_path=args.state, max_parallel=args.max_parallel)
+    force = pipeline.order if args.force == [] else (args.force or [])
+    status = pipeline.run(targets=args.only, force=force)
+    print('[pipeline] summary:', ', '.join(f'{k}={v}' for k, v in status.items()))
+    return status
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Daily per-bank rollups of the `reviews` table.
+
+Two tables (defined in ``scripts/db_init_sqlalchemy.py`` and ``sql/schema.sql``)
+hold one row per ``(day, bank_id)`` and per ``(day, bank_id, theme_id)``:
+
+- ``daily_bank_stats``: review count, rating histogram (``rating_1`` ..
+  ``rating_5``), sentiment counts (``sentiment_pos/neu/neg``) and the number of
+  reviews with any sentiment label.
+- ``daily_theme_stats``: reviews per theme.
+
+``day`` is NULL for reviews without a date. The loader keeps the rollups current:
+it records the (bank, date) of every review it inserts or changes, before and
+after the change, in the temporary ``rollup_touched`` table and ``refresh_touched``
+then recomputes only those days. ``refresh`` rebuilds everything (or every day
+from a given date on); ``scripts/refresh_rollups.py`` runs it from the command line.
+
+All writers take a raw DBAPI cursor so they run inside the loader's transaction.
+"""
+from datetime import date
+
+from sqlalchemy import text
+
+
+BANK_TABLE = 'daily_bank_stats'
+THEME_TABLE = 'daily_theme_stats'
+TOUCHED_TABLE = 'rollup_touched'
+KEYS_TABLE = 'rollup_keys'
+# stands in for the NULL day of undated reviews when matching keys
+NO_DAY = '0001-01-01'
+RATINGS = (1, 2, 3, 4, 5)
+SENTIMENTS = ('pos', 'neu', 'neg')
+BANK_COLUMNS = (
+    ['day', 'bank_id', 'review_count']
+    + [f'rating_{r}' for r in RATINGS]
+    + [f'sentiment_{s}' for s in SENTIMENTS]
+    + ['sentiment_labeled']
+)
+
+
+def day_sql(dialect, col='review_date'):
+    """SQL for the calendar day of timestamp column `col`."""
+    if dialect == 'postgresql':
+        return f'CAST({col} AS DATE)'
+    # SQLite stores dates as ISO text ('2024-05-01' or '2024-05-01 10:00:00')
+    return f'substr({col}, 1, 10)'
+
+
+def _day_key(dialect, col='review_date'):
+    """`day_sql` with NULL mapped to a sentinel, so (day, bank) keys can be matched with `=`."""
+    sentinel = f"DATE '{NO_DAY}'" if dialect == 'postgresql' else f"'{NO_DAY}'"
+    return f'COALESCE({day_sql(dialect, col)}, {sentinel})'
+
+
+def _bank_select(dialect, where='true'):
+    day = day_sql(dialect, 'r.review_date')
+    counts = (
+        [f'SUM(CASE WHEN r.rating = {r} THEN 1 ELSE 0 END)' for r in RATINGS]
+        + [f"SUM(CASE WHEN r.sentiment_label = '{s}' THEN 1 ELSE 0 END)" for s in SENTIMENTS]
+        + ['COUNT(r.sentiment_label)']
+    )
+    return (
+        f'INSERT INTO {BANK_TABLE} ({", ".join(BANK_COLUMNS)}) '
+        f'SELECT {day}, r.bank_id, COUNT(*), {", ".join(counts)} '
+        f'FROM reviews r WHERE {where} GROUP BY {day}, r.bank_id'
+    )
+
+
+def _theme_select(dialect, where='true'):
+    day = day_sql(dialect, 'r.review_date')
+    return (
+        f'INSERT INTO {THEME_TABLE} (day, bank_id, theme_id, review_count) '
+        f'SELECT {day}, r.bank_id, rt.theme_id, COUNT(*) '
+        'FROM review_themes rt JOIN reviews r ON r.review_id = rt.review_id '
+        f'WHERE {where} GROUP BY {day}, r.bank_id, rt.theme_id'
+    )
+
+
+def begin_touched(cur):
+    """(Re)create the empty temporary table of (bank_id, review_date) pairs to refresh."""
+    cur.execute(f'DROP TABLE IF EXISTS {TOUCHED_TABLE}')
+    cur.execute(f'CREATE TEMPORARY TABLE {TOUCHED_TABLE} AS SELECT bank_id, review_date FROM reviews WHERE 1 = 0')
+
+
+def touch_staged(cur, staging, changed):
+    """Record the old and new (bank, date) of every staged review matching SQL condition `changed`.
+
+    `staging` has the `reviews` columns; in `changed`, `s` is the staged row and `r`
+    the stored one (NULL when the review is new).
+    """
+    join = f'{staging} s LEFT JOIN reviews r ON r.source = s.source AND r.review_key = s.review_key'
+    cur.execute(f'INSERT INTO {TOUCHED_TABLE} SELECT s.bank_id, s.review_date FROM {join} WHERE {changed}')
+    cur.execute(
+        f'INSERT INTO {TOUCHED_TABLE} SELECT r.bank_id, r.review_date FROM {join} '
+        f'WHERE r.review_id IS NOT NULL AND ({changed})'
+    )
+
+
+def refresh_touched(cur, dialect, themes=True):
+    """Recompute the rollup rows of every (day, bank) recorded in `rollup_touched`, then drop it."""
+    cur.execute(f'DROP TABLE IF EXISTS {KEYS_TABLE}')
+    cur.execute(
+        f'CREATE TEMPORARY TABLE {KEYS_TABLE} AS '
+        f'SELECT DISTINCT bank_id, {_day_key(dialect)} AS day FROM {TOUCHED_TABLE}'
+    )
+    cur.execute(f'CREATE INDEX idx_{KEYS_TABLE} ON {KEYS_TABLE} (bank_id, day)')
+    in_keys = (
+        f'EXISTS (SELECT 1 FROM {KEYS_TABLE} k WHERE k.bank_id = r.bank_id '
+        f'AND k.day = {_day_key(dialect, "r.review_date")})'
+    )
+    tables = [(BANK_TABLE, _bank_select(dialect, in_keys))]
+    if themes:
+        tables.append((THEME_TABLE, _theme_select(dialect, in_keys)))
+    for table, insert in tables:
+        cur.execute(
+            f'DELETE FROM {table} WHERE EXISTS (SELECT 1 FROM {KEYS_TABLE} k '
+            f"WHERE k.bank_id = {table}.bank_id AND k.day = COALESCE({table}.day, '{NO_DAY}'))"
+        )
+        cur.execute(insert)
+    cur.execute(f'DROP TABLE {KEYS_TABLE}')
+    cur.execute(f'DROP TABLE {TOUCHED_TABLE}')
+
+
+def refresh(cur, dialect, since=None, themes=True, undated=False):
+    """Rebuild the rollups from `reviews`: all of them, or every day from `since` (a date) on.
+
+    With `since`, the undated (NULL day) rows are only rebuilt when `undated` is set.
+    """
+    tables = [(BANK_TABLE, _bank_select)]
+    if themes:
+        tables.append((THEME_TABLE, _theme_select))
+    if since is None:
+        for table, select in tables:
+            cur.execute(f'DELETE FROM {table}')
+            cur.execute(select(dialect))
+        return
+    # validated here because the literal is inlined (DBAPI paramstyles differ)
+    since = date.fromisoformat(str(since)).isoformat()
+    day_null = ' OR day IS NULL' if undated else ''
+    date_null = ' OR r.review_date IS NULL' if undated else ''
+    for table, select in tables:
+        cur.execute(f"DELETE FROM {table} WHERE day >= '{since}'{day_null}")
+        cur.execute(select(dialect, f"{day_sql(dialect, 'r.review_date')} >= '{since}'{date_null}"))
+
+
+def bank_totals(conn):
+    """Per-bank totals over all days: rows of (bank_name, reviews, rating_1..5, pos, neu, neg, labeled)."""
+    sums = ', '.join(f'SUM(d.{c}) AS {c}' for c in BANK_COLUMNS[2:])
+    return conn.execute(text(
+        f'SELECT b.bank_name, {sums} FROM {BANK_TABLE} d JOIN banks b ON b.bank_id = d.bank_id '
+        'GROUP BY b.bank_name ORDER BY review_count DESC, b.bank_name'
+    )).fetchall()
+
+
+def theme_totals(conn):
+    """Per-bank theme counts over all days: rows of (bank_name, theme_name, reviews), largest first per bank."""
+    return conn.execute(text(
+        f'SELECT b.bank_name, t.theme_name, SUM(d.review_count) AS cnt FROM {THEME_TABLE} d '
+        'JOIN themes t ON t.theme_id = d.theme_id JOIN banks b ON b.bank_id = d.bank_id '
+        'GROUP BY b.bank_name, t.theme_name ORDER BY b.bank_name, cnt DESC, t.theme_name'
+    )).fetchall()
@@ -0,0 +1,100 @@
+"""Full-text index over ``reviews.review_text``.
+
+- SQLite: an external-content FTS5 table ``reviews_fts`` (porter stemming) kept
+  in sync with ``reviews`` by insert/update/delete triggers.
+- PostgreSQL: a stored generated ``review_tsv`` tsvector column (English
+  configuration) with a GIN index; PostgreSQL keeps it current on every write.
+
+``create_index(conn)`` is idempotent: it runs on table creation from
+``scripts/db_init_sqlalchemy.py`` and again from its ``main`` to upgrade
+existing databases (back-filling the FTS5 table once). The same DDL is in
+``sql/schema.sql``. Queries go through ``src.db.search_reviews``.
+"""
+import re
+
+from sqlalchemy import text
+
+
+FTS_TABLE = 'reviews_fts'
+TSV_COLUMN = 'review_tsv'
+TS_CONFIG = 'english'
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "review_text, content='reviews', content_rowid='review_id', tokenize='porter unicode61')",
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON reviews BEGIN '
+    f'INSERT INTO {FTS_TABLE} (rowid, review_text) VALUES (new.review_id, new.review_text); END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON reviews BEGIN '
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, review_text) VALUES ('delete', old.review_id, old.review_text); END",
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF review_text ON reviews BEGIN '
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, review_text) VALUES ('delete', old.review_id, old.review_text); "
+    f'INSERT INTO {FTS_TABLE} (rowid, review_text) VALUES (new.review_id, new.review_text); END',
+]
+
+POSTGRES_DDL = [
+    f'ALTER TABLE reviews ADD COLUMN IF NOT EXISTS {TSV_COLUMN} tsvector '
+    f"GENERATED ALWAYS AS (to_tsvector('{TS_CONFIG}', coalesce(review_text, ''))) STORED",
+    f'CREATE INDEX IF NOT EXISTS idx_reviews_{TSV_COLUMN} ON reviews USING GIN ({TSV_COLUMN})',
+]
+
+_TOKEN = re.compile(r'-?"[^"]*"|\S+')
+
+
+def has_index(conn):
+    if conn.dialect.name == 'sqlite':
+        sql = f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{FTS_TABLE}'"
+    else:
+        sql = (f"SELECT 1 FROM information_schema.columns WHERE table_name = 'reviews' "
+               f"AND column_name = '{TSV_COLUMN}'")
+    return conn.execute(text(sql)).first() is not None
+
+
+def create_index(conn):
+    """Create the full-text index for `conn`'s dialect if missing; returns True when it was created."""
+    created = not has_index(conn)
+    if conn.dialect.name == 'sqlite':
+        for ddl in SQLITE_DDL:
+            conn.execute(text(ddl))
+        if created:
+            # index the rows that predate the triggers
+            conn.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"))
+    else:
+        for ddl in POSTGRES_DDL:
+            conn.execute(text(ddl))
+    return created
+
+
+def _quote(term):
+    return '"' + term.strip('"').replace('"', '""') + '"'
+
+
+def fts5_query(query):
+    """Translate a web-search style query into FTS5 syntax.
+
+    Words and "quoted phrases" are ANDed, ``or`` between terms means OR and a
+    leading ``-`` excludes a term, like PostgreSQL's ``websearch_to_tsquery``.
+    Every term is quoted, so punctuation never reaches the FTS5 parser.
+    """
+    include, exclude = [], []
+    pending_or = False
+    for token in _TOKEN.findall(query):
+        if token.lower() == 'or' and include:
+            pending_or = True
+            continue
+        if token.startswith('-') and len(token) > 1:
+            exclude.append(_quote(token[1:]))
+            continue
+        term = _quote(token)
+        if term == '""':
+            continue
+        if pending_or:
+            include[-1] = f'{include[-1]} OR {term}'
+            pending_or = False
+        else:
+            include.append(term)
+    if not include:
+        return None
+    expr = ' AND '.join(f'({t})' if ' OR ' in t else t for t in include)
+    for term in exclude:
+        expr = f'({expr}) NOT {term}'
+    return expr
@@ -0,0 +1,131 @@
+"""Batched sentiment scoring engines.
+
+Each engine exposes ``score(texts) -> (scores, labels)`` where both results are
+plain lists aligned with the input order. Engines are looked up by name via
+``get_engine`` so the scripts can switch models with a CLI flag.
+
+- ``vader``: VADER compound score, fanned out over a process pool in chunks.
+- ``distilbert``: SST-2 DistilBERT, run on padded batches of tokenized inputs.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+
+DEFAULT_BATCH_SIZE = 1000
+DISTILBERT_MODEL = 'distilbert-base-uncased-finetuned-sst-2-english'
+
+_ANALYZER = None
+
+
+def label_from_compound(score):
+    """Map a VADER compound score to 'pos' / 'neu' / 'neg'."""
+    if score >= 0.05:
+        return 'pos'
+    if score <= -0.05:
+        return 'neg'
+    return 'neu'
+
+
+def chunked(seq, size):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _vader_analyzer():
+    # one analyzer per process; building it loads the lexicon from disk
+    global _ANALYZER
+    if _ANALYZER is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        _ANALYZER = SentimentIntensityAnalyzer()
+    return _ANALYZER
+
+
+def _vader_chunk(texts):
+    analyzer = _vader_analyzer()
+    return [analyzer.polarity_scores(t)['compound'] for t in texts]
+
+
+class VaderEngine:
+    name = 'vader'
+
+    def __init__(self, workers=1, batch_size=DEFAULT_BATCH_SIZE):
+        self.workers = max(1, int(workers or 1))
+        self.batch_size = max(1, int(batch_size or DEFAULT_BATCH_SIZE))
+
+    @property
+    def version(self):
+        try:
+            from importlib.metadata import version
+            return version('vaderSentiment')
+        except Exception:
+            return 'unknown'
+
+    def score(self, texts):
+        texts = [str(t) for t in texts]
+        if self.workers == 1 or len(texts) <= self.batch_size:
+            scores = _vader_chunk(texts)
+        else:
+            scores = []
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                # Executor.map yields results in submission order
+                for part in pool.map(_vader_chunk, chunked(texts, self.batch_size)):
+                    scores.extend(part)
+        return scores, [label_from_compound(s) for s in scores]
+
+
+class DistilBertEngine:
+    name = 'distilbert'
+
+    def __init__(self, workers=1, batch_size=32, model_name=DISTILBERT_MODEL, max_chars=512):
+        self.batch_size = max(1, int(batch_size or 32))
+        self.model_name = model_name
+        self.version = model_name
+        self.max_chars = max_chars
+        try:
+            import torch
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        except Exception as e:
+            raise RuntimeError('transformers not available: ' + str(e))
+        if workers and int(workers) > 1:
+            torch.set_num_threads(int(workers))
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model.eval()
+
+    def score(self, texts):
+        texts = [str(t)[:self.max_chars] for t in texts]
+        scores = [0.0] * len(texts)
+        labels = [None] * len(texts)
+        # group texts of similar length so each padded batch wastes little compute
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        id2label = self.model.config.id2label
+        for idx in chunked(order, self.batch_size):
+            enc = self.tokenizer(
+                [texts[i] for i in idx],
+                padding=True,
+                truncation=True,
+                max_length=512,
+                return_tensors='pt',
+            )
+            with self._torch.no_grad():
+                probs = self._torch.softmax(self.model(**enc).logits, dim=-1)
+            top_p, top_i = probs.max(dim=-1)
+            for i, p, k in zip(idx, top_p.tolist(), top_i.tolist()):
+                lbl = 'pos' if id2label[k].upper().startswith('POS') else 'neg'
+                labels[i] = lbl
+                scores[i] = p if lbl == 'pos' else -p
+        return scores, labels
+
+
+ENGINES = {
+    VaderEngine.name: VaderEngine,
+    DistilBertEngine.name: DistilBertEngine,
+}
+
+
+def get_engine(name, **kwargs):
+    try:
+        cls = ENGINES[name]
+    except KeyError:
+        raise ValueError('Unknown model: ' + name)
+    return cls(**kwargs)
@@ -0,0 +1,150 @@
+"""Persistent, content-addressed cache of sentiment scores.
+
+Scores are stored in a small SQLite file keyed by ``sha256(model, version, text)``
+so a review is only scored once per model version, no matter how many times the
+pipeline runs. Entries carry a last-used timestamp; once the cache grows past
+``max_entries`` the least recently used rows are evicted.
+
+Usage:
+    cache = SentimentCache('data/cache/sentiment.sqlite')
+    scores, labels = score_with_cache(engine, texts, cache)
+    print(cache.stats())
+"""
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+
+DEFAULT_CACHE_PATH = Path('data/cache/sentiment.sqlite')
+DEFAULT_MAX_ENTRIES = 5_000_000
+
+# stay well below SQLite's bound-parameter limit
+_LOOKUP_CHUNK = 500
+
+
+def cache_key(text, model, version):
+    h = hashlib.sha256()
+    for part in (model, version, text):
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class SentimentCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if str(path) != ':memory:':
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS sentiment ('
+            ' key TEXT PRIMARY KEY,'
+            ' score REAL NOT NULL,'
+            ' label TEXT NOT NULL,'
+            ' last_used REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_sentiment_last_used ON sentiment(last_used)')
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM sentiment').fetchone()[0]
+
+    def get_many(self, keys):
+        """Return ``{key: (score, label)}`` for the keys present in the cache."""
+        found = {}
+        keys = list(keys)
+        now = time.time()
+        for i in range(0, len(keys), _LOOKUP_CHUNK):
+            part = keys[i:i + _LOOKUP_CHUNK]
+            marks = ','.join('?' * len(part))
+            rows = self.conn.execute(
+                f'SELECT key, score, label FROM sentiment WHERE key IN ({marks})', part
+            ).fetchall()
+            for k, score, label in rows:
+                found[k] = (score, label)
+            if rows:
+                self.conn.executemany(
+                    'UPDATE sentiment SET last_used = ? WHERE key = ?', [(now, r[0]) for r in rows]
+                )
+        self.conn.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store ``{key: (score, label)}`` and evict LRU rows beyond ``max_entries``."""
+        now = time.time()
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO sentiment (key, score, label, last_used) VALUES (?, ?, ?, ?)',
+            [(k, float(score), label, now) for k, (score, label) in items.items()],
+        )
+        self.conn.commit()
+        self.evict()
+
+    def evict(self):
+        if not self.max_entries:
+            return 0
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return 0
+        self.conn.execute(
+            'DELETE FROM sentiment WHERE key IN '
+            '(SELECT key FROM sentiment ORDER BY last_used LIMIT ?)',
+            (excess,),
+        )
+        self.conn.commit()
+        self.evictions += excess
+        return excess
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self),
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+def score_with_cache(engine, texts, cache=None):
+    """Score ``texts`` with ``engine``, consulting ``cache`` first.
+
+    Only texts missing from the cache are sent to the engine; repeated texts
+    within one call are scored once. Results are aligned with ``texts``.
+    """
+    texts = [str(t) for t in texts]
+    if cache is None:
+        return engine.score(texts)
+
+    version = engine.version
+    keys = [cache_key(t, engine.name, version) for t in texts]
+    known = cache.get_many(set(keys))
+
+    todo = {}
+    for k, t in zip(keys, texts):
+        if k not in known and k not in todo:
+            todo[k] = t
+    if todo:
+        scores, labels = engine.score(list(todo.values()))
+        fresh = dict(zip(todo.keys(), zip(scores, labels)))
+        cache.put_many(fresh)
+        known.update(fresh)
+
+    return [known[k][0] for k in keys], [known[k][1] for k in keys]
@@ -0,0 +1,210 @@
+"""Columnar storage for the processed review datasets.
+
+Each processed CSV (e.g. ``data/processed/reviews_clean.csv``) can also be
+written as a hive-partitioned Parquet directory next to it::
+
+    data/processed/reviews_clean.parquet/bank=CBE/month=2024-05/part-0-0.parquet
+
+Partitioning is by ``bank`` and, when the dataset has a ``date`` column, by
+``month`` (``YYYY-MM``). ``load_processed`` reads whichever copy is newer and
+supports column projection and ``pyarrow``-style filters, e.g.::
+
+    load_processed('data/processed/reviews_clean.csv',
+                   columns=['bank', 'rating', 'sentiment_label'],
+                   filters=[('bank', '=', 'CBE'), ('month', '>=', '2024-01')])
+
+On Parquet the filters prune partitions and row groups; on CSV they are
+applied after reading. ``pyarrow`` is only imported when Parquet is used.
+"""
+import base64
+import json
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+
+FORMATS = ('csv', 'parquet', 'both')
+MONTH_COL = 'month'
+ROW_COL = '__row'
+UNKNOWN_MONTH = 'unknown'
+META_FILE = '_columns.json'
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except Exception as e:
+        raise RuntimeError('pyarrow not available: ' + str(e))
+    return pa, ds, pq
+
+
+def parquet_path(csv_path):
+    return Path(csv_path).with_suffix('.parquet')
+
+
+def partition_columns(columns, date_col='date'):
+    parts = ['bank'] if 'bank' in columns else []
+    if date_col in columns:
+        parts.append(MONTH_COL)
+    return parts
+
+
+def month_of(dates):
+    month = dates.astype('string').str.slice(0, 7)
+    valid = month.str.fullmatch(r'\d{4}-\d{2}').fillna(False).astype(bool)
+    return month.where(valid, UNKNOWN_MONTH).astype(object)
+
+
+def _partitioning(parts):
+    pa, ds, _ = _pyarrow()
+    return ds.partitioning(pa.schema([(p, pa.string()) for p in parts]), flavor='hive')
+
+
+def _encode_schema(schema):
+    return base64.b64encode(schema.serialize().to_pybytes()).decode('ascii')
+
+
+def _decode_schema(text):
+    pa, _, _ = _pyarrow()
+    return pa.ipc.read_schema(pa.py_buffer(base64.b64decode(text)))
+
+
+def write_parquet(df, path, append=False, part=0, row_offset=0, date_col='date'):
+    """Write `df` as a partitioned Parquet dataset at `path`.
+
+    With `append=True` new files are added next to the existing ones (used by
+    streaming writers); `part` keeps file names unique and `row_offset` keeps
+    the original row order recoverable. Appended chunks are cast to the schema
+    of the first write, whose all-null columns are stored as strings, so a
+    chunk without dates cannot pin `date` to the null type.
+    """
+    pa, ds, _ = _pyarrow()
+    path = Path(path)
+    if not append and path.exists():
+        shutil.rmtree(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    parts = partition_columns(df.columns, date_col)
+    out = df.copy()
+    if MONTH_COL in parts:
+        out[MONTH_COL] = month_of(out[date_col])
+    if 'bank' in parts:
+        out['bank'] = out['bank'].astype('string').astype(object)
+    out[ROW_COL] = range(row_offset, row_offset + len(out))
+
+    meta = path / META_FILE
+    if append and meta.exists():
+        schema = json.loads(meta.read_text(encoding='utf-8')).get('schema')
+    else:
+        schema = None
+    if schema is not None:
+        table = pa.Table.from_pandas(out, schema=_decode_schema(schema), preserve_index=False)
+    else:
+        table = pa.Table.from_pandas(out, preserve_index=False)
+        table = table.cast(pa.schema([
+            f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in table.schema
+        ], metadata=table.schema.metadata))
+    ds.write_dataset(
+        table,
+        path,
+        format='parquet',
+        partitioning=_partitioning(parts),
+        basename_template=f'part-{part}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    if not append or not meta.exists():
+        meta.write_text(json.dumps({'columns': list(df.columns), 'partitions': parts,
+                                    'schema': _encode_schema(table.schema)}), encoding='utf-8')
+    else:
+        meta.touch()
+    return path
+
+
+def read_parquet(path, columns=None, filters=None):
+    _, _, pq = _pyarrow()
+    path = Path(path)
+    meta = json.loads((path / META_FILE).read_text(encoding='utf-8'))
+    known = list(meta['columns']) + [MONTH_COL]
+    # like the CSV path, unknown columns are skipped rather than raising
+    wanted = [c for c in columns if c in known] if columns is not None else list(meta['columns'])
+    read_cols = list(dict.fromkeys(wanted + [ROW_COL]))
+    table = pq.read_table(path, columns=read_cols, filters=filters, partitioning=_partitioning(meta['partitions']))
+    df = table.to_pandas()
+    for c in meta['partitions']:
+        # partition keys come back as categoricals; restore plain strings
+        if c in df.columns and isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype(df[c].cat.categories.dtype)
+    df = df.sort_values(ROW_COL, kind='stable').reset_index(drop=True)
+    return df[[c for c in wanted if c in df.columns]]
+
+
+_OPS = {
+    '=': lambda s, v: s == v,
+    '==': lambda s, v: s == v,
+    '!=': lambda s, v: s != v,
+    '<': lambda s, v: s < v,
+    '<=': lambda s, v: s <= v,
+    '>': lambda s, v: s > v,
+    '>=': lambda s, v: s >= v,
+    'in': lambda s, v: s.isin(list(v)),
+    'not in': lambda s, v: ~s.isin(list(v)),
+}
+
+
+def apply_filters(df, filters, date_col='date'):
+    """Apply a conjunction of (column, op, value) filters to an in-memory frame."""
+    if not filters:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for col, op, val in filters:
+        series = month_of(df[date_col]) if col == MONTH_COL and col not in df.columns else df[col]
+        mask &= _OPS[op](series, val).fillna(False).astype(bool)
+    return df[mask].reset_index(drop=True)
+
+
+def _prefer_parquet(csv_path):
+    pq_dir = parquet_path(csv_path)
+    meta = pq_dir / META_FILE
+    if not meta.exists():
+        return False
+    return not csv_path.exists() or meta.stat().st_mtime >= csv_path.stat().st_mtime
+
+
+def processed_exists(csv_path):
+    csv_path = Path(csv_path)
+    return csv_path.exists() or (parquet_path(csv_path) / META_FILE).exists()
+
+
+def load_processed(csv_path, columns=None, filters=None, date_col='date'):
+    """Load a processed dataset from the newer of its Parquet and CSV copies."""
+    csv_path = Path(csv_path)
+    if _prefer_parquet(csv_path):
+        return read_parquet(parquet_path(csv_path), columns=columns, filters=filters)
+    if not csv_path.exists():
+        raise FileNotFoundError(f'Processed dataset not found: {csv_path}')
+    needed = None
+    if columns is not None:
+        needed = set(columns) | {c for c, _, _ in (filters or [])}
+        if MONTH_COL in needed:
+            needed.add(date_col)
+    df = pd.read_csv(csv_path, usecols=(lambda c: c in needed) if needed is not None else None)
+    df = apply_filters(df, filters, date_col)
+    return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+
+def save_processed(df, csv_path, fmt='csv', date_col='date'):
+    """Write a processed dataset as CSV, partitioned Parquet, or both."""
+    if fmt not in FORMATS:
+        raise ValueError('Unknown format: ' + fmt)
+    csv_path = Path(csv_path)
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    written = []
+    if fmt in ('csv', 'both'):
+        df.to_csv(csv_path, index=False)
+        written.append(csv_path)
+    if fmt in ('parquet', 'both'):
+        written.append(write_parquet(df, parquet_path(csv_path), date_col=date_col))
+    return written
@@ -0,0 +1,76 @@
+"""Compiled multi-keyword theme matching.
+
+``ThemeMatcher`` compiles a ``{theme: [keywords]}`` map once into a single
+trie-shaped regular expression and assigns every theme in one pass over a
+text. The semantics are the same as the plain substring test
+
+    [theme for theme, kws in theme_map.items() if any(kw in text for kw in kws)]
+
+including overlapping keywords: at each position the regex reports the longest
+keyword starting there, and every keyword that is a prefix of it (and therefore
+also matches there) is credited through a precomputed prefix closure.
+"""
+import re
+
+
+def _trie_pattern(node):
+    alts = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not alts:
+        return ''
+    body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+    # '' marks the end of a keyword; greedy '?' still prefers the longer keyword
+    return '(?:' + body + ')?' if '' in node else body
+
+
+class ThemeMatcher:
+    def __init__(self, theme_map, lowercase=True):
+        self.lowercase = lowercase
+        self.themes = list(theme_map)
+        self._always = set()
+
+        trie = {}
+        owners = {}
+        for i, kws in enumerate(theme_map.values()):
+            for kw in kws:
+                kw = kw.lower() if lowercase else kw
+                if not kw:
+                    # an empty keyword is a substring of every text
+                    self._always.add(i)
+                    continue
+                node = trie
+                for ch in kw:
+                    node = node.setdefault(ch, {})
+                node[''] = {}
+                owners.setdefault(kw, set()).add(i)
+
+        # themes credited when keyword `kw` is the longest match at a position
+        self._closure = {}
+        for kw in owners:
+            credited = set()
+            node = trie
+            for j, ch in enumerate(kw, 1):
+                node = node[ch]
+                if '' in node:
+                    credited |= owners[kw[:j]]
+            self._closure[kw] = frozenset(credited)
+
+        self._regex = re.compile('(?=(' + _trie_pattern(trie) + '))') if trie else None
+
+    def match(self, text):
+        """Return the themes whose keywords occur in ``text``, in theme-map order."""
+        found = set(self._always)
+        if self._regex is not None and len(found) < len(self.themes):
+            text = text.lower() if self.lowercase else text
+            closure = self._closure
+            for m in self._regex.finditer(text):
+                kw = m.group(1)
+                if kw:
+                    found |= closure[kw]
+                    if len(found) == len(self.themes):
+                        break
+        return [self.themes[i] for i in sorted(found)]
+
+    def match_many(self, texts):
+        """Batch form of ``match`` over an iterable (e.g. a whole DataFrame column)."""
+        match = self.match
+        return [match(str(t)) for t in texts]
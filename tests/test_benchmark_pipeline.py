@@ -0,0 +1,41 @@
+import csv
+import json
+
+import pandas as pd
+
+from scripts.benchmark_pipeline import compare, generate_raw, parse_size, run_benchmark, synthetic_reviews
+from scripts.scrape_reviews import CSV_HEADER
+
+
+def test_parse_size():
+    assert [parse_size(s) for s in ('10k', '100K', '1m', '2500', '1_000')] == [10_000, 100_000, 1_000_000, 2500, 1000]
+
+
+def test_generator_is_deterministic_and_shaped_like_scraper_output(tmp_path):
+    assert list(synthetic_reviews(50, 'CBE', seed=1)) == list(synthetic_reviews(50, 'CBE', seed=1))
+    assert list(synthetic_reviews(50, 'CBE', seed=1)) != list(synthetic_reviews(50, 'BOA', seed=1))
+
+    paths = generate_raw(tmp_path, 1001, seed=3)
+    assert [p.name for p in paths] == ['raw_CBE.csv', 'raw_BOA.csv', 'raw_DASHEN.csv']
+    with paths[0].open(encoding='utf-8') as fh:
+        assert next(csv.reader(fh)) == CSV_HEADER
+    frames = [pd.read_csv(p) for p in paths]
+    assert sum(len(f) for f in frames) == 1001
+    assert frames[1]['bank'].eq('BOA').all()
+    # duplicates and both timestamp formats are there to exercise dedupe and date parsing
+    assert frames[0]['content'].duplicated().any()
+    assert frames[0]['at'].str.contains(r'\.', na=False).any()
+
+
+def test_run_benchmark_reports_each_stage(tmp_path, capsys):
+    report = run_benchmark([300], ['preprocess', 'themes', 'db_load'], workdir=tmp_path, seed=5)
+    stages = [r['stage'] for r in report['results']]
+    assert stages == ['preprocess', 'themes', 'db_load']
+    for r in report['results']:
+        assert r['size'] == 300 and r['rows'] > 0 and r['wall_s'] >= 0
+    assert report['results'][0]['rows'] == 300
+    json.dumps(report)
+
+    slower = {'commit': 'x', 'results': [dict(r, wall_s=r['wall_s'] * 2 + 1) for r in report['results']]}
+    compare(slower, report)
+    assert 'slower' in capsys.readouterr().out
@@ -0,0 +1,54 @@
+import os
+
+import pandas as pd
+
+from src.catalog import RawCatalog, scan_file
+
+
+def _write(path, rows, **extra):
+    pd.DataFrame({'content': [f'review {i}\nsecond line' for i in range(rows)],
+                  'at': [f'2024-05-{i % 28 + 1:02d}T10:00:00' for i in range(rows)], **extra}).to_csv(path, index=False)
+
+
+def test_scan_counts_rows_dates_and_banks(tmp_path):
+    f = tmp_path / 'raw_CBE.csv'
+    _write(f, 40)
+    e = scan_file(f)
+    assert (e.rows, e.first_date, e.last_date, e.banks) == (40, '2024-05-01', '2024-05-28', {'CBE': 40})
+    g = tmp_path / 'raw_mixed.csv'
+    _write(g, 3, bank=['BOA', 'Dashen', 'BOA'])
+    assert scan_file(g).banks == {'BOA': 2, 'Dashen': 1}
+
+
+def test_refresh_only_rescans_changed_files(tmp_path):
+    a, b = tmp_path / 'raw_A.csv', tmp_path / 'raw_B.csv'
+    _write(a, 5)
+    _write(b, 7)
+    catalog = RawCatalog()
+    assert catalog.refresh([a, b]) == [str(a), str(b)]
+    path = catalog.save(tmp_path / 'catalog.json')
+
+    catalog = RawCatalog.load(path)
+    os.utime(a, ns=(0, 0))  # touched, same content: re-hashed, not re-counted
+    assert catalog.refresh([a, b]) == []
+    assert catalog.files[str(a)].mtime_ns == 0
+    _write(b, 9)
+    assert catalog.refresh([a, b]) == [str(b)]
+    assert catalog.totals() == {'rows': 14, 'banks': {'A': 5, 'B': 9}, 'first_date': '2024-05-01',
+                                'last_date': '2024-05-09'}
+    assert catalog.refresh([a]) == [] and list(catalog.files) == [str(a)]
+
+
+def test_outputs_are_current_until_inputs_or_output_change(tmp_path):
+    a, out = tmp_path / 'raw_A.csv', tmp_path / 'out.csv'
+    _write(a, 5)
+    catalog = RawCatalog()
+    catalog.refresh([a])
+    digest = catalog.inputs_digest([a], {'format': 'csv'})
+    assert not catalog.output_current([out], digest)
+    out.write_text('x')
+    catalog.record_output([out], digest)
+    assert catalog.output_current([out], digest)
+    assert not catalog.output_current([out], catalog.inputs_digest([a], {'format': 'parquet'}))
+    out.write_text('changed')
+    assert not catalog.output_current([out], digest)
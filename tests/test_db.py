@@ -0,0 +1,116 @@
+import asyncio
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from scripts.db_init_sqlalchemy import metadata
+from scripts.insert_reviews_to_postgres import bank_mapping, prepare_rows, upsert_rows
+from src import db, search
+
+
+@pytest.fixture
+def url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'reviews.db'}"
+    engine = db.get_engine(url)
+    metadata.create_all(engine)
+    df = pd.DataFrame({
+        'review': [f'review {i}' for i in range(7)],
+        'bank': ['CBE', 'CBE', 'CBE', 'CBE', 'BOA', 'BOA', 'CBE'],
+        'rating': [5, 1, 2, 4, 1, 3, 2],
+        'date': ['2024-05-01', '2024-05-01', '2024-05-03', '2024-06-02', '2024-05-01', '2024-05-02', None],
+        'sentiment_label': ['pos', 'neg', 'neg', 'neu', 'neg', 'pos', 'neg'],
+        'identified_themes': ['UI', 'Reliability', 'Reliability;UI', 'Other', 'Access', 'UI', 'UI'],
+    })
+    upsert_rows(engine, prepare_rows(df, bank_mapping(engine, ['BOA', 'CBE'])))
+    yield url
+    db.dispose_engines()
+
+
+def test_engines_are_shared_and_pooled(url, monkeypatch):
+    assert db.get_engine(url) is db.get_engine(url)
+    assert db.get_engine(url, pool_size=2) is not db.get_engine(url)
+    monkeypatch.setenv('REVIEWS_DB_POOL_SIZE', '7')
+    opts = db.pool_options(url, max_overflow=0)
+    assert opts == {'pool_pre_ping': True, 'pool_size': 7, 'max_overflow': 0, 'pool_timeout': 30,
+                    'pool_recycle': 1800}
+    assert db.pool_options('sqlite://') == {'pool_pre_ping': True}
+    assert db.async_url('postgresql+psycopg://u@h/db').drivername == 'postgresql+asyncpg'
+    with pytest.raises(ValueError):
+        db.async_url('mysql://u@h/db')
+
+
+def test_reviews_by_bank_pages_through_the_date_range(url):
+    engine = db.get_engine(url)
+    pages = list(db.reviews_by_bank('CBE', start='2024-05-01', end=date(2024, 5, 3), engine=engine, page_size=2))
+    assert [len(p) for p in pages] == [2, 1]
+    reviews = [r for p in pages for r in p]
+    assert [r.review_text for r in reviews] == ['review 0', 'review 1', 'review 2']
+    assert reviews[0].review_date.date() == date(2024, 5, 1) and reviews[0].bank == 'CBE'
+    assert sum(len(p) for p in db.reviews_by_bank('CBE', engine=engine)) == 5
+
+
+def test_theme_counts_and_sentiment_trend_read_the_rollups(url):
+    engine = db.get_engine(url)
+    counts = db.theme_counts('CBE', end='2024-05-31', engine=engine)
+    assert counts == [db.ThemeCount('CBE', 'Reliability', 2), db.ThemeCount('CBE', 'UI', 2)]
+
+    trend = db.sentiment_trend('CBE', period='month', engine=engine)
+    assert [(p.period, p.reviews, p.pos, p.neg) for p in trend] == [('2024-05', 3, 1, 2), ('2024-06', 1, 0, 0)]
+    assert trend[0].net == pytest.approx(-1 / 3)
+    assert [p.period for p in db.sentiment_trend(start='2024-05-02', engine=engine)] == ['2024-05-02', '2024-05-03',
+                                                                                        '2024-06-02']
+    with pytest.raises(ValueError):
+        db.sentiment_trend(period='week', engine=engine)
+
+
+def test_async_queries_match_sync(url):
+    pytest.importorskip('aiosqlite')
+    pytest.importorskip('greenlet')
+    engine = db.get_engine(url)
+
+    async def run():
+        aengine = db.get_async_engine(url)
+        try:
+            pages = [p async for p in db.reviews_by_bank_async('CBE', '2024-05-01', '2024-05-31', engine=aengine,
+                                                                  page_size=2)]
+            themes = await db.theme_counts_async(engine=aengine)
+            trend = await db.sentiment_trend_async('BOA', engine=aengine)
+            hits = await db.search_reviews_async('review', rating=[1, 2], engine=aengine)
+        finally:
+            await db.dispose_async_engines()
+        return pages, themes, trend, hits
+
+    pages, themes, trend, hits = asyncio.run(run())
+    assert hits == db.search_reviews('review', rating=[1, 2], engine=engine) and len(hits) == 4
+    assert pages == list(db.reviews_by_bank('CBE', '2024-05-01', '2024-05-31', engine=engine, page_size=2))
+    assert themes == db.theme_counts(engine=engine)
+    assert trend == db.sentiment_trend('BOA', engine=engine)
+
+
+def test_search_reviews_ranks_filters_and_pages(url):
+    engine = db.get_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE reviews SET review_text = 'transfer failed, money transfer failed again' "
+                          "WHERE review_id = 2"))
+        conn.execute(text("UPDATE reviews SET review_text = 'the transfer failed once' WHERE review_id = 3"))
+        conn.execute(text("UPDATE reviews SET review_text = 'transfers are fast' WHERE review_id = 5"))
+        conn.execute(text('DELETE FROM reviews WHERE review_id = 1'))
+
+    hits = db.search_reviews('transfer', engine=engine)
+    assert hits[0].review_id == 2 and sorted(h.review_id for h in hits) == [2, 3, 5]
+    assert hits[0].rank > hits[1].rank >= hits[2].rank
+    assert {h.review_id: h.bank for h in hits} == {2: 'CBE', 3: 'CBE', 5: 'BOA'}
+    assert [h.review_id for h in db.search_reviews('"transfer failed" -again', engine=engine)] == [3]
+    assert sorted(h.review_id for h in db.search_reviews('fast or once', engine=engine)) == [3, 5]
+    assert [h.review_id for h in db.search_reviews('transfer', bank='CBE', rating=[1, 2], sentiment='neg',
+                                                   start='2024-05-01', end='2024-05-02', engine=engine)] == [2]
+    assert db.search_reviews('transfer', page=1, page_size=2, engine=engine) == hits[2:]
+    assert db.search_reviews('review -review', engine=engine) == []
+    assert db.search_reviews(' "" ', engine=engine) == []
+
+
+def test_fts5_query_quotes_every_term():
+    assert search.fts5_query("can't login or sign-in -otp") == '("can\'t" AND ("login" OR "sign-in")) NOT "otp"'
+    assert search.fts5_query('-only') is None
@@ -0,0 +1,31 @@
+import pytest
+
+from src.dedupe import BloomFilter, DigestSet, make_deduper
+
+
+@pytest.mark.parametrize('kind', ['exact', 'bloom'])
+def test_first_occurrence_across_batches(kind):
+    seen = make_deduper(kind)
+    assert seen.filter_new(['a', 'b', 'a']).tolist() == [True, True, False]
+    assert seen.filter_new(['b', 'c', 'c']).tolist() == [False, True, False]
+    assert len(seen) == 3
+
+
+def test_bloom_memory_is_fixed_by_capacity():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    before = bloom.nbytes
+    bloom.filter_new([f'review {i}' for i in range(5000)])
+    assert bloom.nbytes == before
+
+
+def test_bloom_false_positive_rate_is_close_to_target():
+    bloom = BloomFilter(capacity=20_000, error_rate=0.01)
+    bloom.filter_new([f'seen {i}' for i in range(20_000)])
+    fresh = bloom.filter_new([f'fresh {i}' for i in range(20_000)])
+    assert 1 - fresh.mean() < 0.02
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        make_deduper('fuzzy')
+    assert isinstance(make_deduper(), DigestSet)
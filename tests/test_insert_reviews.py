@@ -0,0 +1,117 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from scripts.db_init_sqlalchemy import metadata
+from scripts.insert_reviews_to_postgres import load_rows, prepare_rows, upsert_rows
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'reviews.db'}")
+    metadata.create_all(engine)
+    return engine
+
+
+def _frame():
+    return pd.DataFrame({
+        'review_text': ['good app', None, 'slow'],
+        'review': ['x', 'fallback', 'y'],
+        'bank': ['CBE', 'BOA', 'UNKNOWN'],
+        'rating': [5, None, 1],
+        'date': ['2024-05-01', None, '2024-05-03'],
+        'sentiment_label': ['pos', 'neu', 'neg'],
+        'vader': [0.4, 0.0, -0.3],
+    })
+
+
+def _count(engine):
+    with engine.connect() as conn:
+        return conn.execute(text('SELECT COUNT(*) FROM reviews')).scalar()
+
+
+def test_prepare_rows_is_vectorized_equivalent_of_row_loop():
+    rows = prepare_rows(_frame(), {'CBE': 1, 'BOA': 2})
+    assert rows.iloc[:, :8].values.tolist() == [
+        [1, 'good app', 5, '2024-05-01', 'pos', 0.4, 'google_play', None],
+        [2, 'fallback', None, None, 'neu', 0.0, 'google_play', None],
+    ]
+    assert rows['review_key'].str.startswith('h:').all()
+
+
+def test_sqlite_bulk_load(tmp_path):
+    engine = _engine(tmp_path)
+    rows = prepare_rows(_frame(), {'CBE': 1, 'BOA': 2})
+    assert load_rows(engine, rows) == 2
+    with engine.connect() as conn:
+        got = conn.execute(text('SELECT bank_id, review_text, rating FROM reviews ORDER BY review_id')).fetchall()
+    assert [tuple(r) for r in got] == [(1, 'good app', 5), (2, 'fallback', None)]
+    # the bulk-load pragmas do not outlive the load
+    with engine.connect() as conn:
+        assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'delete'
+        assert conn.execute(text('PRAGMA synchronous')).scalar() == 2
+
+
+@pytest.mark.parametrize('method', ['executemany', 'insert'])
+def test_append_skips_stored_keys(tmp_path, method):
+    engine = _engine(tmp_path)
+    df = _frame()
+    mapping = {'CBE': 1, 'BOA': 2}
+    assert load_rows(engine, prepare_rows(df.iloc[:1], mapping), method=method) == 1
+    df.loc[0, 'sentiment_label'] = 'neu'
+    assert load_rows(engine, prepare_rows(df, mapping), method=method) == 1
+    assert _count(engine) == 2
+    with engine.connect() as conn:
+        label = conn.execute(text("SELECT sentiment_label FROM reviews WHERE review_text = 'good app'")).scalar()
+    assert label == 'pos'
+
+
+def test_upsert_is_idempotent_and_only_touches_changes(tmp_path):
+    engine = _engine(tmp_path)
+    df = _frame()
+    mapping = {'CBE': 1, 'BOA': 2}
+    assert upsert_rows(engine, prepare_rows(df, mapping)) == 2
+    assert upsert_rows(engine, prepare_rows(df, mapping)) == 0
+    assert _count(engine) == 2
+
+    df.loc[0, 'sentiment_label'] = 'neu'
+    df.loc[1, 'review'] = 'new review'
+    assert upsert_rows(engine, prepare_rows(df, mapping)) == 2
+    assert _count(engine) == 3
+    with engine.connect() as conn:
+        label = conn.execute(text("SELECT sentiment_label FROM reviews WHERE review_text = 'good app'")).scalar()
+    assert label == 'neu'
+
+
+def _theme_counts(engine):
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            'SELECT rt.bank_id, t.theme_name, COUNT(*) FROM review_themes rt '
+            'JOIN themes t ON t.theme_id = rt.theme_id GROUP BY rt.bank_id, t.theme_name'
+        )).fetchall()
+    return {(b, t): c for b, t, c in rows}
+
+
+def test_upsert_normalizes_identified_themes(tmp_path):
+    engine = _engine(tmp_path)
+    df = _frame().assign(identified_themes=['Access;UI', '', 'UI'])
+    mapping = {'CBE': 1, 'BOA': 2}
+    upsert_rows(engine, prepare_rows(df, mapping))
+    assert _theme_counts(engine) == {(1, 'Access'): 1, (1, 'UI'): 1}
+
+    df.loc[0, 'identified_themes'] = 'UI'
+    df.loc[1, 'identified_themes'] = 'Support'
+    upsert_rows(engine, prepare_rows(df, mapping))
+    assert _theme_counts(engine) == {(1, 'UI'): 1, (2, 'Support'): 1}
+
+
+@pytest.mark.parametrize('method', ['executemany', 'insert'])
+def test_append_keeps_themes_of_stored_keys(tmp_path, method):
+    engine = _engine(tmp_path)
+    df = _frame().assign(identified_themes=['Access', '', 'UI'])
+    mapping = {'CBE': 1, 'BOA': 2}
+    load_rows(engine, prepare_rows(df.iloc[:1], mapping), method=method)
+
+    df.loc[0, 'identified_themes'] = 'UI'
+    df.loc[1, 'identified_themes'] = 'Support'
+    assert load_rows(engine, prepare_rows(df, mapping), method=method) == 1
+    assert _theme_counts(engine) == {(1, 'Access'): 1, (2, 'Support'): 1}
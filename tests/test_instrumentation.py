@@ -0,0 +1,80 @@
+import json
+import pstats
+
+import pytest
+
+from src import instrumentation
+from src.instrumentation import configure, instrumented, records, stage
+
+
+@pytest.fixture
+def sink(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, '_config', {'metrics': None, 'profile': None, 'profile_dir': tmp_path})
+    path = tmp_path / 'metrics.jsonl'
+    configure(metrics=str(path))
+    return path
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+def test_stage_emits_json_lines(sink):
+    with stage('preprocess', mode='batch') as m:
+        sum(range(100_000))
+        m.rows = 500
+    rec = _lines(sink)[-1]
+    assert rec['stage'] == 'preprocess' and rec['status'] == 'ok' and rec['mode'] == 'batch'
+    assert rec['rows'] == 500 and rec['rows_per_s'] > 0
+    assert rec['wall_s'] >= 0 and rec['cpu_s'] >= 0
+    assert rec in records()
+
+
+def test_decorator_and_errors_are_recorded(sink):
+    @instrumented('theme_assignment', rows=len)
+    def assign(texts):
+        return [t.upper() for t in texts]
+
+    assert assign(['a', 'b']) == ['A', 'B']
+    with pytest.raises(ZeroDivisionError):
+        with stage('db_insert'):
+            1 / 0
+    first, second = _lines(sink)[-2:]
+    assert (first['stage'], first['rows']) == ('theme_assignment', 2)
+    assert second['status'] == 'error' and second['error'].startswith('ZeroDivisionError')
+
+
+def test_cprofile_hook_writes_stats(sink, tmp_path):
+    configure(profile='cprofile', profile_dir=tmp_path / 'prof')
+    with stage('tfidf'):
+        sorted(range(1000), reverse=True)
+    (prof,) = (tmp_path / 'prof').glob('tfidf-*.prof')
+    assert pstats.Stats(str(prof)).total_calls > 0
+    with pytest.raises(ValueError):
+        configure(profile='perf')
+
+
+def test_only_one_stage_is_profiled_at_a_time(sink, tmp_path):
+    configure(profile='cprofile', profile_dir=tmp_path / 'prof')
+    with stage('outer'):
+        with stage('inner'):
+            sorted(range(1000), reverse=True)
+    assert [p.name.split('-')[0] for p in (tmp_path / 'prof').glob('*.prof')] == ['outer']
+    assert [r['stage'] for r in _lines(sink)[-2:]] == ['inner', 'outer']
+
+
+def test_peak_rss_is_per_stage(sink):
+    if not instrumentation._reset_hwm():
+        pytest.skip('needs /proc/self/clear_refs (Linux)')
+    with stage('outer'):
+        with stage('big'):
+            block = bytearray(200 * 1024 * 1024)
+            block[::4096] = b'x' * len(block[::4096])
+            del block
+        with stage('small'):
+            sum(range(1000))
+    big, small, outer = _lines(sink)[-3:]
+    assert big['peak_rss_mb'] - big['rss_start_mb'] > 150
+    assert small['peak_rss_mb'] < big['peak_rss_mb'] - 150
+    assert outer['peak_rss_mb'] >= big['peak_rss_mb']
+    assert outer['process_peak_rss_mb'] >= big['peak_rss_mb']
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from src.keywords import (HashedKeywordExtractor, SharedVocabulary, group_indices, iter_chunks, stream_keywords,
+                          stream_keywords_by_group)
+
+
+TEXTS = [
+    'login failed again and again',
+    'transfer is slow, transfer failed',
+    'great app great design',
+    'otp never arrives, login blocked',
+    'app crashes on transfer',
+    'customer support never answers',
+]
+BANKS = ['CBE', 'BOA', 'CBE', 'BOA', 'Dashen', 'CBE']
+
+
+def test_group_indices():
+    idx = group_indices(BANKS)
+    assert list(idx) == ['BOA', 'CBE', 'Dashen']
+    assert idx['CBE'].tolist() == [0, 2, 5]
+
+
+def test_group_slices_match_per_group_sums():
+    vocab = SharedVocabulary()
+    X = vocab.fit_transform(TEXTS)
+    by_bank = vocab.top_keywords_by_group(X, BANKS, top_k=100)
+    for bank, rows in group_indices(BANKS).items():
+        scores = np.asarray(X[rows].sum(axis=0)).ravel()
+        assert set(by_bank[bank]) == set(vocab.features[scores > 0])
+    # only terms that occur in the bank's own reviews are reported
+    assert 'support' not in by_bank['BOA']
+    assert by_bank['Dashen'][0] in ('app', 'crashes', 'transfer', 'app crashes', 'crashes transfer')
+
+
+def test_saved_vocabulary_is_reused_without_refit(tmp_path):
+    path = tmp_path / 'vocab.pkl'
+    vocab, X = SharedVocabulary.load_or_fit(TEXTS, path)
+    assert path.exists()
+
+    again, X2 = SharedVocabulary.load_or_fit(TEXTS + ['brand new words here'], path)
+    assert list(again.features) == list(vocab.features)
+    assert np.allclose(X2[:len(TEXTS)].toarray(), X.toarray())
+    # unseen terms are ignored until the vocabulary is refitted
+    assert X2[len(TEXTS)].nnz == 0
+
+    refit, _ = SharedVocabulary.load_or_fit(TEXTS + ['brand new words here'], path, refit=True)
+    assert 'brand' in set(refit.features)
+
+
+def _zipf_corpus(n_docs=3000, n_words=400, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array([f'w{i}x' for i in range(n_words)])
+    p = 1 / np.arange(1, n_words + 1) ** 1.1
+    p /= p.sum()
+    return [' '.join(rng.choice(words, size=rng.integers(3, 15), p=p)) for _ in range(n_docs)]
+
+
+def test_hashed_extractor_streams_to_tfidf_keywords():
+    texts = _zipf_corpus()
+    vocab = SharedVocabulary(max_features=None)
+    expected = vocab.top_keywords(vocab.fit_transform(texts), top_k=20)
+    chunks = (texts[i:i + 500] for i in range(0, len(texts), 500))
+    got = stream_keywords(chunks, top_k=20, memory_mb=4)
+    assert len(set(got) & set(expected)) >= 18
+    assert got[:3] == expected[:3]
+
+
+def test_hashed_extractor_stays_within_tiny_budget():
+    texts = _zipf_corpus(n_docs=1000)
+    ext = HashedKeywordExtractor(n_features=256, memory_mb=0.1)
+    for i in range(0, len(texts), 100):
+        ext.partial_fit(texts[i:i + 100])
+        assert len(ext._names) <= ext.name_capacity
+    assert ext.n_docs == 1000
+    # heavy collisions, but the most frequent terms still win their buckets
+    assert set(ext.top_keywords(top_k=3)) <= {'w0x', 'w1x', 'w2x', 'w3x', 'w4x'}
+
+
+def test_stream_keywords_by_group():
+    df = pd.DataFrame({'review': TEXTS * 3, 'bank': BANKS * 3})
+    by_bank = stream_keywords_by_group(iter_chunks(df, 4), top_k=5)
+    assert list(by_bank) == ['BOA', 'CBE', 'Dashen']
+    assert 'support' not in by_bank['BOA']
+    assert set(by_bank['Dashen']) <= {'app', 'crashes', 'transfer', 'app crashes', 'crashes transfer'}
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from src.minhash import MinHasher, NearDuplicateIndex, lsh_params, near_duplicate_clusters, normalize, similarity
+
+
+def _jaccard(a, b, k=5):
+    a, b = normalize(a), normalize(b)
+    sa = {a[i:i + k] for i in range(len(a) - k + 1)}
+    sb = {b[i:i + k] for i in range(len(b) - k + 1)}
+    return len(sa & sb) / len(sa | sb)
+
+
+def test_signature_agreement_estimates_jaccard():
+    a = 'Money transfer failed twice today, please fix the app as soon as possible'
+    b = 'money transfer failed 3 times today. Please fix the app as soon as possible!!'
+    sig = MinHasher(num_perm=256).signatures([a, b, 'ok', ''])
+    assert sig.shape == (4, 256) and sig.dtype == np.uint32
+    assert similarity(sig[0], sig[1]) == pytest.approx(_jaccard(a, b), abs=0.1)
+    assert similarity(sig[0], MinHasher(num_perm=256).signatures([a])[0]) == 1
+
+
+def test_lsh_params_put_the_s_curve_at_the_threshold():
+    for threshold in (0.5, 0.8, 0.9):
+        bands, rows = lsh_params(threshold, 128)
+        assert bands * rows <= 128
+        assert (1 / bands) ** (1 / rows) == pytest.approx(threshold, abs=0.05)
+    with pytest.raises(ValueError):
+        lsh_params(1.5, 128)
+
+
+def test_clusters_continue_across_chunks():
+    spam = 'Win 1000 birr now!!! click the link in my profile to claim your prize'
+    index = NearDuplicateIndex(threshold=0.7)
+    ids, new = index.assign([spam, 'The app crashes on login', spam.replace('1000', '5000')])
+    assert ids.tolist() == [0, 1, 0] and new.tolist() == [True, True, False]
+    ids, new = index.assign(['the app CRASHES on login!', spam.upper() + ' :)', 'Great service'])
+    assert ids.tolist() == [1, 0, 2] and new.tolist() == [False, False, True]
+    assert len(index) == 3
+
+
+def test_one_shot_matches_chunked():
+    rng = np.random.default_rng(3)
+    words = ['app', 'transfer', 'slow', 'login', 'otp', 'crash', 'update', 'balance', 'fee', 'support']
+    base = [' '.join(rng.choice(words, 12)) for _ in range(50)]
+    texts = [t if i % 3 else t + ' pls' for i, t in enumerate(base * 4)]
+    ids, new = near_duplicate_clusters(texts, threshold=0.8)
+    index = NearDuplicateIndex(threshold=0.8)
+    chunked = [index.assign(texts[i:i + 37]) for i in range(0, len(texts), 37)]
+    assert np.concatenate([c[0] for c in chunked]).tolist() == ids.tolist()
+    assert np.concatenate([c[1] for c in chunked]).tolist() == new.tolist()
+    assert new.sum() == ids.max() + 1 <= 100
+
+
+def test_symbol_only_reviews_are_not_merged():
+    ids, representative = near_duplicate_clusters(['👍', '👎', '😡😡', '!!!', 'ok', '👍', '', ' '])
+    assert ids.tolist() == [0, 1, 2, 3, 4, 0, 5, 6]
+    assert representative.tolist() == [True] * 5 + [False, True, True]
@@ -0,0 +1,27 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from src.partition import group_indices, map_partitions, partition_order, partitions
+
+
+def _scaled_sum(key, part, factor=1):
+    return (key, part['x'].sum() * factor)
+
+
+def test_partitions_follow_sorted_keys_and_original_row_order():
+    df = pd.DataFrame({'bank': ['CBE', 'BOA', 'CBE', 'DASHEN', 'BOA'], 'x': [1, 2, 3, 4, 5]}, index=[10, 11, 12, 13, 14])
+    assert [(k, p.index.tolist()) for k, p in partitions(df, df['bank'])] == [
+        ('BOA', [11, 14]), ('CBE', [10, 12]), ('DASHEN', [13])]
+    assert partition_order(group_indices(df['bank'])).tolist() == [1, 4, 0, 2, 3]
+    assert partition_order({}).tolist() == []
+
+
+def test_map_partitions_on_a_process_pool_matches_serial():
+    df = pd.DataFrame({'bank': np.array(['A', 'B', 'C'] * 50), 'x': np.arange(150)})
+    fn = partial(_scaled_sum, factor=2)
+    serial = map_partitions(fn, df, df['bank'])
+    assert list(serial) == ['A', 'B', 'C']
+    assert serial['A'] == ('A', 2 * df.loc[df['bank'] == 'A', 'x'].sum())
+    assert map_partitions(fn, df, df['bank'], workers=2) == serial
@@ -0,0 +1,116 @@
+import os
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from src import pg_partitions
+
+
+def test_month_helpers():
+    assert pg_partitions.month_start('2024-05-17 10:00:00') == date(2024, 5, 1)
+    assert pg_partitions.month_start(datetime(2024, 5, 17, 10)) == date(2024, 5, 1)
+    assert pg_partitions.add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert pg_partitions.add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert pg_partitions.months_between('2024-11', '2025-02-10') == [
+        date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1),
+    ]
+    assert pg_partitions.months_of(['2024-05-03', None, 'n/a', '2024-05-30', '2023-12-01']) == [
+        date(2023, 12, 1), date(2024, 5, 1),
+    ]
+    with pytest.raises(ValueError):
+        pg_partitions.month_start('May 2024')
+
+
+def test_partition_name():
+    assert pg_partitions.partition_name(date(2024, 5, 1)) == 'reviews_y2024m05'
+    assert pg_partitions.partition_name(date(2024, 5, 1), 3) == 'reviews_y2024m05_b3'
+
+
+# the round trip below needs a scratch PostgreSQL database, e.g.
+# TEST_DATABASE_URL=postgresql://postgres@localhost:5432/postgres
+PG_URL = os.environ.get('TEST_DATABASE_URL', '')
+SCHEMA = 'test_pg_partitions'
+
+
+@pytest.fixture
+def pg_engine():
+    if not PG_URL.startswith('postgresql'):
+        pytest.skip('TEST_DATABASE_URL does not point at PostgreSQL')
+    from scripts.db_init_sqlalchemy import metadata
+
+    admin = create_engine(PG_URL)
+    with admin.begin() as conn:
+        conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        conn.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+    engine = create_engine(PG_URL, connect_args={'options': f'-csearch_path={SCHEMA}'})
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO banks (bank_id, bank_name) VALUES (1, 'CBE'), (2, 'BOA')"))
+    yield engine
+    engine.dispose()
+    with admin.begin() as conn:
+        conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+    admin.dispose()
+
+
+def test_partitioned_round_trip(pg_engine):
+    from scripts.insert_reviews_to_postgres import _bulk, load_rows, prepare_rows, upsert_rows
+
+    mapping = {'CBE': 1, 'BOA': 2}
+    df = pd.DataFrame({
+        'reviewId': ['r1', 'r2', 'r3', 'r4'],
+        'review': ['good app', 'slow transfer', 'crashes', 'no date'],
+        'bank': ['CBE', 'BOA', 'CBE', 'BOA'],
+        'rating': [5, 2, 1, 3],
+        'date': ['2024-01-05', '2024-02-10', '2024-03-15', None],
+        'sentiment_label': ['pos', 'neg', 'neg', 'neu'],
+        'vader': [0.5, -0.4, -0.6, 0.0],
+    })
+    assert upsert_rows(pg_engine, prepare_rows(df, mapping)) == 4
+
+    created = _bulk(pg_engine, lambda cur: pg_partitions.convert(cur, by_bank=True, months_ahead=0,
+                                                                 today=date(2024, 3, 1)))
+    assert created == pg_partitions.months_between('2024-01', '2024-03')
+    assert _bulk(pg_engine, pg_partitions.layout) == 'month_bank'
+    assert upsert_rows(pg_engine, prepare_rows(df, mapping)) == 0
+    assert load_rows(pg_engine, prepare_rows(df, mapping)) == 0
+
+    # a re-dated review moves to a month that has no partition yet
+    df.loc[0, 'date'] = '2024-06-01'
+    df.loc[1, 'rating'] = 1
+    assert upsert_rows(pg_engine, prepare_rows(df, mapping)) == 2
+    with pg_engine.connect() as conn:
+        counts = dict(conn.execute(text(
+            'SELECT tableoid::regclass::text, count(*) FROM reviews GROUP BY 1'
+        )).fetchall())
+        keys = conn.execute(text('SELECT count(DISTINCT (source, review_key)), count(*) FROM reviews')).one()
+    assert counts == {
+        'reviews_y2024m06_b1': 1, 'reviews_y2024m02_b2': 1, 'reviews_y2024m03_b1': 1, 'reviews_default': 1,
+    }
+    assert tuple(keys) == (4, 4)
+
+    # rows written without the loader land in the default partition until their month is created
+    with pg_engine.begin() as conn:
+        conn.execute(text("INSERT INTO reviews (bank_id, review_text, review_date, source, review_key) "
+                          "VALUES (2, 'direct', '2024-09-10', 'manual', 'm1')"))
+    created = _bulk(pg_engine, lambda cur: pg_partitions.ensure_future(cur, 0, today=date(2024, 9, 1)))
+    assert created == [date(2024, 9, 1)]
+    with pg_engine.connect() as conn:
+        where = conn.execute(text("SELECT tableoid::regclass::text FROM reviews WHERE review_key = 'm1'")).scalar()
+    assert where == 'reviews_y2024m09_b2'
+
+    detached = _bulk(pg_engine, lambda cur: pg_partitions.archive(cur, '2024-03', drop=True))
+    assert detached == ['reviews_y2024m01', 'reviews_y2024m02']
+    with pg_engine.connect() as conn:
+        assert conn.execute(text('SELECT count(*) FROM reviews')).scalar() == 4
+
+    # a full rollup refresh starts at the oldest attached month, so February's archived day survives
+    from scripts.refresh_rollups import refresh_rollups
+
+    assert _bulk(pg_engine, pg_partitions.history_start) == date(2024, 3, 1)
+    refresh_rollups(pg_engine)
+    with pg_engine.connect() as conn:
+        days = dict(conn.execute(text('SELECT day, review_count FROM daily_bank_stats WHERE bank_id = 2')).fetchall())
+    assert days == {date(2024, 2, 10): 1, date(2024, 9, 10): 1, None: 1}
@@ -0,0 +1,96 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from src.pipeline import Pipeline, Stage, frame_fingerprint
+
+
+def _stages(tmp_path, calls, source):
+    raw = tmp_path / 'raw.txt'
+    out = tmp_path / 'clean.csv'
+
+    def clean(inputs):
+        calls.append('clean')
+        df = pd.DataFrame({'x': [int(v) for v in raw.read_text().split()]})
+        df.to_csv(out, index=False)
+        return df
+
+    def parity(inputs):
+        calls.append('parity')
+        return inputs['clean'].assign(even=inputs['clean']['x'] % 2 == 0)
+
+    def total(inputs):
+        calls.append('total')
+        return pd.DataFrame({'sum': [inputs['clean']['x'].abs().sum()]})
+
+    raw.write_text(source)
+    return raw, [
+        Stage('clean', clean, files=lambda: [raw], outputs=[out], load=lambda: pd.read_csv(out)),
+        Stage('total', total, deps=['clean']),
+        Stage('parity', parity, deps=['clean']),
+    ]
+
+
+def test_skips_unchanged_stages_and_downstream_of_identical_output(tmp_path):
+    calls = []
+    raw, stages = _stages(tmp_path, calls, '1 2 3')
+    state = tmp_path / 'state.json'
+    assert set(Pipeline(stages, state).run().values()) == {'ran'}
+    assert sorted(calls) == ['clean', 'parity', 'total']
+
+    calls.clear()
+    assert set(Pipeline(stages, state).run().values()) == {'skipped'}
+    assert calls == []
+
+    # new input bytes, same parsed frame: only `clean` reruns
+    raw.write_text('1  2 3\n')
+    calls.clear()
+    status = Pipeline(stages, state).run()
+    assert calls == ['clean'] and status['total'] == 'skipped'
+
+    raw.write_text('1 2 -3')
+    calls.clear()
+    Pipeline(stages, state).run(targets=['parity'])
+    assert calls == ['clean', 'parity']
+
+
+def test_skipped_stage_output_is_loaded_or_recomputed(tmp_path):
+    calls = []
+    _, stages = _stages(tmp_path, calls, '4 5')
+    state = tmp_path / 'state.json'
+    Pipeline(stages, state).run()
+
+    calls.clear()
+    Pipeline(stages, state).run(force=['parity'])
+    assert calls == ['parity']  # `clean` was read back from its CSV
+
+    (tmp_path / 'clean.csv').unlink()
+    calls.clear()
+    Pipeline(stages, state).run()
+    assert calls[0] == 'clean'
+
+
+def test_independent_stages_run_in_parallel(tmp_path):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def wait(inputs):
+        barrier.wait()
+        return pd.DataFrame({'ok': [1]})
+
+    stages = [Stage('a', wait), Stage('b', wait), Stage('c', lambda inputs: None, deps=['a', 'b'])]
+    assert Pipeline(stages, state_path=None, max_parallel=2).run() == {'a': 'ran', 'b': 'ran', 'c': 'ran'}
+
+
+def test_rejects_cycles_and_unknown_dependencies():
+    with pytest.raises(ValueError):
+        Pipeline([Stage('a', None, deps=['b']), Stage('b', None, deps=['a'])], state_path=None)
+    with pytest.raises(ValueError):
+        Pipeline([Stage('a', None, deps=['missing'])], state_path=None)
+
+
+def test_frame_fingerprint_tracks_content():
+    df = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+    assert frame_fingerprint(df) == frame_fingerprint(df.copy())
+    assert frame_fingerprint(df) != frame_fingerprint(df.assign(b=['x', 'z']))
+    assert frame_fingerprint(df) != frame_fingerprint(df.rename(columns={'b': 'c'}))
@@ -0,0 +1,119 @@
+import pandas as pd
+import pytest
+
+from scripts.preprocess_reviews import normalize_date, normalize_dates
+
+
+def test_normalize_dates_matches_per_row_path():
+    dates = pd.Series([
+        '2024-05-01T12:34:56',
+        '2024-05-02T00:00:01',
+        '2024-05-03T23:59:59.123456',
+        '2024-05-04T10:00:00+03:00',
+        'May 5 2024',
+        '',
+        None,
+        'not a date',
+        '2024-13-01T00:00:00',
+    ])
+    out, stats = normalize_dates(dates)
+    assert out.tolist() == dates.apply(normalize_date).tolist()
+    assert stats['format'] == '%Y-%m-%dT%H:%M:%S'
+    assert stats['fast'] == 2
+    assert stats['slow'] == 5
+
+
+def test_near_duplicate_clusters_match_in_batch_and_stream(tmp_path, monkeypatch):
+    from scripts import preprocess_reviews
+    from src.minhash import NearDuplicateIndex
+
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    pd.DataFrame({
+        'content': ['App keeps crashing after the update', 'app keeps crashing after the update!!', 'Great app',
+                    'Transfer failed, money deducted', 'transfer failed - money deducted', 'Great app'],
+        'score': [1, 1, 5, 1, 2, 5],
+        'at': ['2024-05-01T10:00:00'] * 6,
+    }).to_csv(raw / 'raw_CBE.csv', index=False)
+    monkeypatch.setattr(preprocess_reviews, 'RAW_DIR', raw)
+    monkeypatch.setattr(preprocess_reviews, 'OUT_DIR', tmp_path)
+    monkeypatch.setattr(preprocess_reviews, 'OUT_FILE', tmp_path / 'clean.csv')
+    monkeypatch.setattr(preprocess_reviews, 'CATALOG_PATH', tmp_path / 'catalog.json')
+
+    batch = preprocess_reviews.preprocess_files(list(raw.glob('raw_*.csv')), NearDuplicateIndex(0.6))
+    assert batch['cluster_id'].tolist() == [0, 0, 1, 2, 2]
+
+    preprocess_reviews.run_streaming(chunksize=2, near_dupes=NearDuplicateIndex(0.6), drop_near_dupes=True)
+    out = pd.read_csv(tmp_path / 'clean.csv')
+    assert out['review'].tolist() == ['App keeps crashing after the update', 'Great app',
+                                      'Transfer failed, money deducted']
+    assert out['cluster_id'].tolist() == [0, 1, 2]
+
+
+def test_run_skips_when_raw_inputs_are_unchanged(tmp_path, monkeypatch, capsys):
+    from scripts import preprocess_reviews
+
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    pd.DataFrame({'content': ['slow app', 'good'], 'score': [2, 5], 'at': ['2024-05-01T10:00:00'] * 2}).to_csv(
+        raw / 'raw_CBE.csv', index=False)
+    monkeypatch.setattr(preprocess_reviews, 'RAW_DIR', raw)
+    monkeypatch.setattr(preprocess_reviews, 'OUT_DIR', tmp_path)
+    monkeypatch.setattr(preprocess_reviews, 'OUT_FILE', tmp_path / 'clean.csv')
+    monkeypatch.setattr(preprocess_reviews, 'CATALOG_PATH', tmp_path / 'catalog.json')
+
+    preprocess_reviews.run()
+    assert 'Saved cleaned reviews' in capsys.readouterr().out
+    preprocess_reviews.run()
+    assert 'skipping' in capsys.readouterr().out
+    preprocess_reviews.run_streaming()  # other settings: rebuilt
+    assert 'Saved cleaned reviews' in capsys.readouterr().out
+    preprocess_reviews.run_streaming(force=True)
+    assert 'Saved cleaned reviews' in capsys.readouterr().out
+    (raw / 'raw_CBE.csv').write_text('content,score,at\nnew review,1,2024-05-02T10:00:00\n')
+    preprocess_reviews.run_streaming()
+    assert pd.read_csv(tmp_path / 'clean.csv')['review'].tolist() == ['new review']
+
+
+def test_review_ids_reach_the_loader_keys(tmp_path):
+    from scripts.insert_reviews_to_postgres import prepare_rows
+    from scripts.preprocess_reviews import preprocess_files
+
+    pd.DataFrame({
+        'content': ['slow app', 'good'], 'score': [2, 5], 'at': ['2024-05-01T10:00:00'] * 2,
+        'reviewId': ['gp:1', None],
+    }).to_csv(tmp_path / 'raw_CBE.csv', index=False)
+    pd.DataFrame({'content': ['legacy'], 'score': [3], 'at': ['2024-05-02T10:00:00']}).to_csv(
+        tmp_path / 'raw_BOA.csv', index=False)
+
+    clean = preprocess_files(sorted(tmp_path.glob('raw_*.csv')))
+    ids = clean.set_index('review')['raw_review_id']
+    assert ids['slow app'] == 'gp:1'
+    assert ids[['good', 'legacy']].isna().all()
+    rows = prepare_rows(clean, {'CBE': 1, 'BOA': 2}).set_index('review_text')
+    assert rows.loc['slow app', 'review_key'] == 'gp:1'
+    assert rows.loc['good', 'review_key'].startswith('h:')
+    assert rows.loc['legacy', 'review_key'].startswith('h:')
+
+
+def test_streamed_parquet_keeps_one_schema_across_chunks(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    from scripts import preprocess_reviews
+    from src.storage import load_processed
+
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    # the first chunk has no dates (or ids) at all, so on its own it would infer null-typed columns
+    pd.DataFrame({'content': ['no date'], 'score': [3], 'at': [None]}).to_csv(raw / 'raw_ABAY.csv', index=False)
+    pd.DataFrame({'content': ['dated'], 'score': [4], 'at': ['2024-05-01T10:00:00'], 'reviewId': ['gp:1']}).to_csv(
+        raw / 'raw_CBE.csv', index=False)
+    monkeypatch.setattr(preprocess_reviews, 'RAW_DIR', raw)
+    monkeypatch.setattr(preprocess_reviews, 'OUT_DIR', tmp_path)
+    monkeypatch.setattr(preprocess_reviews, 'OUT_FILE', tmp_path / 'clean.csv')
+    monkeypatch.setattr(preprocess_reviews, 'CATALOG_PATH', tmp_path / 'catalog.json')
+
+    preprocess_reviews.run_streaming(fmt='parquet')
+    out = load_processed(tmp_path / 'clean.csv')
+    assert out['review'].tolist() == ['no date', 'dated']
+    assert out['date'].tolist()[1] == '2024-05-01'
+    assert out['raw_review_id'].tolist()[1] == 'gp:1'
@@ -0,0 +1,96 @@
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from scripts.db_init_sqlalchemy import metadata
+from scripts.insert_reviews_to_postgres import bank_mapping, load_rows, prepare_rows, upsert_rows
+from scripts.refresh_rollups import refresh_rollups
+from src import rollups
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'reviews.db'}")
+    metadata.create_all(engine)
+    return engine
+
+
+def _frame():
+    return pd.DataFrame({
+        'review': ['good app', 'slow transfer', 'crashes', 'login fails', 'no date'],
+        'bank': ['CBE', 'CBE', 'CBE', 'BOA', 'BOA'],
+        'rating': [5, 2, 1, 1, 3],
+        'date': ['2024-05-01', '2024-05-01', '2024-05-02', '2024-05-01', None],
+        'sentiment_label': ['pos', 'neg', 'neg', None, 'neu'],
+        'identified_themes': ['UI', 'Transactions;Reliability', 'Reliability', 'Access', ''],
+    })
+
+
+def _snapshot(engine):
+    with engine.connect() as conn:
+        bank = conn.execute(text(f'SELECT * FROM {rollups.BANK_TABLE} ORDER BY bank_id, day')).fetchall()
+        theme = conn.execute(text(
+            f'SELECT day, bank_id, theme_id, review_count FROM {rollups.THEME_TABLE} ORDER BY bank_id, day, theme_id'
+        )).fetchall()
+    return [tuple(r) for r in bank], [tuple(r) for r in theme]
+
+
+def _load(engine, df, **kw):
+    return upsert_rows(engine, prepare_rows(df, bank_mapping(engine, sorted(df['bank'].unique()))), **kw)
+
+
+def test_loads_keep_rollups_equal_to_a_full_rebuild(tmp_path):
+    engine = _engine(tmp_path)
+    df = _frame()
+    _load(engine, df)
+    incremental = _snapshot(engine)
+    refresh_rollups(engine)
+    assert _snapshot(engine) == incremental
+
+    with engine.connect() as conn:
+        totals = {r.bank_name: r for r in rollups.bank_totals(conn)}
+        themes = rollups.theme_totals(conn)
+    assert totals['CBE'].review_count == 3 and totals['CBE'].rating_1 == 1 and totals['CBE'].sentiment_neg == 2
+    assert totals['BOA'].review_count == 2 and totals['BOA'].sentiment_labeled == 1
+    assert ('CBE', 'Reliability', 2) in [tuple(r) for r in themes]
+
+    # relabel one review and rewrite another (new key), then add a review on a new day
+    df.loc[0, 'sentiment_label'] = 'neu'
+    df.loc[1, 'identified_themes'] = 'Reliability'
+    df.loc[len(df)] = ['fast', 'BOA', 4, '2024-05-03', 'pos', 'UI']
+    assert _load(engine, df) == 3
+    incremental = _snapshot(engine)
+    refresh_rollups(engine)
+    assert _snapshot(engine) == incremental
+    with engine.connect() as conn:
+        assert sum(r.review_count for r in rollups.bank_totals(conn)) == 6
+
+
+def test_append_and_partial_refresh(tmp_path):
+    engine = _engine(tmp_path)
+    mapping = bank_mapping(engine, ['BOA', 'CBE'])
+    load_rows(engine, prepare_rows(_frame(), mapping))
+    full = _snapshot(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE {rollups.BANK_TABLE} SET review_count = 0"))
+    refresh_rollups(engine, since='2024-05-02')
+    with engine.connect() as conn:
+        counts = conn.execute(text(f'SELECT day, review_count FROM {rollups.BANK_TABLE} ORDER BY day')).fetchall()
+    # the undated and 2024-05-01 rows are left alone; 2024-05-02 is rebuilt
+    assert [(d and str(d), c) for d, c in counts] == [
+        (None, 0), ('2024-05-01', 0), ('2024-05-01', 0), ('2024-05-02', 1)]
+    refresh_rollups(engine)
+    assert _snapshot(engine) == full
+
+
+def test_summarize_db_needs_rollup_tables(tmp_path, capsys):
+    from scripts.summarize_thematic import summarize_db
+
+    summarize_db(f"sqlite:///{tmp_path / 'empty.db'}")
+    assert 'No rollup tables found' in capsys.readouterr().out
+
+    engine = _engine(tmp_path)
+    _load(engine, _frame())
+    summarize_db(str(engine.url))
+    out = capsys.readouterr().out
+    assert 'Total reviews analyzed: 5' in out
+    assert 'Bank: CBE' in out
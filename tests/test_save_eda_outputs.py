@@ -0,0 +1,56 @@
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('matplotlib')
+pytest.importorskip('seaborn')
+pytest.importorskip('nltk')
+
+import matplotlib  # noqa: E402
+
+matplotlib.use('Agg')
+
+from scripts.save_eda_outputs import DIGEST_FILE, negative_word_counts, render_eda  # noqa: E402
+
+STOP = {'the', 'and', 'app'}
+
+
+def _reviews():
+    return pd.DataFrame({
+        'review': ['The app crashes and crashes', 'login fails; otp fails!', 'great app', 'slow transfer',
+                   'crashes after update', 'otp never arrives'],
+        'rating': [1, 2, 5, 2, 1, 1],
+        'bank': ['CBE', 'CBE', 'CBE', 'BOA', 'BOA', 'BOA'],
+        'sentiment_label': ['neg', 'neg', 'pos', 'neg', 'neg', 'neu'],
+    })
+
+
+def test_negative_word_counts_match_per_bank_counter():
+    df = _reviews()
+    counts = negative_word_counts(df, STOP, top_n=3)
+    for bank in ['BOA', 'CBE']:
+        words = Counter()
+        for text in df[(df['bank'] == bank) & (df['sentiment_label'] == 'neg')]['review']:
+            words.update(w for w in ''.join(c if c.isalpha() or c.isspace() else ' ' for c in text).lower().split()
+                         if len(w) > 2 and w not in STOP)
+        assert list(counts.xs(bank, level='bank').items()) == words.most_common(3)
+
+
+def test_render_skips_figures_with_unchanged_data(tmp_path):
+    df = _reviews()
+    first = render_eda(df, tmp_path, stop=STOP)
+    assert {p.name for p in first} == {'ratings_distribution.png', 'sentiment_by_bank.png',
+                                       'top_negative_words_BOA.png', 'top_negative_words_CBE.png'}
+    assert (tmp_path / DIGEST_FILE).exists()
+    assert render_eda(df, tmp_path, stop=STOP) == []
+
+    # one more negative BOA review: its word chart, the rating counts and the heatmap change
+    df.loc[len(df)] = ['slow slow login', 3, 'BOA', 'neg']
+    again = render_eda(df, tmp_path, workers=2, stop=STOP)
+    assert {p.name for p in again} == {'ratings_distribution.png', 'sentiment_by_bank.png',
+                                       'top_negative_words_BOA.png'}
+
+    (tmp_path / 'top_negative_words_CBE.png').unlink()
+    assert [p.name for p in render_eda(df, tmp_path, stop=STOP)] == ['top_negative_words_CBE.png']
+    assert len(render_eda(df, tmp_path, force=True, stop=STOP)) == 4
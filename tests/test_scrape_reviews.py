@@ -0,0 +1,151 @@
+import csv
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from scripts.scrape_reviews import CSV_HEADER, TokenBucket, scrape_all_concurrent, scrape_app
+
+
+class FakePlayStore:
+    """Serves a fixed, newest-first review list in pages, like `google_play_scraper.reviews`."""
+
+    def __init__(self, reviews_list):
+        self.reviews = reviews_list
+        self.calls = 0
+
+    def __call__(self, app_id, lang, country, sort, count, continuation_token):
+        self.calls += 1
+        start = continuation_token or 0
+        page = self.reviews[start:start + count]
+        end = start + len(page)
+        return page, (end if end < len(self.reviews) else None)
+
+
+def _reviews(n, start):
+    return [
+        {'reviewId': f'id{i}', 'content': f'review {i}', 'score': 5, 'at': start - timedelta(minutes=i)}
+        for i in range(n)
+    ]
+
+
+def _rows(path):
+    with path.open(encoding='utf-8') as fh:
+        return list(csv.reader(fh))
+
+
+def test_incremental_run_appends_only_new_reviews(tmp_path):
+    now = datetime(2024, 6, 1, 12, 0, 0)
+    old = _reviews(5, now)
+    state = {}
+    scrape_app('CBE', 'app', tmp_path, state, incremental=True, fetch=FakePlayStore(old), sleep=lambda s: None)
+    assert state['CBE']['newest_at'] == now.isoformat()
+    assert len(_rows(tmp_path / 'raw_CBE.csv')) == 6
+
+    newer = [{'reviewId': 'new1', 'content': 'fresh', 'score': 1, 'at': now + timedelta(minutes=1)}]
+    store = FakePlayStore(newer + old)
+    written = scrape_app('CBE', 'app', tmp_path, state, incremental=True, fetch=store, sleep=lambda s: None)
+    assert written == 1
+    assert store.calls == 1
+    rows = _rows(tmp_path / 'raw_CBE.csv')
+    assert len(rows) == 7
+    assert rows[-1][0] == 'fresh'
+    assert state['CBE']['newest_ids'] == ['new1']
+
+    assert scrape_app('CBE', 'app', tmp_path, state, incremental=True, fetch=store, sleep=lambda s: None) == 0
+
+
+def test_incremental_run_catches_up_past_target(tmp_path):
+    now = datetime(2024, 6, 1, 12, 0, 0)
+    old = _reviews(3, now)
+    state = {}
+    scrape_app('CBE', 'app', tmp_path, state, incremental=True, target=3, fetch=FakePlayStore(old),
+               sleep=lambda s: None)
+
+    newer = [
+        {'reviewId': f'new{i}', 'content': f'fresh {i}', 'score': 1, 'at': now + timedelta(minutes=10 - i)}
+        for i in range(7)
+    ]
+    written = scrape_app('CBE', 'app', tmp_path, state, incremental=True, target=3,
+                         fetch=FakePlayStore(newer + old), sleep=lambda s: None)
+    assert written == 7
+    assert len(_rows(tmp_path / 'raw_CBE.csv')) == 1 + 3 + 7
+    assert state['CBE']['newest_ids'] == ['new0']
+
+
+class FlakyPlayStore(FakePlayStore):
+    def __init__(self, reviews_list, failures):
+        super().__init__(reviews_list)
+        self.failures = failures
+
+    def __call__(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('transient')
+        return super().__call__(*args, **kwargs)
+
+
+def test_concurrent_scrape_overlaps_app_latency(tmp_path):
+    now = datetime(2024, 6, 1)
+    stores = {bank: FakePlayStore(_reviews(3, now)) for bank in ('A', 'B', 'C', 'D')}
+    # every fetch waits until all four apps are in flight; run one after another, the barrier breaks
+    barrier = threading.Barrier(len(stores), timeout=5)
+
+    def fetch(app_id, **kwargs):
+        barrier.wait()
+        return stores[app_id](app_id, **kwargs)
+
+    apps = {bank: bank for bank in stores}
+    summary = scrape_all_concurrent(apps, tmp_path, {}, target=3, fetch=fetch, max_workers=4, rate=100.0,
+                                    retries=0, sleep=lambda s: None)
+    assert summary == {'A': 3, 'B': 3, 'C': 3, 'D': 3}
+
+
+def test_concurrent_scrape_retries_transient_failures(tmp_path):
+    store = FlakyPlayStore(_reviews(2, datetime(2024, 6, 1)), failures=2)
+    summary = scrape_all_concurrent({'A': 'a'}, tmp_path, {}, target=2, fetch=store, rate=100.0,
+                                    sleep=lambda s: None)
+    assert summary == {'A': 2}
+
+
+def test_token_bucket_paces_requests():
+    clock = [0.0]
+    waits = []
+
+    def sleep(s):
+        waits.append(s)
+        clock[0] += s
+
+    bucket = TokenBucket(rate=2.0, clock=lambda: clock[0], sleep=sleep)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock[0] == pytest.approx(1.0)
+
+
+def test_raw_csv_keeps_review_ids_and_upgrades_legacy_files(tmp_path):
+    now = datetime(2024, 6, 1, 12, 0, 0)
+    legacy = tmp_path / 'raw_CBE.csv'
+    legacy.write_text('content,score,at,bank,source\nold review,4,2024-05-01T00:00:00,CBE,google_play\n',
+                      encoding='utf-8')
+    state = {'CBE': {'newest_at': '2024-05-01T00:00:00', 'newest_ids': []}}
+    scrape_app('CBE', 'app', tmp_path, state, incremental=True, fetch=FakePlayStore(_reviews(2, now)),
+               sleep=lambda s: None)
+    rows = _rows(legacy)
+    assert rows[0] == CSV_HEADER
+    assert [r[0] for r in rows[1:]] == ['old review', 'review 0', 'review 1']
+    assert [r[-1] for r in rows[1:]] == ['', 'id0', 'id1']
+
+
+def test_first_incremental_run_resumes_from_existing_raw_file(tmp_path):
+    now = datetime(2024, 6, 1, 12, 0, 0)
+    old = _reviews(3, now)
+    scrape_app('CBE', 'app', tmp_path, {}, target=3, fetch=FakePlayStore(old), sleep=lambda s: None)
+
+    # no state entry for the bank; the file's newest review and its id mark what is already stored
+    newer = [{'reviewId': 'new1', 'content': 'fresh', 'score': 1, 'at': now + timedelta(minutes=1)}]
+    state = {}
+    written = scrape_app('CBE', 'app', tmp_path, state, incremental=True, fetch=FakePlayStore(newer + old),
+                         sleep=lambda s: None)
+    assert written == 1
+    assert [r[0] for r in _rows(tmp_path / 'raw_CBE.csv')[1:]] == ['review 0', 'review 1', 'review 2', 'fresh']
+    assert state['CBE']['newest_ids'] == ['new1']
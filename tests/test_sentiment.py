@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip('vaderSentiment')
+
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from src.sentiment import get_engine, label_from_compound
+
+
+TEXTS = [
+    'Great app, fast transfers!',
+    'Login fails every time, terrible.',
+    'ok',
+    '',
+    'The app keeps crashing after the update and support never answers',
+] * 7
+
+
+def _reference(texts):
+    analyzer = SentimentIntensityAnalyzer()
+    scores = [analyzer.polarity_scores(t)['compound'] for t in texts]
+    return scores, [label_from_compound(s) for s in scores]
+
+
+def test_vader_engine_matches_per_row_scoring():
+    assert get_engine('vader').score(TEXTS) == _reference(TEXTS)
+
+
+def test_vader_engine_process_pool_preserves_order():
+    engine = get_engine('vader', workers=2, batch_size=4)
+    assert engine.score(TEXTS) == _reference(TEXTS)
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        get_engine('nope')
@@ -0,0 +1,42 @@
+from src.sentiment_cache import SentimentCache, cache_key, score_with_cache
+
+
+class CountingEngine:
+    name = 'fake'
+    version = '1'
+
+    def __init__(self):
+        self.scored = []
+
+    def score(self, texts):
+        self.scored.extend(texts)
+        scores = [float(len(t)) for t in texts]
+        return scores, ['pos' if s else 'neu' for s in scores]
+
+
+def test_cache_key_depends_on_model_version():
+    assert cache_key('hi', 'vader', '1') != cache_key('hi', 'vader', '2')
+    assert cache_key('hi', 'vader', '1') == cache_key('hi', 'vader', '1')
+
+
+def test_only_misses_are_scored(tmp_path):
+    engine = CountingEngine()
+    with SentimentCache(tmp_path / 'c.sqlite') as cache:
+        assert score_with_cache(engine, ['a', 'bb', 'a'], cache) == ([1.0, 2.0, 1.0], ['pos'] * 3)
+        assert engine.scored == ['a', 'bb']
+        engine.scored.clear()
+        scores, _ = score_with_cache(engine, ['bb', 'ccc'], cache)
+        assert scores == [2.0, 3.0]
+        assert engine.scored == ['ccc']
+        assert cache.hits == 1
+
+
+def test_lru_eviction(tmp_path):
+    with SentimentCache(tmp_path / 'c.sqlite', max_entries=2) as cache:
+        cache.put_many({'a': (1.0, 'pos')})
+        cache.put_many({'b': (2.0, 'pos')})
+        cache.get_many(['a'])
+        cache.put_many({'c': (3.0, 'pos')})
+        assert len(cache) == 2
+        assert set(cache.get_many(['a', 'b', 'c'])) == {'a', 'c'}
+        assert cache.evictions == 1
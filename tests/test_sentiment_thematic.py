@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from src.manifest import Manifest, manifest_path, row_hash
+
+
+BANKS = ['CBE', 'BOA']
+PHRASES = [
+    'login fails with wrong otp', 'transfer is slow and failed', 'great app design',
+    'customer support never helps', 'please add a balance notification feature', 'app crash after update',
+]
+
+
+def _reviews(n, offset=0):
+    rows = []
+    for i in range(offset, offset + n):
+        rows.append({'review': f'{PHRASES[i % len(PHRASES)]} #{i}', 'rating': i % 5 + 1,
+                     'date': '2024-05-01', 'bank': BANKS[i % 2], 'source': 'google_play'})
+    return pd.DataFrame(rows)
+
+
+def test_manifest_round_trip(tmp_path):
+    path = manifest_path(tmp_path / 'reviews_thematic.csv')
+    assert path.name == 'reviews_thematic.manifest.json'
+    assert Manifest.load(path) is None
+    Manifest('fp', {'CBE': {'Other': ['x']}}, [row_hash('CBE', 'x')]).save(path)
+    m = Manifest.load(path)
+    assert (m.fingerprint, m.theme_maps, m.hashes) == ('fp', {'CBE': {'Other': ['x']}}, [row_hash('CBE', 'x')])
+    assert row_hash('CBE', 'x') != row_hash('BOA', 'x')
+
+
+def test_incremental_run_matches_full_assignment(tmp_path, capsys):
+    pytest.importorskip('vaderSentiment')
+    from scripts import sentiment_thematic as st
+
+    src, out = tmp_path / 'clean.csv', tmp_path / 'thematic.csv'
+    old = _reviews(40)
+    old.to_csv(src, index=False)
+    st.run(src, out, cache_path=None, incremental=True)
+    assert 'Full rebuild' in capsys.readouterr().out
+
+    # new reviews interleave with the old ones, shifting their positions
+    full = pd.concat([_reviews(10, 40), old.iloc[5:], _reviews(5, 50)], ignore_index=True)
+    full.to_csv(src, index=False)
+    st.run(src, out, cache_path=None, incremental=True)
+    assert 'Incremental: 15 new of 50 reviews' in capsys.readouterr().out
+
+    manifest = Manifest.load(manifest_path(out))
+    scored = full.copy()
+    scored['sentiment_score'], scored['sentiment_label'] = st.score_reviews(scored, cache_path=None)
+    expected = st.thematic_rows(scored, manifest.theme_maps)
+    got = pd.read_csv(out)
+    assert got['review_id'].tolist() == expected['review_id'].tolist()
+    assert got['identified_themes'].tolist() == expected['identified_themes'].tolist()
+    assert got['sentiment_score'].round(6).tolist() == expected['sentiment_score'].round(6).tolist()
+    assert len(manifest.hashes) == len(got)
+
+    st.run(src, out, cache_path=None, incremental=True, keywords='shared', vocab_path=tmp_path / 'vocab.pkl')
+    assert 'settings changed' in capsys.readouterr().out
+
+
+def test_thematic_rows_groups_by_bank_and_falls_back_to_largest_theme():
+    from scripts import sentiment_thematic as st
+
+    df = _reviews(12).assign(sentiment_score=0.1, sentiment_label='pos')
+    df.loc[3, 'review'] = 'nothing relevant here'
+    theme_maps = {
+        'CBE': {'Account Access Issues': ['login', 'otp'], 'Other': ['design', 'great', 'app']},
+        'BOA': {'Transaction Performance': ['transfer', 'slow', 'failed']},
+    }
+    out = st.thematic_rows(df, theme_maps)
+    assert out['bank'].tolist() == ['BOA'] * 6 + ['CBE'] * 6
+    assert out['review_id'].tolist() == [1, 3, 5, 7, 9, 11, 0, 2, 4, 6, 8, 10]
+    themes = dict(zip(out['review_id'], out['identified_themes']))
+    assert themes[0] == 'Account Access Issues' and themes[2] == 'Other'
+    assert themes[1] == 'Transaction Performance' and themes[3] == 'Transaction Performance'  # fallback
+    pd.testing.assert_frame_equal(st.thematic_rows(df, theme_maps, workers=2), out)
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from src.storage import load_processed, save_processed, write_parquet
+
+
+def _frame():
+    return pd.DataFrame({
+        'review': ['a', 'b', 'c', 'd'],
+        'rating': [5, 1, 3, 2],
+        'date': ['2024-05-01', '2024-06-02', None, '2024-05-20'],
+        'bank': ['CBE', 'BOA', 'CBE', 'BOA'],
+        'source': ['google_play'] * 4,
+    })
+
+
+def test_csv_projection_and_filters(tmp_path):
+    path = tmp_path / 'reviews_clean.csv'
+    save_processed(_frame(), path)
+    df = load_processed(path, columns=['bank', 'rating'], filters=[('month', '=', '2024-05')])
+    assert df.to_dict('list') == {'bank': ['CBE', 'BOA'], 'rating': [5, 2]}
+
+
+def test_parquet_round_trip_keeps_order_and_columns(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = tmp_path / 'reviews_clean.csv'
+    save_processed(_frame(), path, fmt='parquet')
+    assert not path.exists()
+    assert (tmp_path / 'reviews_clean.parquet' / 'bank=CBE' / 'month=2024-05').is_dir()
+    df = load_processed(path)
+    expected = _frame()
+    assert df['review'].tolist() == expected['review'].tolist()
+    assert list(df.columns) == list(expected.columns)
+    assert df['rating'].tolist() == expected['rating'].tolist()
+
+
+def test_parquet_pushdown(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = tmp_path / 'reviews_clean.csv'
+    save_processed(_frame(), path, fmt='parquet')
+    df = load_processed(path, columns=['bank', 'rating'], filters=[('bank', '=', 'BOA'), ('rating', '<', 2)])
+    assert df.to_dict('list') == {'bank': ['BOA'], 'rating': [1]}
+
+
+def test_parquet_streaming_append(tmp_path):
+    pytest.importorskip('pyarrow')
+    out = tmp_path / 'ds.parquet'
+    frame = _frame()
+    write_parquet(frame.iloc[:2], out)
+    write_parquet(frame.iloc[2:], out, append=True, part=1, row_offset=2)
+    assert load_processed(tmp_path / 'ds.csv')['review'].tolist() == ['a', 'b', 'c', 'd']
@@ -0,0 +1,40 @@
+import random
+
+from src.themes import ThemeMatcher
+
+
+def _naive(text, theme_map):
+    text_l = text.lower()
+    return [theme for theme, kws in theme_map.items() if any(kw.lower() in text_l for kw in kws)]
+
+
+def test_matches_substring_semantics():
+    theme_map = {
+        'Access': ['login', 'PIN'],
+        'UI': ['app', 'application crash'],
+        'Perf': ['slow'],
+    }
+    m = ThemeMatcher(theme_map)
+    assert m.match('The Application crashed at login') == ['Access', 'UI']
+    assert m.match('spinning forever') == ['Access']
+    assert m.match('nothing here') == []
+    assert m.match_many(['slow app', 'ok']) == [['UI', 'Perf'], []]
+
+
+def test_overlapping_keywords_across_themes():
+    theme_map = {'long': ['application'], 'short': ['app'], 'inner': ['plic']}
+    assert ThemeMatcher(theme_map).match('application') == ['long', 'short', 'inner']
+
+
+def test_random_maps_agree_with_naive_scan():
+    rng = random.Random(7)
+    alphabet = 'ab c'
+    for _ in range(500):
+        theme_map = {
+            f't{i}': [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 4))) for _ in range(rng.randint(0, 4))]
+            for i in range(rng.randint(1, 5))
+        }
+        m = ThemeMatcher(theme_map)
+        for _ in range(5):
+            text = ''.join(rng.choice(alphabet + 'AB') for _ in range(rng.randint(0, 20)))
+            assert m.match(text) == _naive(text, theme_map)